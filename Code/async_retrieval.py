@@ -0,0 +1,163 @@
+""" Asyncio retrieval engine.
+
+Lookups run as coroutines on one event loop, so a hung netsh can be timed
+out or cancelled instead of holding a worker thread forever.
+"""
+import asyncio
+import queue
+import threading
+
+import instrumentation
+from backends import ERROR_CANCELLED, ERROR_DEADLINE, ERROR_TIMEOUT, BackendError
+
+DEFAULT_CALL_TIMEOUT = 15.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.25
+MAX_BACKOFF = 4.0
+
+
+class AsyncRetrievalEngine:
+    """ Fetches profiles concurrently with per-call timeouts, a global deadline and retries.
+
+    A lookup that fails in a transient way is retried up to retries times with
+    exponential backoff. Lookups still outstanding when the deadline passes or
+    cancel() is called are reported with a 'deadline' or 'cancelled' error, so
+    every profile gets exactly one result. An engine runs once; a cancelled
+    engine stays cancelled.
+    """
+    def __init__(self, backend, max_concurrency=8, call_timeout=DEFAULT_CALL_TIMEOUT, deadline=None,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        # Seconds, None for no limit.
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.cancelled = False
+        self.loop = None
+        self.task = None
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        """ Stop the run from any thread. Lookups in flight are abandoned and their netsh killed. """
+        with self.lock:
+            self.cancelled = True
+            if self.task is not None:
+                self.loop.call_soon_threadsafe(self.task.cancel)
+
+    async def fetch(self, profile, deadline_at):
+        """ Fetch one profile with timeouts and retries. Returns (record, error). """
+        with instrumentation.span('fetch.profile', profile=profile):
+            record, error = await self.fetch_with_retries(profile, deadline_at)
+        instrumentation.count(f'fetch.error.{error.kind}' if error else 'fetch.ok')
+        return record, error
+
+    async def fetch_with_retries(self, profile, deadline_at):
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            timeout, kind = self.call_timeout, ERROR_TIMEOUT
+            if deadline_at is not None:
+                remaining = deadline_at - loop.time()
+                if timeout is None or remaining < timeout:
+                    timeout, kind = remaining, ERROR_DEADLINE
+                if timeout <= 0:
+                    return None, BackendError(f'Deadline passed before "{profile}" was fetched', ERROR_DEADLINE)
+            try:
+                return await asyncio.wait_for(self.backend.fetch_profile_async(profile), timeout), None
+            except asyncio.TimeoutError:
+                error = BackendError(f'Lookup of "{profile}" timed out after {timeout:.3g} seconds', kind)
+            except BackendError as e:
+                error = e
+
+            attempt += 1
+            if not error.transient or attempt > self.retries:
+                return None, error
+            delay = min(self.backoff * 2 ** (attempt - 1), MAX_BACKOFF)
+            if deadline_at is not None and loop.time() + delay >= deadline_at:
+                return None, error
+            instrumentation.count('fetch.retry')
+            await asyncio.sleep(delay)
+
+    async def run(self, profiles, on_result, ordered=False):
+        """ Call on_result(profile, record, error) once per profile, as results complete.
+
+        With ordered, results are held back until every earlier profile has
+        reported, so they come out in the order given.
+        """
+        profiles = list(profiles)
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline if self.deadline else None
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        reported = set()
+        held = {}
+        next_index = 0
+
+        def report(index, record, error):
+            nonlocal next_index
+            reported.add(index)
+            if not ordered:
+                on_result(profiles[index], record, error)
+                return
+            held[index] = (record, error)
+            while next_index in held:
+                on_result(profiles[next_index], *held.pop(next_index))
+                next_index += 1
+
+        async def lookup(index):
+            async with semaphore:
+                record, error = await self.fetch(profiles[index], deadline_at)
+            report(index, record, error)
+
+        with self.lock:
+            started = not self.cancelled
+            if started:
+                self.loop, self.task = loop, asyncio.current_task()
+        if started:
+            tasks = [loop.create_task(lookup(index)) for index in range(len(profiles))]
+            try:
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                # Wait for the lookups to unwind so their processes are gone before we return.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                with self.lock:
+                    self.task = None
+        for index in range(len(profiles)):
+            if index not in reported:
+                report(index, None, BackendError('Retrieval was cancelled', ERROR_CANCELLED))
+
+
+def iter_results(engine, profiles, ordered=True):
+    """ Run engine on its own event loop thread and yield (profile, record, error) as results arrive.
+
+    Closing the generator early cancels whatever is still running.
+    """
+    results = queue.Queue()
+    finished = object()
+    failure = []
+
+    def run():
+        try:
+            asyncio.run(engine.run(profiles, lambda *result: results.put(result), ordered))
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            results.put(finished)
+
+    thread = threading.Thread(target=run, name='async-retrieval', daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is finished:
+                break
+            yield result
+    finally:
+        engine.cancel()
+        thread.join()
+    if failure:
+        raise failure[0]
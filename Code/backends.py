@@ -0,0 +1,792 @@
+import argparse
+import asyncio
+import ctypes
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+import xml.etree.ElementTree as ElementTree
+
+import instrumentation
+from netsh_parser import RULE_PATTERN, empty_profile_record, parse_profile, parse_profile_list
+
+BACKEND_NAMES = ('netsh', 'session', 'export', 'linux', 'replay', 'inventory')
+# There is no netsh on Linux; the NetworkManager and wpa_supplicant files are read instead.
+DEFAULT_BACKEND = 'linux' if sys.platform.startswith('linux') else 'netsh'
+DEFAULT_PROFILE_STORE = os.path.join(os.environ.get('ProgramData', r'C:\ProgramData'),
+                                     'Microsoft', 'Wlansvc', 'Profiles', 'Interfaces')
+
+
+# What went wrong with a lookup, so callers can tell a missing profile from a hung netsh.
+ERROR_UNKNOWN = 'unknown'
+ERROR_TIMEOUT = 'timeout'
+ERROR_DEADLINE = 'deadline'
+ERROR_CANCELLED = 'cancelled'
+ERROR_NOT_FOUND = 'not_found'
+ERROR_ACCESS_DENIED = 'access_denied'
+ERROR_SERVICE_UNAVAILABLE = 'service_unavailable'
+ERROR_SPAWN_FAILED = 'spawn_failed'
+# netsh failed in a way we don't recognise; assumed to fail the same way again.
+ERROR_EXIT_STATUS = 'exit_status'
+# netsh died before it answered, e.g. an interactive session that crashed.
+ERROR_INTERRUPTED = 'interrupted'
+# Failures worth retrying; the rest will fail the same way again.
+TRANSIENT_ERRORS = frozenset({ERROR_TIMEOUT, ERROR_SERVICE_UNAVAILABLE, ERROR_INTERRUPTED})
+
+# netsh reports problems on stdout with a zero or non-zero status; these tell them apart.
+FAILURE_PATTERNS = (
+    (ERROR_NOT_FOUND, re.compile(r'is not found on the system|nicht gefunden|introuvable|no se encuentra|'
+                                 r'non è stato trovato|não foi encontrado|niet gevonden', re.IGNORECASE)),
+    (ERROR_SERVICE_UNAVAILABLE, re.compile(r'wlansvc|AutoConfig', re.IGNORECASE)),
+    (ERROR_ACCESS_DENIED, re.compile(r'elevation|access is denied|location permission|Zugriff verweigert|'
+                                     r'accès refusé|acceso denegado', re.IGNORECASE)),
+)
+# Keep netsh from flashing a console window when started from the GUI.
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+# Seconds a netsh call may take unless a timeout is given; nothing waits on netsh forever.
+DEFAULT_NETSH_TIMEOUT = 30.0
+# Seconds a session command may take when the backend has no timeout of its own.
+DEFAULT_SESSION_TIMEOUT = 30.0
+# Options whose values are quoted when a command is written out as one line.
+QUOTED_OPTIONS = ('name', 'folder')
+# Prompt interactive netsh prints before reading each command; it isn't followed by a newline.
+NETSH_PROMPT = 'netsh>'
+
+
+class BackendError(Exception):
+    """ Anything that goes wrong talking to the system. kind is one of the ERROR_* constants. """
+    def __init__(self, message, kind=ERROR_UNKNOWN):
+        super().__init__(message)
+        self.kind = kind
+
+    def __reduce__(self):
+        # Errors cross process boundaries in the process retrieval mode.
+        return type(self), (str(self), self.kind)
+
+    @property
+    def transient(self):
+        return self.kind in TRANSIENT_ERRORS
+
+
+def profile_argv(profile):
+    return ['wlan', 'show', 'profile', f'name={profile}', 'key=clear']
+
+
+def netsh_command(argv):
+    """ argv as a single netsh command line, the form recordings and interactive sessions use. """
+    parts = []
+    for argument in argv:
+        option, separator, value = argument.partition('=')
+        parts.append(f'{option}="{value}"' if separator and option in QUOTED_OPTIONS else argument)
+    return ' '.join(parts)
+
+
+def classify_netsh_failure(output):
+    """ Error kind for a failed netsh call, judged from what it printed. """
+    for kind, pattern in FAILURE_PATTERNS:
+        if pattern.search(output or ''):
+            return kind
+    return ERROR_EXIT_STATUS
+
+
+def console_encoding():
+    """ Encoding console programs like netsh write their output in. """
+    if sys.platform == 'win32':
+        return f'cp{ctypes.windll.kernel32.GetConsoleOutputCP() or ctypes.windll.kernel32.GetOEMCP()}'
+    return 'utf-8'
+
+
+class ProfileBackend:
+    """ Source of saved WLAN profiles and their keys.
+
+    Records are plain dicts with at least 'name' and 'key'; everything else is metadata.
+    Backends raise BackendError for anything that goes wrong talking to the system.
+    """
+    # Backends that fetch every key in one call set this so callers don't fan out.
+    bulk = False
+
+    def list_profiles(self):
+        raise NotImplementedError
+
+    def fetch_profile(self, profile):
+        raise NotImplementedError
+
+    def fetch_key(self, profile):
+        return self.fetch_profile(profile)['key']
+
+    def fetch_metadata(self, profile):
+        record = dict(self.fetch_profile(profile))
+        record.pop('key', None)
+        return record
+
+    async def fetch_profile_async(self, profile):
+        """ Coroutine version of fetch_profile. Backends that can await their I/O override this. """
+        return await asyncio.to_thread(self.fetch_profile, profile)
+
+    def fetch_profiles(self, profiles):
+        """ Yield (profile, record, error) for every profile, in order; error is a BackendError or None. """
+        for profile in profiles:
+            try:
+                yield profile, self.fetch_profile(profile), None
+            except BackendError as e:
+                yield profile, None, e
+
+    def profile_fingerprints(self):
+        """ Cheap change markers, profile name -> (store path, mtime, size), or None if unsupported. """
+        return None
+
+    def close(self):
+        """ Release anything the backend keeps open, such as a netsh process. """
+        pass
+
+
+def read_profile_name(path):
+    """ Read just the <name> of a WLANProfile XML file without parsing the rest. """
+    for _, element in ElementTree.iterparse(path):
+        if _local_name(element.tag) == 'name':
+            return (element.text or '').strip()
+    return ''
+
+
+def scan_profile_store(root, name_cache=None):
+    """ Fingerprint every profile file under the WLAN profile store.
+
+    Only the files are stat'ed; a file is parsed for its profile name only when
+    it isn't in name_cache under the same (path, mtime, size) yet. Returns None
+    when the store can't be read.
+    """
+    if name_cache is None:
+        name_cache = {}
+    fingerprints = {}
+    try:
+        interfaces = [entry.path for entry in os.scandir(root) if entry.is_dir()]
+        for interface in interfaces:
+            for entry in os.scandir(interface):
+                if not entry.name.lower().endswith('.xml'):
+                    continue
+                stat = entry.stat()
+                fingerprint = (entry.path, stat.st_mtime_ns, stat.st_size)
+                name = name_cache.get(fingerprint)
+                if name is None:
+                    try:
+                        name = name_cache[fingerprint] = read_profile_name(entry.path)
+                    except ElementTree.ParseError:
+                        continue
+                fingerprints.setdefault(name, fingerprint)
+    except OSError:
+        return None
+    return fingerprints
+
+
+class NetshBackend(ProfileBackend):
+    def __init__(self, profile_store=DEFAULT_PROFILE_STORE, timeout=None):
+        self.profile_store = profile_store
+        # Seconds a single netsh call may take.
+        self.timeout = timeout or DEFAULT_NETSH_TIMEOUT
+        self.name_cache = {}
+
+    def profile_fingerprints(self):
+        if not self.profile_store:
+            return None
+        return scan_profile_store(self.profile_store, self.name_cache)
+
+    def run_netsh(self, argv):
+        """ Run netsh with an argument list. There is no shell in between, so a profile name is never shell syntax. """
+        command = netsh_command(argv)
+        try:
+            with instrumentation.span('netsh.call', arguments=command):
+                output = subprocess.check_output(['netsh', *argv], stdin=subprocess.DEVNULL,
+                                                 stderr=subprocess.DEVNULL, timeout=self.timeout,
+                                                 creationflags=CREATE_NO_WINDOW)
+        except subprocess.TimeoutExpired:
+            raise BackendError(f'netsh {command} timed out after {self.timeout} seconds', ERROR_TIMEOUT) from None
+        except subprocess.CalledProcessError as e:
+            output = (e.output or b'').decode(console_encoding(), errors='replace')
+            raise BackendError(f'netsh {command} exited with status {e.returncode}: {output.strip()}',
+                               classify_netsh_failure(output)) from e
+        except OSError as e:
+            raise BackendError(f'Could not start netsh: {e}', ERROR_SPAWN_FAILED) from e
+        return output.decode(console_encoding(), errors='replace')
+
+    async def run_netsh_async(self, argv):
+        """ Run netsh with an argument list, no shell in between. Cancelling the caller kills netsh. """
+        command = f'netsh {netsh_command(argv)}'
+        with instrumentation.span('netsh.call', arguments=command):
+            return await self._run_netsh_process(command, argv)
+
+    async def _run_netsh_process(self, command, argv):
+        started = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'netsh', *argv, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT, creationflags=CREATE_NO_WINDOW)
+        except OSError as e:
+            raise BackendError(f'Could not start netsh: {e}', ERROR_SPAWN_FAILED) from e
+        instrumentation.observe('netsh.spawn', time.perf_counter() - started)
+        try:
+            output, _ = await process.communicate()
+        except BaseException:
+            # Timed out or cancelled: don't leave a hung netsh behind.
+            if process.returncode is None:
+                process.kill()
+                await asyncio.shield(process.wait())
+            raise
+        output = output.decode(console_encoding(), errors='replace')
+        if process.returncode:
+            raise BackendError(f'{command} exited with status {process.returncode}: {output.strip()}',
+                               classify_netsh_failure(output))
+        return output
+
+    def list_profiles(self):
+        output = self.run_netsh(['wlan', 'show', 'profile'])
+        with instrumentation.span('parse.list'):
+            return parse_profile_list(output)
+
+    def parse_fetched(self, output, profile):
+        with instrumentation.span('parse.profile'):
+            record = parse_profile(output, profile)
+        # Keep the name the profile was asked for, so results always map back to the listing.
+        record['name'] = profile
+        return record
+
+    def fetch_profile(self, profile):
+        return self.parse_fetched(self.run_netsh(profile_argv(profile)), profile)
+
+    async def fetch_profile_async(self, profile):
+        output = await self.run_netsh_async(profile_argv(profile))
+        return self.parse_fetched(output, profile)
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_profile_xml(path):
+    """ Parse one exported WLANProfile XML file into a profile record. """
+    root = ElementTree.parse(path).getroot()
+    record = empty_profile_record()
+    record['ssid'] = ''
+    ssid_hex = ssid_name = ''
+    # Walk the tree once; the profile namespace differs between Windows versions,
+    # so elements are matched on their local name only.
+    for element in root.iter():
+        tag = _local_name(element.tag)
+        text = (element.text or '').strip()
+        if tag == 'name' and not record['name']:
+            record['name'] = text
+        elif tag == 'name' and not ssid_name:
+            # The second <name> is the one inside <SSID>.
+            ssid_name = text
+        elif tag == 'hex' and not ssid_hex:
+            ssid_hex = text
+        elif tag == 'authentication' and not record['authentication']:
+            record['authentication'] = text
+        elif tag == 'encryption' and not record['cipher']:
+            record['cipher'] = text
+        elif tag == 'connectionMode':
+            record['connection_mode'] = text
+        elif tag == 'connectionType':
+            record['network_type'] = {'ESS': 'Infrastructure', 'IBSS': 'Ad hoc'}.get(text, text)
+        elif tag == 'keyMaterial':
+            record['key'] = text
+    if ssid_hex:
+        try:
+            record['ssid'] = bytes.fromhex(ssid_hex).decode('utf-8', errors='replace')
+        except ValueError:
+            pass
+    if not record['ssid']:
+        record['ssid'] = ssid_name or record['name']
+    return record
+
+
+def read_profile_folder(folder):
+    """ Parse every profile XML in folder. Returns a dict of profile name -> record. """
+    records = {}
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.lower().endswith('.xml'):
+            continue
+        try:
+            record = parse_profile_xml(os.path.join(folder, file_name))
+        except ElementTree.ParseError:
+            continue
+        # Exported files are named '<interface>-<profile>.xml'.
+        suffix = f'-{record["name"]}.xml'
+        if file_name.endswith(suffix):
+            record['interface'] = file_name[:-len(suffix)]
+        # The same profile can be exported once per interface; keep the first.
+        records.setdefault(record['name'], record)
+    return records
+
+
+class NetshExportBackend(NetshBackend):
+    """ Fetches every key with a single 'netsh wlan export profile' call. """
+    bulk = True
+
+    def export_profiles(self, profile=None):
+        folder = tempfile.mkdtemp(prefix='tstp_np_')
+        try:
+            name = [f'name={profile}'] if profile is not None else []
+            self.run_netsh(['wlan', 'export', 'profile', *name, 'key=clear', f'folder={folder}'])
+            return read_profile_folder(folder)
+        finally:
+            # The exported files hold every key in clear text, never leave them behind.
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def fetch_profile(self, profile):
+        record = self.export_profiles(profile).get(profile)
+        if record is None:
+            raise BackendError(f'Profile "{profile}" was not included in the export', ERROR_NOT_FOUND)
+        return record
+
+    async def fetch_profile_async(self, profile):
+        return await asyncio.to_thread(self.fetch_profile, profile)
+
+    def fetch_profiles(self, profiles):
+        try:
+            records = self.export_profiles()
+        except BackendError as e:
+            for profile in profiles:
+                yield profile, None, e
+            return
+        for profile in profiles:
+            record = records.get(profile)
+            if record is None:
+                yield profile, None, BackendError(f'Profile "{profile}" was not included in the export',
+                                                  ERROR_NOT_FOUND)
+            else:
+                yield profile, record, None
+
+
+class NetshSession:
+    """ One long-lived interactive netsh process that commands are piped into.
+
+    Each command is followed by a sentinel: a command netsh doesn't know,
+    which it answers with an error line containing the sentinel's unique
+    token. Everything printed before that line is the command's output.
+    Commands run one at a time. A session whose process has died or hung is
+    restarted on the next command.
+    """
+    def __init__(self, argv=('netsh',), timeout=DEFAULT_SESSION_TIMEOUT):
+        self.argv = list(argv)
+        self.timeout = timeout
+        self.process = None
+        self.lines = None
+        self.lock = threading.Lock()
+        self.token = f'tstp-end-{os.urandom(6).hex()}'
+        self.sequence = 0
+
+    def start(self):
+        started = time.perf_counter()
+        try:
+            self.process = subprocess.Popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT, creationflags=CREATE_NO_WINDOW)
+        except OSError as e:
+            raise BackendError(f'Could not start {self.argv[0]}: {e}', ERROR_SPAWN_FAILED) from e
+        instrumentation.observe('netsh.spawn', time.perf_counter() - started)
+        # Output is read on its own thread so a hung netsh can be timed out.
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read_output, args=(self.process.stdout, self.lines),
+                         name='netsh-session', daemon=True).start()
+
+    @staticmethod
+    def read_output(stream, lines):
+        encoding = console_encoding()
+        for line in iter(stream.readline, b''):
+            lines.put(line.decode(encoding, errors='replace'))
+        lines.put(None)
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+    def run(self, command):
+        """ Output of one command. A session that died before answering is restarted and asked once more. """
+        with self.lock:
+            for attempt in range(2):
+                if self.process is not None and self.process.poll() is not None:
+                    self.close()
+                if self.process is None:
+                    self.start()
+                try:
+                    return self.exchange(command)
+                except EOFError:
+                    instrumentation.count('netsh.session.restart')
+                    self.close()
+            raise BackendError(f'netsh exited while running: {command}', ERROR_INTERRUPTED)
+
+    def exchange(self, command):
+        self.sequence += 1
+        sentinel = f'{self.token}-{self.sequence}'
+        try:
+            self.process.stdin.write(f'{command}\n{sentinel}\n'.encode(console_encoding()))
+            self.process.stdin.flush()
+        except OSError:
+            # Closed pipe: the process is gone.
+            raise EOFError from None
+        output = []
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0, deadline - time.monotonic()) if deadline else None)
+            except queue.Empty:
+                # The process is in an unknown state now; the next command gets a new one.
+                self.close()
+                raise BackendError(f'netsh {command} timed out after {self.timeout} seconds', ERROR_TIMEOUT) from None
+            if line is None:
+                raise EOFError
+            if sentinel in line:
+                break
+            output.append(line)
+        text = ''.join(output)
+        # Drop the prompt(s) echoed before the output started.
+        while text.startswith(NETSH_PROMPT):
+            text = text[len(NETSH_PROMPT):]
+        return text
+
+
+# (command, timeout) -> session, for backends unpickled in a worker process.
+_worker_sessions = {}
+
+
+class NetshSessionBackend(NetshBackend):
+    """ Sends every netsh command to one persistent interactive session instead of spawning netsh per call.
+
+    command is the program to run as the session; a scripted stand-in such
+    as 'backends.py serve-replay' lets the backend run without Windows.
+    """
+    def __init__(self, profile_store=DEFAULT_PROFILE_STORE, timeout=None, command=('netsh',)):
+        super().__init__(profile_store, timeout)
+        self.command = tuple(command)
+        self.session = NetshSession(self.command, timeout or DEFAULT_SESSION_TIMEOUT)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['session']
+        return state
+
+    def __setstate__(self, state):
+        # The process retrieval mode unpickles a backend per lookup; each worker process keeps one session.
+        self.__dict__.update(state)
+        key = (self.command, self.timeout)
+        if key not in _worker_sessions:
+            _worker_sessions[key] = NetshSession(self.command, self.timeout or DEFAULT_SESSION_TIMEOUT)
+        self.session = _worker_sessions[key]
+
+    def close(self):
+        self.session.close()
+
+    def run_netsh(self, argv):
+        arguments = netsh_command(argv)
+        if '\n' in arguments or '\r' in arguments:
+            # A line break would end the command early and start another one.
+            raise BackendError(f'Cannot send a line break to netsh: {arguments!r}', ERROR_UNKNOWN)
+        with instrumentation.span('netsh.session.call', arguments=arguments):
+            output = self.session.run(arguments)
+        # There is no exit status per command; successful output always has a section rule.
+        if not any(RULE_PATTERN.match(line) for line in output.splitlines()):
+            raise BackendError(f'netsh {arguments} failed: {output.strip()}', classify_netsh_failure(output))
+        return output
+
+    async def fetch_profile_async(self, profile):
+        # Commands queue for the one session, so a thread waiting on it is all that's needed.
+        return await asyncio.to_thread(self.fetch_profile, profile)
+
+
+class RecordingBackend(NetshBackend):
+    """ Runs netsh for real and keeps every output so it can be replayed later. """
+    def __init__(self, profile_store=DEFAULT_PROFILE_STORE, timeout=None):
+        super().__init__(profile_store, timeout)
+        self.recording = {}
+
+    def run_netsh(self, argv):
+        result = super().run_netsh(argv)
+        self.recording[netsh_command(argv)] = result
+        return result
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.recording, file, indent=4)
+
+
+class ReplayBackend(NetshBackend):
+    """ Serves recorded netsh output instead of spawning netsh.
+
+    latency (plus up to jitter) seconds are slept per call. Calls fail with a
+    transient BackendError if their arguments contain one of the failures
+    strings, or at random with probability failure_rate. Without a
+    profile_store, fingerprints are derived from the recorded output so key
+    changes are still detected.
+    """
+    FETCH_PATTERN = re.compile(r'^wlan show profile name="(.*)" key=clear$')
+
+    def __init__(self, recording, latency=0.0, jitter=0.0, failures=(), failure_rate=0.0, seed=None,
+                 profile_store=None, timeout=None):
+        super().__init__(profile_store, timeout)
+        self.recording = recording
+        self.latency = latency
+        self.jitter = jitter
+        self.failures = tuple(failures)
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    @classmethod
+    def load(cls, path, **options):
+        with open(path, encoding='utf-8') as file:
+            return cls(json.load(file), **options)
+
+    def profile_fingerprints(self):
+        if self.profile_store:
+            return super().profile_fingerprints()
+        fingerprints = {}
+        for arguments, output in self.recording.items():
+            match = self.FETCH_PATTERN.match(arguments)
+            if match:
+                fingerprints[match.group(1)] = (f'replay:{match.group(1)}', zlib.crc32(output.encode('utf-8')), len(output))
+        return fingerprints
+
+    def replay_delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def replay_output(self, arguments):
+        if any(failure in arguments for failure in self.failures):
+            raise BackendError(f'Injected failure for: netsh {arguments}', ERROR_INTERRUPTED)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise BackendError(f'Injected random failure for: netsh {arguments}', ERROR_INTERRUPTED)
+        try:
+            return self.recording[arguments]
+        except KeyError:
+            raise BackendError(f'No recorded output for: netsh {arguments}', ERROR_NOT_FOUND) from None
+
+    def run_netsh(self, argv):
+        arguments = netsh_command(argv)
+        delay = self.replay_delay()
+        if self.timeout is not None and delay > self.timeout:
+            time.sleep(self.timeout)
+            raise BackendError(f'netsh {arguments} timed out after {self.timeout} seconds', ERROR_TIMEOUT)
+        if delay:
+            time.sleep(delay)
+        return self.replay_output(arguments)
+
+    async def fetch_profile_async(self, profile):
+        # Sleeping on the event loop lets timeouts and cancellation interrupt a slow replay.
+        delay = self.replay_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.parse_fetched(self.replay_output(netsh_command(profile_argv(profile))), profile)
+
+
+def serve_replay(recording, stdin, stdout, latency=0.0, die_after=None):
+    """ Act like interactive netsh on stdin/stdout, answering from a recording. A stand-in for sessions.
+
+    With die_after, the process exits without a word after that many
+    commands, the way a crashed netsh would.
+    """
+    commands = 0
+    while True:
+        stdout.write(NETSH_PROMPT)
+        stdout.flush()
+        line = stdin.readline()
+        if not line:
+            return 0
+        command = line.strip()
+        if not command:
+            continue
+        if command in ('exit', 'bye', 'quit'):
+            return 0
+        commands += 1
+        if die_after is not None and commands > die_after:
+            return 1
+        if latency:
+            time.sleep(latency)
+        if command in recording:
+            stdout.write(recording[command])
+        elif ReplayBackend.FETCH_PATTERN.match(command):
+            stdout.write(f'Profile "{ReplayBackend.FETCH_PATTERN.match(command).group(1)}" is not found on the '
+                         f'system.\n')
+        else:
+            stdout.write(f'The following command was not found: {command}.\n')
+
+
+def synthetic_recording(count):
+    """ Build a replay recording with count WPA2 profiles. """
+    names = [f'Network {i:05d}' for i in range(count)]
+    listing = ['', 'Profiles on interface Wi-Fi:', '', 'Group policy profiles (read only)',
+               '---------------------------------', '    <None>', '', 'User profiles', '-------------']
+    listing += [f'    All User Profile     : {name}' for name in names]
+    recording = {'wlan show profile': '\n'.join(listing) + '\n'}
+    for i, name in enumerate(names):
+        recording[f'wlan show profile name="{name}" key=clear'] = f"""
+Profile {name} on interface Wi-Fi:
+=======================================================================
+
+Applied: All User Profile
+
+Profile information
+-------------------
+    Version                : 1
+    Type                   : Wireless LAN
+    Name                   : {name}
+    Control options        :
+        Connection mode    : Connect automatically
+        Network broadcast  : Connect only if this network is broadcasting
+        AutoSwitch         : Do not switch to other networks
+        MAC Randomization  : Disabled
+
+Connectivity settings
+---------------------
+    Number of SSIDs        : 1
+    SSID name              : "{name}"
+    Network type           : Infrastructure
+    Radio type             : [ Any Radio Type ]
+    Vendor extension          : Not present
+
+Security settings
+-----------------
+    Authentication         : WPA2-Personal
+    Cipher                 : CCMP
+    Authentication         : WPA2-Personal
+    Cipher                 : GCMP
+    Security key           : Present
+    Key Content            : secret:{i:08x}
+
+Cost settings
+-------------
+    Cost                   : Unrestricted
+    Congested              : No
+    Approaching Data Limit : No
+    Over Data Limit        : No
+    Roaming                : No
+    Cost Source            : Default
+"""
+    return recording
+
+
+def make_backend(name=DEFAULT_BACKEND, replay_file=None, timeout=None, inventory_file=None, profile_store=None,
+                 system_root=None, **replay_options):
+    if name == 'netsh':
+        return NetshBackend(profile_store or DEFAULT_PROFILE_STORE, timeout=timeout)
+    if name == 'session':
+        command = ('netsh',)
+        if replay_file:
+            # Replays through the scripted stand-in, so sessions can be exercised anywhere.
+            command = (sys.executable, os.path.abspath(__file__), 'serve-replay', replay_file,
+                       '--latency', str(replay_options.get('latency', 0.0)))
+        return NetshSessionBackend(profile_store or DEFAULT_PROFILE_STORE, timeout=timeout, command=command)
+    if name == 'export':
+        return NetshExportBackend(profile_store or DEFAULT_PROFILE_STORE, timeout=timeout)
+    if name == 'replay':
+        if not replay_file:
+            raise BackendError('The replay backend needs a recording file')
+        # Replays fingerprint their recording unless they are pointed at a (test) profile store.
+        return ReplayBackend.load(replay_file, timeout=timeout, profile_store=profile_store, **replay_options)
+    if name == 'linux':
+        from linux_profiles import LinuxBackend
+        return LinuxBackend(system_root or '/')
+    if name == 'inventory':
+        if not inventory_file:
+            raise BackendError('The inventory backend needs an inventory database')
+        from inventory import InventoryBackend
+        return InventoryBackend(inventory_file)
+    raise BackendError(f'Unknown backend: {name}')
+
+
+def measure_throughput(backend, mode, max_workers):
+    """ Time a full list + fetch cycle. Returns a dict of counts and timings. """
+    from retrieval import retrieve_profiles
+
+    start = time.perf_counter()
+    profiles = backend.list_profiles()
+    listed = time.perf_counter()
+    failures = sum(1 for _, _, error in retrieve_profiles(backend, profiles, mode, max_workers) if error)
+    finished = time.perf_counter()
+    return {
+        'profiles': len(profiles),
+        'failures': failures,
+        'list_seconds': round(listed - start, 6),
+        'fetch_seconds': round(finished - listed, 6),
+        'profiles_per_second': round(len(profiles) / (finished - listed), 2) if finished > listed else None,
+    }
+
+
+def main(argv=None):
+    from retrieval import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE, DEFAULT_MAX_WORKERS
+
+    parser = argparse.ArgumentParser(description='Record, serve or replay netsh output and measure retrieval throughput')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='Record real netsh output for replay')
+    record_parser.add_argument('output')
+
+    serve_parser = commands.add_parser('serve-replay', help='Act as an interactive netsh session over a recording')
+    serve_parser.add_argument('replay_file')
+    serve_parser.add_argument('--latency', type=float, default=0.0)
+    serve_parser.add_argument('--die-after', type=int, help='Exit abruptly after this many commands')
+
+    measure_parser = commands.add_parser('measure', help='Measure retrieval throughput against replayed output')
+    measure_parser.add_argument('--replay-file', help='Recording to replay (default: synthetic profiles)')
+    measure_parser.add_argument('--profiles', type=int, nargs='+', default=[10, 100, 1000])
+    measure_parser.add_argument('--latency', type=float, default=0.0)
+    measure_parser.add_argument('--jitter', type=float, default=0.0)
+    measure_parser.add_argument('--failure-rate', type=float, default=0.0)
+    measure_parser.add_argument('--mode', choices=RETRIEVAL_MODES, default=DEFAULT_RETRIEVAL_MODE)
+    measure_parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS)
+    measure_parser.add_argument('--session', action='store_true',
+                                help='Go through an interactive session served from --replay-file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve-replay':
+        with open(args.replay_file, encoding='utf-8') as file:
+            recording = json.load(file)
+        # Write what the session reader expects to decode.
+        sys.stdout.reconfigure(encoding=console_encoding())
+        return serve_replay(recording, sys.stdin, sys.stdout, args.latency, args.die_after)
+
+    if args.command == 'record':
+        backend = RecordingBackend()
+        profiles = backend.list_profiles()
+        for _ in backend.fetch_profiles(profiles):
+            pass
+        backend.save(args.output)
+        print(f'Recorded {len(profiles)} profiles to {args.output}')
+        return 0
+
+    if args.session:
+        if not args.replay_file:
+            parser.error('--session needs --replay-file')
+        backend = make_backend('session', args.replay_file, latency=args.latency)
+        try:
+            print(json.dumps(measure_throughput(backend, args.mode, args.max_workers)))
+        finally:
+            backend.close()
+        return 0
+
+    options = {'latency': args.latency, 'jitter': args.jitter, 'failure_rate': args.failure_rate, 'seed': 0}
+    if args.replay_file:
+        recordings = [ReplayBackend.load(args.replay_file, **options)]
+    else:
+        recordings = [ReplayBackend(synthetic_recording(count), **options) for count in args.profiles]
+    for backend in recordings:
+        print(json.dumps(measure_throughput(backend, args.mode, args.max_workers)))
+    return 0
+
+
+if __name__ == '__main__':
+    # Run the importable module, not this __main__ copy, so its BackendError is the one
+    # async_retrieval and retrieval catch and its backends pickle for worker processes.
+    import backends
+    sys.exit(backends.main())
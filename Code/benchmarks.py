@@ -0,0 +1,302 @@
+""" Benchmarks for parsing, retrieval, list population, filtering and export at scale.
+
+Every size runs in its own process against synthetic netsh output, so peak
+RSS is that of one size alone. The GUI is driven headless on Qt's offscreen
+platform. Results are written as a JSON baseline; compare flags the metrics
+that got worse than a baseline by more than the tolerance.
+
+    python benchmarks.py run --output baseline.json
+    python benchmarks.py run --output current.json --compare baseline.json
+    python benchmarks.py compare baseline.json current.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from backends import ReplayBackend, measure_throughput, synthetic_recording
+from exporters import EXPORTERS, export_records, export_targets
+from netsh_parser import parse_profile, parse_profile_list
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+BASELINE_VERSION = 1
+# Longest a full GUI population may take before the run is abandoned.
+POPULATE_TIMEOUT = 600
+# Changes smaller than these are noise whatever their relative size, by metric unit suffix.
+# Rates are judged by the time they imply for the whole run, in milliseconds.
+NOISE_FLOORS = {'_ms': 2.0, '_bytes': 4 * 1024 * 1024, '_per_second': 2.0}
+
+
+def peak_rss_bytes():
+    """ Peak resident set size of this process so far. """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t), ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def median_of(repeat, measure):
+    """ Run measure() repeat times and return the median of each metric it returns. """
+    runs = [measure() for _ in range(repeat)]
+    return {metric: round(statistics.median(run[metric] for run in runs), 3) for metric in runs[0]}
+
+
+def milliseconds(start, end):
+    return (end - start) * 1000
+
+
+def bench_parse(recording):
+    outputs = [(arguments, output) for arguments, output in recording.items() if arguments != 'wlan show profile']
+    start = time.perf_counter()
+    parse_profile_list(recording['wlan show profile'])
+    listed = time.perf_counter()
+    for arguments, output in outputs:
+        parse_profile(output)
+    parsed = time.perf_counter()
+    return {'parse_list_ms': milliseconds(start, listed), 'parse_profiles_ms': milliseconds(listed, parsed)}
+
+
+def bench_retrieval(recording):
+    result = measure_throughput(ReplayBackend(recording), 'async', 8)
+    return {'retrieval_ms': result['fetch_seconds'] * 1000}
+
+
+def bench_export(records, directory):
+    metrics = {}
+    size = 0
+    for label, exporter in EXPORTERS.items():
+        path = os.path.join(directory, f'export{exporter.extension}')
+        start = time.perf_counter()
+        export_records(path, label, records)
+        elapsed = time.perf_counter() - start
+        size += os.path.getsize(path)
+        metrics[f'export_{exporter.extension.lstrip(".")}_records_per_second'] = len(records) / elapsed
+    targets = [(os.path.join(directory, f'all{exporter.extension}.gz'), label)
+               for label, exporter in EXPORTERS.items()]
+    start = time.perf_counter()
+    export_targets(targets, records)
+    metrics['export_all_gzip_ms'] = milliseconds(start, time.perf_counter())
+    metrics['export_total_bytes'] = size
+    return metrics
+
+
+def bench_gui(recording, count):
+    """ Time to first row, full population and per-keystroke filter latency in the real window. """
+    # Qt is only loaded here, and only once the platform plugin has been chosen.
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QEvent, QEventLoop, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from main import NetworkPassTool, RefreshScheduler
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    class FirstRowProbe(QObject):
+        """ Notes when the list first paints with rows in it. """
+        def __init__(self, window):
+            super().__init__()
+            self.window = window
+            self.painted = None
+
+        def eventFilter(self, watched, event):
+            if (event.type() == QEvent.Paint and self.painted is None
+                    and self.window.network_proxy.rowCount() > 0):
+                self.painted = time.perf_counter()
+            return False
+
+    def measure():
+        window = NetworkPassTool(ReplayBackend(recording))
+        probe = FirstRowProbe(window)
+        window.network_view.viewport().installEventFilter(probe)
+        window.show()
+        app.processEvents()
+
+        loop = QEventLoop()
+        window.refresh_scheduler.state_changed.connect(
+            lambda state: loop.quit() if state == RefreshScheduler.IDLE else None)
+        QTimer.singleShot(POPULATE_TIMEOUT * 1000, loop.quit)
+        start = time.perf_counter()
+        window.load_profiles()
+        if window.refresh_scheduler.state != RefreshScheduler.IDLE:
+            loop.exec_()
+        populated = time.perf_counter()
+        app.processEvents()
+        if len(window.passwords) != count:
+            raise RuntimeError(f'Only {len(window.passwords)} of {count} keys arrived within {POPULATE_TIMEOUT}s')
+
+        # Type a query one character at a time, filtering after each as the debounce timer would.
+        query = f'network {count // 2:05d}'
+        latencies = []
+        for length in range(1, len(query) + 1):
+            window.search_bar.setText(query[:length])
+            keystroke = time.perf_counter()
+            window.filter_networks()
+            app.processEvents()
+            latencies.append(milliseconds(keystroke, time.perf_counter()))
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+        latencies.sort()
+        return {
+            'first_row_ms': milliseconds(start, probe.painted or populated),
+            'populate_ms': milliseconds(start, populated),
+            'filter_p50_ms': latencies[len(latencies) // 2],
+            'filter_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'filter_max_ms': latencies[-1],
+        }
+
+    return measure
+
+
+def measure_size(count, repeat, gui=True):
+    """ Every metric for one profile count, in this process. """
+    recording = synthetic_recording(count)
+    records = [parse_profile(output) for arguments, output in recording.items() if arguments != 'wlan show profile']
+    metrics = {}
+    metrics.update(median_of(repeat, lambda: bench_parse(recording)))
+    metrics.update(median_of(repeat, lambda: bench_retrieval(recording)))
+    with tempfile.TemporaryDirectory() as directory:
+        metrics.update(median_of(repeat, lambda: bench_export(records, directory)))
+    if gui:
+        metrics.update(median_of(repeat, bench_gui(recording, count)))
+    metrics['peak_rss_bytes'] = peak_rss_bytes()
+    return metrics
+
+
+def run_sizes(sizes, repeat, gui=True):
+    """ Measure each size in a fresh process. """
+    results = {}
+    for count in sizes:
+        command = [sys.executable, os.path.abspath(__file__), 'measure', str(count), '--repeat', str(repeat)]
+        if not gui:
+            command.append('--no-gui')
+        completed = subprocess.run(command, stdout=subprocess.PIPE, check=True, cwd=os.path.dirname(__file__) or None)
+        results[str(count)] = json.loads(completed.stdout)
+        print(f'{count} profiles: done', file=sys.stderr)
+    return {
+        'version': BASELINE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_second')
+
+
+def noise_floor(metric):
+    for suffix, floor in NOISE_FLOORS.items():
+        if metric.endswith(suffix):
+            return floor
+    return 0.0
+
+
+def absolute_change(metric, size, old, new):
+    if higher_is_better(metric):
+        return abs(int(size) / new - int(size) / old) * 1000 if old and new else 0.0
+    return abs(new - old)
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """ Yield (size, metric, old, new, change, regressed) for every metric both runs have. """
+    for size, old_metrics in baseline['results'].items():
+        new_metrics = current['results'].get(size, {})
+        for metric, old in old_metrics.items():
+            new = new_metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better(metric) else change
+            regressed = worse > tolerance and absolute_change(metric, size, old, new) > noise_floor(metric)
+            yield size, metric, old, new, change, regressed
+
+
+def report_comparison(baseline, current, tolerance):
+    """ Print a comparison table and return how many metrics regressed. """
+    regressions = 0
+    print(f'{"profiles":>8}  {"metric":<36} {"baseline":>14} {"current":>14} {"change":>8}')
+    for size, metric, old, new, change, regressed in compare(baseline, current, tolerance):
+        regressions += regressed
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{size:>8}  {metric:<36} {old:>14.3f} {new:>14.3f} {change:>+8.1%}{flag}')
+    print(f'{regressions} regression(s) beyond {tolerance:.0%}')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark parsing, retrieval, the profile list and exports')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and write the results as a baseline')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    run_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                            help='Runs per measurement; the median is kept (default: %(default)s)')
+    run_parser.add_argument('--no-gui', action='store_true', help='Skip the measurements that need Qt')
+    run_parser.add_argument('-o', '--output', help='Baseline file to write (default: stdout)')
+    run_parser.add_argument('--compare', metavar='BASELINE', help='Compare the results against a baseline')
+    run_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+
+    measure_parser = commands.add_parser('measure', help='Measure a single size in this process (used by run)')
+    measure_parser.add_argument('profiles', type=int)
+    measure_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    measure_parser.add_argument('--no-gui', action='store_true')
+
+    compare_parser = commands.add_parser('compare', help='Flag metrics that regressed against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                                help='Allowed relative slowdown before a metric is flagged (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'measure':
+        print(json.dumps(measure_size(args.profiles, args.repeat, not args.no_gui)))
+        return 0
+
+    if args.command == 'compare':
+        return 1 if report_comparison(load_baseline(args.baseline), load_baseline(args.current), args.tolerance) else 0
+
+    results = run_sizes(args.sizes, args.repeat, not args.no_gui)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+    if args.compare:
+        return 1 if report_comparison(load_baseline(args.compare), results, args.tolerance) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+""" Headless command line interface. """
+import argparse
+import fnmatch
+import os
+import sys
+import time
+
+import instrumentation
+from backends import BACKEND_NAMES, DEFAULT_BACKEND, ERROR_DEADLINE, BackendError, make_backend
+from exporters import EXPORTERS, ExportError, export_records, format_names, write_records
+from inventory import READERS, Inventory, InventoryError, export_format, inventory_name
+from retrieval import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE, DEFAULT_MAX_WORKERS, retrieve_profiles
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_BACKEND = 3
+EXIT_TIMEOUT = 4
+EXIT_OUTPUT = 5
+EXIT_INTERRUPTED = 130
+
+COMMANDS = ('extract', 'inventory')
+# Options that come before the command, and whether they take a value.
+GLOBAL_OPTIONS = {'-q': False, '--quiet': False, '--trace': True, '--metrics': True}
+
+
+def report(args, message):
+    if not args.quiet:
+        print(message, file=sys.stderr)
+
+
+def matches_filters(profile, filters):
+    if not filters:
+        return True
+    name = profile.casefold()
+    for pattern in filters:
+        pattern = pattern.casefold()
+        # Plain text matches anywhere in the name, anything with wildcards must match all of it.
+        if any(character in pattern for character in '*?['):
+            if fnmatch.fnmatchcase(name, pattern):
+                return True
+        elif pattern in name:
+            return True
+    return False
+
+
+def iter_records(args, backend, profiles, stats):
+    deadline = time.monotonic() + args.timeout if args.timeout else None
+    results = retrieve_profiles(backend, profiles, args.mode, args.concurrency, args.timeout)
+    try:
+        for profile, record, error in results:
+            if error:
+                stats['failed'] += 1
+                if error.kind == ERROR_DEADLINE:
+                    stats['timed_out'] = True
+                report(args, f'error: {profile} ({error.kind}): {error}')
+            else:
+                stats['written'] += 1
+                yield record
+            if deadline is not None and time.monotonic() > deadline:
+                stats['timed_out'] = True
+                report(args, f'error: timed out after {args.timeout} seconds')
+                break
+    finally:
+        results.close()
+
+
+def run_extract(args):
+    try:
+        backend = make_backend(args.backend, args.replay_file, timeout=args.timeout,
+                               inventory_file=args.inventory_file, system_root=args.system_root)
+    except (BackendError, OSError, ValueError) as e:
+        report(args, f'error: failed to retrieve network profiles: {e}')
+        return EXIT_BACKEND
+    try:
+        return extract(args, backend)
+    finally:
+        # A session backend keeps a netsh process running until it is closed.
+        backend.close()
+
+
+def extract(args, backend):
+    try:
+        profiles = [profile for profile in backend.list_profiles() if matches_filters(profile, args.filter)]
+    except (BackendError, OSError, ValueError) as e:
+        report(args, f'error: failed to retrieve network profiles: {e}')
+        return EXIT_BACKEND
+
+    stats = {'written': 0, 'failed': 0, 'timed_out': False}
+    label = format_names()[args.format]
+    records = iter_records(args, backend, profiles, stats)
+    status = write_output(args, label, records)
+    if status != EXIT_OK:
+        return status
+
+    report(args, f'{stats["written"]} of {len(profiles)} profiles written, {stats["failed"]} failed')
+    if stats['timed_out']:
+        return EXIT_TIMEOUT
+    return EXIT_PARTIAL if stats['failed'] else EXIT_OK
+
+
+def write_output(args, label, records):
+    """ Write records to args.output (stdout for '-'). Returns an exit code. """
+    try:
+        if args.output == '-':
+            write_records(sys.stdout, label, records)
+            # Files match the GUI's exports byte for byte; on a terminal the last line still needs ending.
+            if not EXPORTERS[label].ends_with_newline:
+                sys.stdout.write('\n')
+            sys.stdout.flush()
+        else:
+            export_records(args.output, label, records)
+    except (OSError, ExportError) as e:
+        report(args, f'error: failed to write output: {e}')
+        return EXIT_OUTPUT
+    return EXIT_OK
+
+
+def iter_export_files(paths):
+    """ The given files, plus every recognised export file below the given directories. """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, _, files in os.walk(path):
+            for file_name in sorted(files):
+                if export_format(file_name) in READERS:
+                    yield os.path.join(directory, file_name)
+
+
+def run_inventory_import(args):
+    started = time.perf_counter()
+    imported = failed = 0
+    try:
+        with Inventory(args.database) as inventory:
+            for path in iter_export_files(args.files):
+                try:
+                    imported += inventory.import_file(path, args.host)
+                except InventoryError as e:
+                    failed += 1
+                    report(args, f'error: {e}')
+    except InventoryError as e:
+        report(args, f'error: {e}')
+        return EXIT_BACKEND
+    report(args, f'{imported} records imported into {args.database} in {time.perf_counter() - started:.2f}s, '
+                 f'{failed} files failed')
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def run_inventory_query(args):
+    if not os.path.exists(args.database):
+        report(args, f'error: inventory not found: {args.database}')
+        return EXIT_BACKEND
+    try:
+        with Inventory(args.database, read_only=True) as inventory:
+            rows = inventory.query(args.ssid, args.host, args.auth, args.limit)
+    except InventoryError as e:
+        report(args, f'error: {e}')
+        return EXIT_BACKEND
+    records = (dict(row, name=inventory_name(row)) for row in rows)
+    status = write_output(args, format_names()[args.format], records)
+    if status == EXIT_OK:
+        report(args, f'{len(rows)} matching records')
+    return status
+
+
+def directory(path):
+    if not os.path.isdir(path):
+        raise argparse.ArgumentTypeError(f'{path} is not a directory')
+    return path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='main.py --cli', description='Extract saved network keys without the GUI.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only report through the exit code')
+    parser.add_argument('--trace', metavar='FILE', help='Write a Chrome trace of the run to FILE')
+    parser.add_argument('--metrics', metavar='FILE', help='Write counters and latency histograms to FILE as JSON')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract = commands.add_parser('extract', help='Stream profiles and keys (the default command)')
+    extract.add_argument('--backend', choices=BACKEND_NAMES, default=DEFAULT_BACKEND)
+    extract.add_argument('--replay-file', help='Recorded netsh output for the replay backend')
+    extract.add_argument('--inventory-file', help='Inventory database for the inventory backend')
+    extract.add_argument('--system-root', type=directory,
+                         help='Directory the linux backend reads /etc and /run under (default: /)')
+    extract.add_argument('-f', '--format', choices=sorted(format_names()), default='ndjson')
+    extract.add_argument('-o', '--output', default='-',
+                         help='File to write (.gz/.zst compress it), or - for stdout (default)')
+    extract.add_argument('--filter', action='append', default=[], metavar='PATTERN',
+                         help='Only profiles whose name contains PATTERN or matches it as a wildcard; repeatable')
+    extract.add_argument('--mode', choices=RETRIEVAL_MODES, default=DEFAULT_RETRIEVAL_MODE)
+    extract.add_argument('-j', '--concurrency', type=int, default=DEFAULT_MAX_WORKERS,
+                         help='Number of concurrent key lookups (default: %(default)s)')
+    extract.add_argument('--timeout', type=float,
+                         help='Seconds allowed for each netsh call and for the whole extraction')
+    extract.set_defaults(handler=run_extract)
+
+    inventory = commands.add_parser('inventory', help='Aggregate exports from many machines in a SQLite inventory')
+    inventory_commands = inventory.add_subparsers(dest='inventory_command', required=True)
+
+    import_parser = inventory_commands.add_parser('import', help='Load export files into the inventory')
+    import_parser.add_argument('database')
+    import_parser.add_argument('files', nargs='+', metavar='FILE',
+                               help='Export files, or directories to search for them (any format, .gz/.zst too)')
+    import_parser.add_argument('--host', help='Host the exports came from (default: each file name without '
+                                              'extensions, unless the records name their host)')
+    import_parser.set_defaults(handler=run_inventory_import)
+
+    query_parser = inventory_commands.add_parser('query', help='Look networks up by SSID, host or authentication')
+    query_parser.add_argument('database')
+    query_parser.add_argument('--ssid', help='SSID to match; * and ? are wildcards')
+    query_parser.add_argument('--host', help='Host to match; * and ? are wildcards')
+    query_parser.add_argument('--auth', help='Authentication type to match, e.g. WPA2-Personal')
+    query_parser.add_argument('--limit', type=int)
+    query_parser.add_argument('-f', '--format', choices=sorted(format_names()), default='ndjson')
+    query_parser.add_argument('-o', '--output', default='-', help='File to write, or - for stdout (default)')
+    query_parser.set_defaults(handler=run_inventory_query)
+    return parser
+
+
+def command_position(argv):
+    """ Index just past the global options at the start of argv. """
+    index = 0
+    while index < len(argv):
+        option = argv[index].split('=', 1)[0]
+        if option not in GLOBAL_OPTIONS:
+            break
+        index += 2 if GLOBAL_OPTIONS[option] and '=' not in argv[index] else 1
+    return min(index, len(argv))
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # 'extract' is the default command, so 'main.py --cli -f csv' works. Only the word where the
+    # command goes counts, so '--filter inventory' is an extract filter, not the inventory command.
+    position = command_position(argv)
+    if position == len(argv) or argv[position] not in COMMANDS + ('-h', '--help'):
+        argv.insert(position, 'extract')
+    args = build_parser().parse_args(argv)
+    instrumentation.enable(bool(args.trace or args.metrics))
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        write_instrumentation(args)
+
+
+def write_instrumentation(args):
+    try:
+        if args.trace:
+            instrumentation.export_chrome_trace(args.trace)
+        if args.metrics:
+            instrumentation.export_json(args.metrics)
+    except OSError as e:
+        report(args, f'error: failed to write diagnostics: {e}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+import csv
+import gzip
+import io
+import json
+import os
+import stat
+import tempfile
+from contextlib import ExitStack, contextmanager
+from xml.sax.saxutils import XMLGenerator
+
+import instrumentation
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Export format label -> Exporter subclass, in the order they are offered.
+EXPORTERS = {}
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+# How many records are written between progress callbacks.
+PROGRESS_INTERVAL = 500
+
+
+class ExportError(Exception):
+    pass
+
+
+class ExportCancelled(ExportError):
+    pass
+
+
+def register_exporter(exporter_class):
+    EXPORTERS[exporter_class.label] = exporter_class
+    return exporter_class
+
+
+class Exporter:
+    """ Writes records to a text stream one at a time, so memory stays flat however many there are.
+
+    A record is a dict with 'name' and 'key' plus any metadata fields.
+    """
+    label = ''
+    extension = ''
+    # Passed to the text layer; '' leaves line endings to the writer (csv writes its own).
+    newline = None
+    # Whether the output ends with a line break.
+    ends_with_newline = True
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def begin(self):
+        pass
+
+    def write_record(self, record):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+
+@register_exporter
+class TextExporter(Exporter):
+    label = 'Text File'
+    extension = '.txt'
+
+    def write_record(self, record):
+        self.stream.write(f'Network: {record["name"]}\nPassword: {record["key"]}\n\n')
+
+
+@register_exporter
+class CsvExporter(Exporter):
+    label = 'CSV File'
+    extension = '.csv'
+    newline = ''
+
+    def begin(self):
+        self.writer = csv.writer(self.stream)
+        self.writer.writerow(['Network', 'Password'])
+
+    def write_record(self, record):
+        self.writer.writerow([record['name'], record['key']])
+
+
+@register_exporter
+class JsonExporter(Exporter):
+    """ Same layout as json.dump(passwords, indent=4), written entry by entry. """
+    label = 'JSON File'
+    extension = '.json'
+    ends_with_newline = False
+
+    def begin(self):
+        self.stream.write('{')
+        self.separator = '\n'
+
+    def write_record(self, record):
+        self.stream.write(f'{self.separator}    {json.dumps(record["name"])}: {json.dumps(record["key"])}')
+        self.separator = ',\n'
+
+    def end(self):
+        self.stream.write('}' if self.separator == '\n' else '\n}')
+
+
+@register_exporter
+class XmlExporter(Exporter):
+    label = 'XML File'
+    extension = '.xml'
+    ends_with_newline = False
+
+    def begin(self):
+        self.generator = XMLGenerator(self.stream, encoding='utf-8', short_empty_elements=True)
+        self.generator.startDocument()
+        self.generator.startElement('Networks', {})
+
+    def write_element(self, name, text):
+        self.generator.startElement(name, {})
+        self.generator.characters(text)
+        self.generator.endElement(name)
+
+    def write_record(self, record):
+        self.generator.startElement('Network', {})
+        self.write_element('Profile', record['name'])
+        self.write_element('Password', record['key'])
+        self.generator.endElement('Network')
+
+    def end(self):
+        self.generator.endElement('Networks')
+        self.generator.endDocument()
+
+
+@register_exporter
+class NdjsonExporter(Exporter):
+    """ One JSON object per line, including whatever metadata the record carries. """
+    label = 'NDJSON File'
+    extension = '.ndjson'
+    newline = ''
+
+    def write_record(self, record):
+        line = {'network': record['name'], 'password': record['key']}
+        line.update((field, value) for field, value in record.items() if field not in ('name', 'key'))
+        self.stream.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def format_names():
+    """ Short format names, as used on the command line, mapped to exporter labels. """
+    return {exporter.extension.lstrip('.'): label for label, exporter in EXPORTERS.items()}
+
+
+def available_compressions():
+    return [suffix for suffix, name in COMPRESSION_SUFFIXES.items() if name != 'zstd' or zstandard is not None]
+
+
+def compression_for(path):
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def file_filter(label):
+    extension = EXPORTERS[label].extension
+    patterns = [f'*{extension}'] + [f'*{extension}{suffix}' for suffix in available_compressions()]
+    return f'{label.replace(" File", "")} files ({" ".join(patterns)})'
+
+
+def _file_mode(path):
+    """ Permissions for a new export at path: those of the file it replaces, else what the umask allows. """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_output(path, newline=None):
+    """ Yield a UTF-8 text stream that replaces path only once it has been written completely.
+
+    Data goes to a temporary file next to path, compressed when path ends in
+    .gz or .zst, and is renamed over path at the end. An exception part way
+    through leaves any existing file untouched.
+    """
+    compression = compression_for(path)
+    if compression == 'zstd' and zstandard is None:
+        raise ExportError('zstd compression needs the zstandard package')
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as raw:
+            if compression == 'gzip':
+                binary = gzip.GzipFile(filename=os.path.basename(path)[:-3], mode='wb', fileobj=raw)
+            elif compression == 'zstd':
+                binary = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            else:
+                binary = raw
+            text = io.TextIOWrapper(binary, encoding='utf-8', newline=newline, write_through=False)
+            yield text
+            text.flush()
+            text.detach()
+            if binary is not raw:
+                binary.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        # mkstemp creates the file owner-only.
+        os.chmod(temporary_path, _file_mode(path))
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_records(stream, label, records):
+    """ Stream records to an already open text stream. Returns how many were written. """
+    exporter = EXPORTERS[label](stream)
+    count = 0
+    with instrumentation.span('export.write', format=label):
+        exporter.begin()
+        for record in records:
+            exporter.write_record(record)
+            count += 1
+        exporter.end()
+    instrumentation.count('export.records', count)
+    return count
+
+
+def export_records(path, label, records):
+    """ Atomically export records to path in the given format. Returns how many were written. """
+    return export_targets([(path, label)], records)
+
+
+def export_targets(targets, records, progress=None, cancelled=None):
+    """ Export records to several (path, label) targets in a single pass over them.
+
+    progress(count) is called every PROGRESS_INTERVAL records. When the
+    cancelled event is set, ExportCancelled is raised and no target is
+    written; the same goes for any other error. Returns how many records
+    were written to each target.
+    """
+    for _, label in targets:
+        if label not in EXPORTERS:
+            raise ExportError(f'Unknown export format: {label}')
+    count = 0
+    with ExitStack() as stack, instrumentation.span('export.write', formats=[label for _, label in targets]):
+        exporters = [EXPORTERS[label](stack.enter_context(atomic_output(path, EXPORTERS[label].newline)))
+                     for path, label in targets]
+        for exporter in exporters:
+            exporter.begin()
+        for record in records:
+            for exporter in exporters:
+                exporter.write_record(record)
+            count += 1
+            if count % PROGRESS_INTERVAL == 0:
+                if cancelled is not None and cancelled.is_set():
+                    raise ExportCancelled('Export cancelled')
+                if progress is not None:
+                    progress(count)
+        if cancelled is not None and cancelled.is_set():
+            raise ExportCancelled('Export cancelled')
+        for exporter in exporters:
+            exporter.end()
+    instrumentation.count('export.records', count * len(targets))
+    return count
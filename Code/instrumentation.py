@@ -0,0 +1,184 @@
+""" Hot-path instrumentation: spans, counters and latency histograms.
+
+Recording is off by default. While it is off, span() hands back a shared
+no-op context manager and count()/observe() return after one flag check, so
+instrumented code pays next to nothing.
+"""
+import bisect
+import collections
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the latency buckets, in milliseconds; anything slower lands in the last, open bucket.
+BUCKET_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Trace events kept for export; older ones are dropped first.
+MAX_TRACE_EVENTS = 200000
+
+_enabled = False
+_lock = threading.Lock()
+_started = time.perf_counter()
+_counters = {}
+_histograms = {}
+_events = collections.deque(maxlen=MAX_TRACE_EVENTS)
+
+
+def _round(milliseconds):
+    return round(milliseconds, 3) if milliseconds is not None else None
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, milliseconds):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.minimum = milliseconds if self.minimum is None else min(self.minimum, milliseconds)
+        self.maximum = milliseconds if self.maximum is None else max(self.maximum, milliseconds)
+
+    def percentile(self, fraction):
+        """ Upper bound of the bucket holding the given fraction of samples (the maximum for the open bucket). """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[index], self.maximum) if index < len(BUCKET_BOUNDS) else self.maximum
+        return self.maximum
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': _round(self.total),
+            'mean_ms': _round(self.total / self.count) if self.count else None,
+            'min_ms': _round(self.minimum),
+            'max_ms': _round(self.maximum),
+            'p50_ms': _round(self.percentile(0.5)),
+            'p90_ms': _round(self.percentile(0.9)),
+            'p99_ms': _round(self.percentile(0.99)),
+            'buckets': {str(bound): count for bound, count in zip(BUCKET_BOUNDS + ('inf',), self.buckets) if count},
+        }
+
+
+class Span:
+    """ Times a block into the histogram of the same name and into the trace. """
+    __slots__ = ('name', 'arguments', 'start')
+
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        arguments = self.arguments
+        if exc_type is not None:
+            arguments = dict(arguments or {}, error=exc_type.__name__)
+        _record(self.name, self.start, end, arguments)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, **arguments):
+    """ Context manager timing a block: with span('netsh.call', profile=name): ... """
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, arguments or None)
+
+
+def count(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    """ Add a latency measured elsewhere to a histogram. """
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds * 1000)
+
+
+def _record(name, start, end, arguments):
+    event = {'name': name, 'ph': 'X', 'ts': round((start - _started) * 1e6, 1),
+             'dur': round((end - start) * 1e6, 1), 'pid': os.getpid(), 'tid': threading.get_ident()}
+    if arguments:
+        event['args'] = arguments
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add((end - start) * 1000)
+        _events.append(event)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _events.clear()
+
+
+def snapshot():
+    """ Counters and histogram summaries as plain data. """
+    with _lock:
+        return {
+            'enabled': _enabled,
+            'counters': dict(sorted(_counters.items())),
+            'histograms': {name: histogram.summary() for name, histogram in sorted(_histograms.items())},
+        }
+
+
+def trace_events():
+    with _lock:
+        return list(_events)
+
+
+def export_json(path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(snapshot(), file, indent=4)
+
+
+def export_chrome_trace(path):
+    """ Write the recorded spans in Chrome trace-event format (chrome://tracing, Perfetto). """
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'traceEvents': trace_events(), 'displayTimeUnit': 'ms', 'otherData': snapshot()['counters']},
+                  file)
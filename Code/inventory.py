@@ -0,0 +1,298 @@
+""" SQLite inventory of exported keys collected from many machines.
+
+Exports in any of the formats written by exporters.py (compressed or not)
+are bulk-loaded in batched transactions. A network is identified by
+(host, ssid); importing it again replaces the older row.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ElementTree
+
+from backends import ERROR_NOT_FOUND, BackendError, ProfileBackend
+from exporters import ExportError, compression_for, zstandard
+
+BATCH_SIZE = 5000
+# Columns every inventory row has, in query output order.
+INVENTORY_FIELDS = ('host', 'ssid', 'name', 'key', 'authentication', 'cipher', 'source', 'imported')
+
+# Searched columns compare without case, like the queries, so LIKE and = lookups stay on their indexes.
+# The key itself is exact: SSIDs differing only in case are different networks.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS networks (
+    host TEXT NOT NULL COLLATE NOCASE,
+    ssid TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    authentication TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    cipher TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    imported REAL NOT NULL,
+    PRIMARY KEY (host COLLATE BINARY, ssid COLLATE BINARY)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS networks_ssid ON networks (ssid);
+CREATE INDEX IF NOT EXISTS networks_host ON networks (host);
+CREATE INDEX IF NOT EXISTS networks_authentication ON networks (authentication);
+"""
+
+UPSERT = """
+INSERT INTO networks (host, ssid, name, key, authentication, cipher, source, imported)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (host, ssid) DO UPDATE SET
+    name = excluded.name, key = excluded.key, authentication = excluded.authentication,
+    cipher = excluded.cipher, source = excluded.source, imported = excluded.imported
+"""
+
+
+class InventoryError(Exception):
+    pass
+
+
+def open_export(path):
+    """ Open an export for reading as text, decompressing .gz and .zst files. """
+    compression = compression_for(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ExportError('zstd compression needs the zstandard package')
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8',
+                                newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def export_format(path):
+    """ Short format name of an export ('json', 'csv', ...) from its file name. """
+    base = path[:-len(os.path.splitext(path)[1])] if compression_for(path) else path
+    return os.path.splitext(base)[1].lower().lstrip('.')
+
+
+def read_text(stream):
+    record = {}
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line.startswith('Network: '):
+            record = {'name': line[len('Network: '):]}
+        elif line.startswith('Password: ') and 'name' in record:
+            record['key'] = line[len('Password: '):]
+            yield record
+            record = {}
+
+
+def read_csv(stream):
+    rows = csv.reader(stream)
+    next(rows, None)
+    for row in rows:
+        if len(row) >= 2:
+            yield {'name': row[0], 'key': row[1]}
+
+
+def read_json(stream):
+    data = json.load(stream)
+    if isinstance(data, dict):
+        for name, key in data.items():
+            yield {'name': name, 'key': key}
+    else:
+        for entry in data:
+            yield _from_ndjson(entry)
+
+
+def read_xml(stream):
+    for _, element in ElementTree.iterparse(stream):
+        if element.tag == 'Network':
+            yield {'name': element.findtext('Profile', ''), 'key': element.findtext('Password', '')}
+            # Keep memory flat on very large files.
+            element.clear()
+
+
+def _from_ndjson(entry):
+    record = {field: value for field, value in entry.items() if field not in ('network', 'password')}
+    record['name'] = entry.get('network', entry.get('name', ''))
+    record['key'] = entry.get('password', entry.get('key', ''))
+    return record
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield _from_ndjson(json.loads(line))
+
+
+# Short format name -> reader yielding records from a text stream.
+READERS = {'txt': read_text, 'csv': read_csv, 'json': read_json, 'xml': read_xml, 'ndjson': read_ndjson}
+
+
+def read_export(path):
+    """ Yield the records of an export file, whatever its format. """
+    reader = READERS.get(export_format(path))
+    if reader is None:
+        raise InventoryError(f'Not a recognised export file: {path}')
+    with open_export(path) as stream:
+        yield from reader(stream)
+
+
+def default_host(path):
+    """ Exports are expected to be collected as '<host>.<format>[.gz]'. """
+    name = os.path.basename(path)
+    if compression_for(name):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0]
+
+
+def _like_pattern(text):
+    """ Translate * and ? wildcards to a LIKE pattern, escaping LIKE's own wildcards. """
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+class Inventory:
+    """ Indexed store of (host, ssid) -> key and metadata. """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        try:
+            if read_only:
+                uri = 'file:' + os.path.abspath(path).replace('\\', '/') + '?mode=ro'
+                self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            else:
+                self.connection = sqlite3.connect(path, check_same_thread=False)
+                self.connection.execute('PRAGMA journal_mode = WAL')
+                self.connection.execute('PRAGMA synchronous = NORMAL')
+                self.connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise InventoryError(f'Could not open inventory {path}: {e}') from e
+        self.connection.row_factory = sqlite3.Row
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def import_records(self, host, records, source=''):
+        """ Upsert records in transactions of BATCH_SIZE rows. Returns how many were imported.
+
+        host is used for records that don't name their own host.
+        """
+        if self.read_only:
+            raise InventoryError('The inventory was opened read-only')
+        imported = time.time()
+        count = 0
+        batch = []
+        try:
+            for record in records:
+                batch.append((record.get('host') or host, record.get('ssid') or record['name'], record['name'], record['key'] or '',
+                              record.get('authentication') or '', record.get('cipher') or '', source, imported))
+                if len(batch) >= BATCH_SIZE:
+                    with self.connection:
+                        self.connection.executemany(UPSERT, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                with self.connection:
+                    self.connection.executemany(UPSERT, batch)
+                count += len(batch)
+        except sqlite3.Error as e:
+            raise InventoryError(f'Could not import into {self.path}: {e}') from e
+        return count
+
+    def import_file(self, path, host=None):
+        """ Import an export file. An explicit host overrides any host recorded in the file. """
+        records = read_export(path)
+        if host:
+            records = (dict(record, host=host) for record in records)
+        try:
+            return self.import_records(default_host(path), records, os.path.abspath(path))
+        except (OSError, ValueError, KeyError, ElementTree.ParseError, ExportError) as e:
+            raise InventoryError(f'Could not read {path}: {e}') from e
+
+    def query(self, ssid=None, host=None, authentication=None, limit=None):
+        """ Rows matching every given filter (case-insensitive, * and ? wildcards), as dicts. """
+        conditions = []
+        parameters = []
+        for column, value in (('ssid', ssid), ('host', host), ('authentication', authentication)):
+            if not value:
+                continue
+            if '*' in value or '?' in value:
+                conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+                parameters.append(_like_pattern(value))
+            else:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+        sql = f'SELECT {", ".join(INVENTORY_FIELDS)} FROM networks'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ssid, host'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        try:
+            return [dict(row) for row in self.connection.execute(sql, parameters)]
+        except sqlite3.Error as e:
+            raise InventoryError(f'Could not query {self.path}: {e}') from e
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM networks').fetchone()[0]
+
+
+def inventory_name(row):
+    """ Profile name an inventory row is listed under; SSIDs repeat across hosts. """
+    return f'{row["ssid"]} @ {row["host"]}'
+
+
+class InventoryBackend(ProfileBackend):
+    """ Read-only backend that lists an inventory's rows as profiles. """
+    bulk = True
+    read_only = True
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise BackendError(f'Inventory not found: {path}')
+        try:
+            self.inventory = Inventory(path, read_only=True)
+        except InventoryError as e:
+            raise BackendError(str(e)) from e
+        self.timeout = None
+        self.records = {}
+
+    def close(self):
+        self.inventory.close()
+
+    def load(self):
+        try:
+            rows = self.inventory.query()
+        except InventoryError as e:
+            raise BackendError(str(e)) from e
+        self.records = {}
+        for row in rows:
+            record = dict(row)
+            record['name'] = inventory_name(row)
+            self.records[record['name']] = record
+        return list(self.records)
+
+    def list_profiles(self):
+        return self.load()
+
+    def fetch_profile(self, profile):
+        if profile not in self.records:
+            self.load()
+        try:
+            return self.records[profile]
+        except KeyError:
+            raise BackendError(f'"{profile}" is not in the inventory', ERROR_NOT_FOUND) from None
+
+    def fetch_profiles(self, profiles):
+        for profile in profiles:
+            record = self.records.get(profile)
+            if record is None:
+                yield profile, None, BackendError(f'"{profile}" is not in the inventory', ERROR_NOT_FOUND)
+            else:
+                yield profile, record, None
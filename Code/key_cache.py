@@ -0,0 +1,220 @@
+import ctypes
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+CACHE_VERSION = 1
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class KeyCacheError(Exception):
+    pass
+
+
+def default_cache_dir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'TSTP', 'NetworkPasswordTool')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'tstp-network-password-tool')
+
+
+class KeyProvider:
+    """ Encrypts the cache at rest. protect/unprotect take and return bytes. """
+    def protect(self, data):
+        raise NotImplementedError
+
+    def unprotect(self, data):
+        raise NotImplementedError
+
+
+class DpapiKeyProvider(KeyProvider):
+    """ Windows DPAPI, bound to the current user account. """
+    ENTROPY = b'TSTP Network Password Tool key cache'
+    CRYPTPROTECT_UI_FORBIDDEN = 0x1
+
+    class DataBlob(ctypes.Structure):
+        _fields_ = [('cbData', ctypes.c_uint32), ('pbData', ctypes.POINTER(ctypes.c_char))]
+
+    def _blob(self, data):
+        buffer = ctypes.create_string_buffer(data, len(data))
+        return self.DataBlob(len(data), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char))), buffer
+
+    def _call(self, function, data):
+        data_in, data_buffer = self._blob(data)
+        entropy, entropy_buffer = self._blob(self.ENTROPY)
+        data_out = self.DataBlob()
+        if not function(ctypes.byref(data_in), None, ctypes.byref(entropy), None, None,
+                        self.CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(data_out)):
+            raise KeyCacheError(f'DPAPI call failed ({ctypes.GetLastError()})')
+        try:
+            return ctypes.string_at(data_out.pbData, data_out.cbData)
+        finally:
+            ctypes.windll.kernel32.LocalFree(data_out.pbData)
+
+    def protect(self, data):
+        return self._call(ctypes.windll.crypt32.CryptProtectData, data)
+
+    def unprotect(self, data):
+        return self._call(ctypes.windll.crypt32.CryptUnprotectData, data)
+
+
+class SecretKeyProvider(KeyProvider):
+    """ Encrypt-then-MAC with an HMAC-SHA256 keystream, keyed by a local secret.
+
+    Used where DPAPI isn't available (and in tests); the secret must be kept as
+    private as the cache itself.
+    """
+    MAGIC = b'TSTPKC1'
+    NONCE_SIZE = 16
+    TAG_SIZE = 32
+
+    def __init__(self, secret):
+        self.encryption_key = hmac.new(secret, b'encryption', hashlib.sha256).digest()
+        self.mac_key = hmac.new(secret, b'authentication', hashlib.sha256).digest()
+
+    @classmethod
+    def from_file(cls, path):
+        """ Load the secret from path, creating it (readable by the owner only) if missing. """
+        try:
+            with open(path, 'rb') as file:
+                return cls(file.read())
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        secret = os.urandom(32)
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(secret)
+        return cls(secret)
+
+    def _xor_keystream(self, nonce, data):
+        blocks = []
+        for counter in range((len(data) + 31) // 32):
+            blocks.append(hmac.new(self.encryption_key, nonce + counter.to_bytes(8, 'big'), hashlib.sha256).digest())
+        keystream = b''.join(blocks)[:len(data)]
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big')
+
+    def protect(self, data):
+        nonce = os.urandom(self.NONCE_SIZE)
+        ciphertext = self._xor_keystream(nonce, data)
+        tag = hmac.new(self.mac_key, self.MAGIC + nonce + ciphertext, hashlib.sha256).digest()
+        return self.MAGIC + nonce + ciphertext + tag
+
+    def unprotect(self, data):
+        header = len(self.MAGIC) + self.NONCE_SIZE
+        if len(data) < header + self.TAG_SIZE or not data.startswith(self.MAGIC):
+            raise KeyCacheError('Key cache is not in a recognised format')
+        nonce, ciphertext, tag = data[len(self.MAGIC):header], data[header:-self.TAG_SIZE], data[-self.TAG_SIZE:]
+        expected = hmac.new(self.mac_key, self.MAGIC + nonce + ciphertext, hashlib.sha256).digest()
+        if not hmac.compare_digest(tag, expected):
+            raise KeyCacheError('Key cache failed its integrity check')
+        return self._xor_keystream(nonce, ciphertext)
+
+
+def default_key_provider(cache_dir=None):
+    if sys.platform == 'win32':
+        return DpapiKeyProvider()
+    return SecretKeyProvider.from_file(os.path.join(cache_dir or default_cache_dir(), 'key_cache.key'))
+
+
+def _fingerprint(value):
+    return tuple(value) if value is not None else None
+
+
+class KeyCache:
+    """ Encrypted on-disk map of profile name -> record, for instant warm starts.
+
+    An entry is only trusted while it is younger than max_age and, when the
+    backend can fingerprint the profile store, while its fingerprint matches.
+    Entries for profiles that disappear are evicted, and the oldest entries go
+    first once there are more than max_entries.
+    """
+    def __init__(self, path=None, key_provider=None, max_age=DEFAULT_MAX_AGE, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(default_cache_dir(), 'key_cache.bin')
+        self.key_provider = key_provider
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.profiles = []
+        self.entries = {}
+
+    def provider(self):
+        if self.key_provider is None:
+            self.key_provider = default_key_provider(os.path.dirname(self.path))
+        return self.key_provider
+
+    def load(self):
+        """ Read the cache from disk. Returns False, leaving it empty, if it is missing or unreadable. """
+        self.profiles, self.entries = [], {}
+        try:
+            with open(self.path, 'rb') as file:
+                payload = json.loads(self.provider().unprotect(file.read()).decode('utf-8'))
+        except (OSError, ValueError, KeyCacheError):
+            return False
+        if payload.get('version') != CACHE_VERSION:
+            return False
+        self.profiles = payload['profiles']
+        self.entries = {name: {'record': entry['record'], 'fingerprint': _fingerprint(entry['fingerprint']),
+                               'stored': entry['stored']}
+                        for name, entry in payload['entries'].items()}
+        return True
+
+    def save(self):
+        payload = {'version': CACHE_VERSION, 'profiles': self.profiles, 'entries': self.entries}
+        data = self.provider().protect(json.dumps(payload).encode('utf-8'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, self.path)
+
+    def records(self):
+        return {name: entry['record'] for name, entry in self.entries.items()}
+
+    def fingerprints(self):
+        return {name: entry['fingerprint'] for name, entry in self.entries.items() if entry['fingerprint']}
+
+    def store(self, record, fingerprint=None):
+        self.entries[record['name']] = {'record': record, 'fingerprint': _fingerprint(fingerprint),
+                                        'stored': time.time()}
+
+    def valid_profiles(self, profiles, fingerprints=None):
+        """ Names from profiles whose cached entry can still be trusted. """
+        now = time.time()
+        valid = set()
+        for profile in profiles:
+            entry = self.entries.get(profile)
+            if entry is None or now - entry['stored'] > self.max_age:
+                continue
+            if fingerprints and entry['fingerprint'] != _fingerprint(fingerprints.get(profile)):
+                continue
+            valid.add(profile)
+        return valid
+
+    def evict(self, profiles):
+        """ Drop entries for profiles that are gone or expired, then trim to max_entries. """
+        self.profiles = list(profiles)
+        present = set(profiles)
+        now = time.time()
+        self.entries = {name: entry for name, entry in self.entries.items()
+                        if name in present and now - entry['stored'] <= self.max_age}
+        if len(self.entries) > self.max_entries:
+            newest = sorted(self.entries, key=lambda name: self.entries[name]['stored'], reverse=True)
+            self.entries = {name: self.entries[name] for name in newest[:self.max_entries]}
+
+    def invalidate(self, profile=None):
+        if profile is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(profile, None)
+
+    def clear(self):
+        self.profiles, self.entries = [], {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,261 @@
+""" Wi-Fi networks read straight from NetworkManager and wpa_supplicant files.
+
+No subprocess is involved: every file is parsed in a single pass into the
+same records netsh profiles produce. All paths are looked up under a root
+so a copied or test tree can stand in for /.
+"""
+import glob
+import os
+import re
+
+from backends import ERROR_ACCESS_DENIED, ERROR_NOT_FOUND, ERROR_UNKNOWN, BackendError, ProfileBackend
+from netsh_parser import empty_profile_record
+
+NETWORKMANAGER_DIRS = ('etc/NetworkManager/system-connections', 'run/NetworkManager/system-connections')
+WPA_SUPPLICANT_PATTERNS = ('etc/wpa_supplicant/wpa_supplicant.conf', 'etc/wpa_supplicant/wpa_supplicant-*.conf',
+                           'etc/wpa_supplicant.conf')
+KEYFILE_SUFFIX = '.nmconnection'
+
+# key-mgmt / key_mgmt values -> the authentication names netsh uses.
+AUTHENTICATIONS = {
+    'wpa-psk': 'WPA2-Personal', 'sae': 'WPA3-Personal', 'wpa-eap': 'WPA2-Enterprise',
+    'wpa-eap-suite-b-192': 'WPA3-Enterprise', 'owe': 'OWE', 'ieee8021x': '802.1X',
+    'wpa-psk-sha256': 'WPA2-Personal', 'ft-psk': 'WPA2-Personal', 'ft-sae': 'WPA3-Personal',
+}
+NETWORK_TYPES = {'infrastructure': 'Infrastructure', 'adhoc': 'Ad hoc', 'ap': 'Access point',
+                 '0': 'Infrastructure', '1': 'Ad hoc', '2': 'Access point'}
+WIFI_TYPES = ('wifi', '802-11-wireless')
+
+KEYFILE_ESCAPES = {'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}
+KEYFILE_ESCAPE_PATTERN = re.compile(r'\\(.)')
+BYTE_LIST_PATTERN = re.compile(r'^(?:\d{1,3};)+\d{0,3}$')
+HEX_PATTERN = re.compile(r'^(?:[0-9a-fA-F]{2})+$')
+
+
+def _unescape_keyfile(value):
+    return KEYFILE_ESCAPE_PATTERN.sub(lambda match: KEYFILE_ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def _keyfile_ssid(value):
+    # Older NetworkManager versions store the SSID as a list of byte values.
+    if BYTE_LIST_PATTERN.match(value):
+        return bytes(int(byte) for byte in value.rstrip(';').split(';')).decode('utf-8', errors='replace')
+    return value
+
+
+def read_keyfile(text):
+    """ {section: {key: value}} of a GLib keyfile, with escapes undone. """
+    sections = {}
+    section = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            section = sections.setdefault(line[1:-1], {})
+        elif section is not None and '=' in line:
+            key, value = line.split('=', 1)
+            section[key.strip()] = _unescape_keyfile(value.strip())
+    return sections
+
+
+def parse_keyfile(text):
+    """ Record of a NetworkManager Wi-Fi connection, or None for other connection types. """
+    sections = read_keyfile(text)
+    connection = sections.get('connection', {})
+    if connection.get('type') not in WIFI_TYPES:
+        return None
+    wifi = sections.get('wifi') or sections.get('802-11-wireless') or {}
+    security = sections.get('wifi-security') or sections.get('802-11-wireless-security') or {}
+    record = empty_profile_record(connection.get('id', ''))
+    record['ssid'] = _keyfile_ssid(wifi.get('ssid', '')) or record['name']
+    record['network_type'] = NETWORK_TYPES.get(wifi.get('mode', 'infrastructure'), wifi.get('mode', ''))
+    record['connection_mode'] = ('Connect manually' if connection.get('autoconnect', 'true').lower() == 'false'
+                                 else 'Connect automatically')
+    record['interface'] = connection.get('interface-name', '')
+    key_management = security.get('key-mgmt', '').lower()
+    if not key_management:
+        record['authentication'], record['cipher'] = 'Open', 'None'
+    elif key_management == 'none':
+        record['authentication'], record['cipher'] = 'Open', 'WEP'
+        index = security.get('wep-tx-keyidx', '0')
+        record['key'] = security.get(f'wep-key{index}', '')
+    else:
+        record['authentication'] = AUTHENTICATIONS.get(key_management, key_management.upper())
+        record['cipher'] = ' '.join(part.upper() for part in security.get('pairwise', '').split(';') if part)
+        # No psk when psk-flags hands the secret to an agent such as a keyring.
+        record['key'] = security.get('psk', '')
+    record['security_key'] = 'Present' if record['key'] else 'Absent'
+    return record
+
+
+def _wpa_value(value):
+    """ A wpa_supplicant value: "quoted text", P"printf-escaped text", or bare (hex or a number). """
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    if len(value) >= 3 and value.startswith('P"') and value.endswith('"'):
+        return value[2:-1].encode('latin-1', errors='replace').decode('unicode_escape')
+    return value
+
+
+def _wpa_ssid(value):
+    if not value.startswith(('"', 'P"')) and HEX_PATTERN.match(value):
+        return bytes.fromhex(value).decode('utf-8', errors='replace')
+    return _wpa_value(value)
+
+
+def parse_wpa_supplicant(text, interface=''):
+    """ Records of every network={...} block in a wpa_supplicant.conf. """
+    records = []
+    network = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if network is None:
+            if line.replace(' ', '') == 'network={':
+                network = {}
+            continue
+        if line == '}':
+            records.append(_wpa_record(network, interface))
+            network = None
+        elif '=' in line:
+            key, value = line.split('=', 1)
+            network[key.strip()] = value.strip()
+    return records
+
+
+def _wpa_record(network, interface):
+    ssid = _wpa_ssid(network.get('ssid', ''))
+    record = empty_profile_record(ssid)
+    record['interface'] = interface
+    record['network_type'] = NETWORK_TYPES.get(network.get('mode', '0'), '')
+    record['connection_mode'] = 'Connect manually' if network.get('disabled') == '1' else 'Connect automatically'
+    key_management = network.get('key_mgmt', 'WPA-PSK WPA-EAP').split()[0].lower()
+    if key_management == 'none':
+        index = network.get('wep_tx_keyidx', '0')
+        wep_key = network.get(f'wep_key{index}')
+        record['authentication'], record['cipher'] = 'Open', 'WEP' if wep_key else 'None'
+        record['key'] = _wpa_value(wep_key) if wep_key else ''
+    else:
+        record['authentication'] = AUTHENTICATIONS.get(key_management, key_management.upper())
+        record['cipher'] = network.get('pairwise', '')
+        # An unquoted psk is the 64 hex digit raw key; it is kept as it is.
+        record['key'] = _wpa_value(network.get('sae_password', network.get('psk', '')))
+    record['security_key'] = 'Present' if record['key'] else 'Absent'
+    return record
+
+
+def _read_text(path):
+    """ Contents of path; a BackendError names the file when it can't be read. """
+    try:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            return file.read()
+    except PermissionError as e:
+        raise BackendError(f'Permission denied reading {path} (try running as root)', ERROR_ACCESS_DENIED) from e
+    except FileNotFoundError as e:
+        raise BackendError(f'{path} no longer exists', ERROR_NOT_FOUND) from e
+    except OSError as e:
+        raise BackendError(f'Could not read {path}: {e}', ERROR_UNKNOWN) from e
+
+
+class LinuxBackend(ProfileBackend):
+    """ Reads every saved network from NetworkManager and wpa_supplicant files under root.
+
+    A file that can't be read is listed as a profile of its own, named after
+    the file, whose lookup fails with the reason, so unreadable files are
+    reported one by one like any other failed lookup. Networks saved in both
+    stores are listed once, NetworkManager's copy first.
+    """
+    bulk = True
+
+    def __init__(self, root='/'):
+        self.root = root
+        self.timeout = None
+        # Watched for changes by the GUI; wpa_supplicant files are only read on refresh.
+        self.profile_store = os.path.join(root, NETWORKMANAGER_DIRS[0])
+        self.records = {}
+        self.errors = {}
+        self.paths = {}
+
+    def keyfile_paths(self):
+        paths = []
+        for folder in NETWORKMANAGER_DIRS:
+            try:
+                names = sorted(os.listdir(os.path.join(self.root, folder)))
+            except OSError:
+                continue
+            paths += [os.path.join(self.root, folder, name) for name in names if name.endswith(KEYFILE_SUFFIX)]
+        return paths
+
+    def wpa_supplicant_paths(self):
+        paths = []
+        for pattern in WPA_SUPPLICANT_PATTERNS:
+            paths += sorted(glob.glob(os.path.join(glob.escape(self.root), pattern)))
+        return paths
+
+    def load(self):
+        """ Read every store. Returns the profile names, in order. """
+        records, errors, paths = {}, {}, {}
+        for path in self.keyfile_paths():
+            try:
+                record = parse_keyfile(_read_text(path))
+            except BackendError as e:
+                name = os.path.basename(path)[:-len(KEYFILE_SUFFIX)]
+                errors.setdefault(name, e)
+                paths.setdefault(name, path)
+                continue
+            if record is not None and record['name'] not in records:
+                records[record['name']] = record
+                paths[record['name']] = path
+        for path in self.wpa_supplicant_paths():
+            # wpa_supplicant-wlan0.conf holds the networks of wlan0.
+            match = re.match(r'^wpa_supplicant-(.+)\.conf$', os.path.basename(path))
+            try:
+                found = parse_wpa_supplicant(_read_text(path), match.group(1) if match else '')
+            except BackendError as e:
+                errors.setdefault(os.path.basename(path), e)
+                paths.setdefault(os.path.basename(path), path)
+                continue
+            for record in found:
+                if record['name'] and record['name'] not in records:
+                    records[record['name']] = record
+                    paths[record['name']] = path
+        self.records, self.errors, self.paths = records, errors, paths
+        return list(paths)
+
+    def list_profiles(self):
+        return self.load()
+
+    def fetch_profile(self, profile):
+        self.load()
+        return self.lookup(profile)
+
+    def lookup(self, profile):
+        if profile in self.errors:
+            raise self.errors[profile]
+        try:
+            return dict(self.records[profile])
+        except KeyError:
+            raise BackendError(f'No saved network named "{profile}"', ERROR_NOT_FOUND) from None
+
+    def fetch_profiles(self, profiles):
+        # Files are cheap to read, so every lookup sees them as they are now.
+        self.load()
+        for profile in profiles:
+            try:
+                yield profile, self.lookup(profile), None
+            except BackendError as e:
+                yield profile, None, e
+
+    def profile_fingerprints(self):
+        # Called on its own when the watcher sees a change, so the stores are read again first.
+        self.load()
+        fingerprints = {}
+        for profile, path in self.paths.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            fingerprints[profile] = (path, stat.st_mtime_ns, stat.st_size)
+        return fingerprints
@@ -1,18 +1,47 @@
+import time
+# Taken before anything else is imported so --profile-startup can report import time.
+STARTUP_STARTED = time.perf_counter()
+
+import argparse
+import asyncio
 import ctypes
-import sys
-import subprocess
+import html
 import json
+import multiprocessing
+import sys
 import os
-import csv
+import queue
+import threading
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    if '--cli' in sys.argv[1:]:
+        # Headless mode is dispatched before any Qt module is imported.
+        import cli
+        sys.exit(cli.main([argument for argument in sys.argv[1:] if argument != '--cli']))
+
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QApplication, QInputDialog, QWidget, QVBoxLayout, QPushButton, QTextEdit, 
+from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QTextEdit, 
                              QMessageBox, QGroupBox, QFormLayout, QLineEdit, QHBoxLayout, 
-                             QScrollArea, QDialog, QDialogButtonBox, QCheckBox, QFileDialog,
-                             QComboBox, QLabel, QProgressBar, QMenuBar, QAction, QMainWindow, QFrame)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from _pytest.junitxml import ET
+                             QDialog, QDialogButtonBox, QFileDialog, QTableView, QHeaderView,
+                             QAbstractItemView, QStyledItemDelegate, QStyleOptionButton, QStyle,
+                             QComboBox, QLabel, QProgressBar, QMenuBar, QAction, QMainWindow, QTextBrowser,
+                             QCheckBox, QTableWidget, QTableWidgetItem, QCompleter)
+from PyQt5.QtCore import (Qt, QObject, QThread, QTimer, QFileSystemWatcher, pyqtSignal, QAbstractTableModel,
+                          QModelIndex, QSortFilterProxyModel, QIdentityProxyModel, QEvent)
+from PyQt5.QtGui import QIcon, QFont, QTextDocument
+import instrumentation
+from backends import BACKEND_NAMES, DEFAULT_BACKEND, DEFAULT_NETSH_TIMEOUT, BackendError, make_backend
+from cli import directory
+from exporters import (EXPORTERS, ExportCancelled, ExportError, available_compressions, export_records,
+                       export_targets, file_filter)
+from key_cache import KeyCache, KeyCacheError
+from profile_diff import diff_profiles
+from snapshots import SnapshotError, SnapshotStore
+from search_index import SearchIndex
+from retrieval import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE, DEFAULT_MAX_WORKERS, make_engine, retrieve_profiles
+
+STARTUP_IMPORTED = time.perf_counter()
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -20,33 +49,572 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 class PasswordRetriever(QThread):
-    password_retrieved = pyqtSignal(str, str, str)
+    # Results are coalesced into batches of (profile, record, error) tuples so the
+    # GUI thread gets one queued signal per batch instead of one per profile.
+    passwords_retrieved = pyqtSignal(list)
     progress_updated = pyqtSignal(int)
 
-    def __init__(self, profiles):
+    BATCH_SIZE = 25
+    BATCH_INTERVAL = 0.05
+
+    def __init__(self, backend, profiles, mode=DEFAULT_RETRIEVAL_MODE, max_workers=DEFAULT_MAX_WORKERS):
         super().__init__()
+        self.backend = backend
         self.profiles = profiles
+        self.mode = mode
+        self.max_workers = max_workers
+        self.cancelled = False
+        self.engine = make_engine(backend, max_workers) if mode == 'async' and not backend.bulk else None
+
+    def cancel(self):
+        """ Ask the retrieval to stop; safe to call from the GUI thread. """
+        self.cancelled = True
+        if self.engine is not None:
+            self.engine.cancel()
 
     def run(self):
-        for i, profile in enumerate(self.profiles):
+        self.batch = []
+        self.done = 0
+        self.last_flush = time.monotonic()
+        # Pending results are also flushed every BATCH_INTERVAL, so finished rows never wait on a slow lookup.
+        if self.engine is not None:
+            # The event loop lives in this thread; results arrive in completion order.
+            asyncio.run(self.run_engine())
+        else:
+            self.run_pool()
+        if self.batch:
+            self.flush()
+
+    async def run_engine(self):
+        loop = asyncio.get_running_loop()
+        timer = None
+
+        def tick():
+            nonlocal timer
+            if self.batch:
+                self.flush()
+            timer = loop.call_later(self.BATCH_INTERVAL, tick)
+
+        timer = loop.call_later(self.BATCH_INTERVAL, tick)
+        try:
+            await self.engine.run(self.profiles, self.add_result)
+        finally:
+            timer.cancel()
+
+    def run_pool(self):
+        results = queue.Queue()
+        finished = object()
+
+        failure = []
+
+        def feed():
+            generator = retrieve_profiles(self.backend, self.profiles, self.mode, self.max_workers, ordered=False)
+            try:
+                for result in generator:
+                    results.put(result)
+                    if self.cancelled:
+                        break
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                generator.close()
+                results.put(finished)
+
+        feeder = threading.Thread(target=feed, name='retrieval-feed', daemon=True)
+        feeder.start()
+        while True:
             try:
-                result = subprocess.check_output(f'netsh wlan show profile "{profile}" key=clear', shell=True, text=True, stderr=subprocess.DEVNULL)
-                password_line = [line for line in result.split('\n') if 'Key Content' in line]
-                if password_line:
-                    password = password_line[0].split(':')[1].strip()
+                result = results.get(timeout=self.BATCH_INTERVAL)
+            except queue.Empty:
+                if self.batch:
+                    self.flush()
+                continue
+            if result is finished:
+                break
+            self.add_result(*result)
+        feeder.join()
+        if failure:
+            raise failure[0]
+
+    def add_result(self, profile, record, error):
+        self.batch.append((profile, record, error))
+        self.done += 1
+        # The very first result is flushed on its own so a row fills in as early as possible.
+        if (self.done == 1 or len(self.batch) >= self.BATCH_SIZE
+                or time.monotonic() - self.last_flush >= self.BATCH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        self.passwords_retrieved.emit(self.batch)
+        self.progress_updated.emit(int(self.done / len(self.profiles) * 100))
+        self.batch = []
+        self.last_flush = time.monotonic()
+
+class KeyResolver(QObject):
+    """ Fetches keys on demand, for lazy mode.
+
+    A profile is looked up at most once at a time: asking for one that is
+    already queued or being fetched just waits for that lookup. Queued
+    profiles are fetched in batches by a PasswordRetriever, one batch at a
+    time. Results go out through passwords_retrieved; remembering them is up
+    to the receiver.
+    """
+    passwords_retrieved = pyqtSignal(list)
+    progress_updated = pyqtSignal(int)
+    idle = pyqtSignal()
+
+    def __init__(self, backend, mode=DEFAULT_RETRIEVAL_MODE, max_workers=DEFAULT_MAX_WORKERS, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.mode = mode
+        self.max_workers = max_workers
+        self.queued = []
+        # Queued or being fetched.
+        self.in_flight = set()
+        # [profiles still awaited, callback] per resolve() call that gave a callback.
+        self.requests = []
+        self.retriever = None
+
+    def resolve(self, profiles, callback=None):
+        """ Fetch profiles, then call callback() once all of them have a result. Returns the profiles newly queued. """
+        profiles = list(dict.fromkeys(profiles))
+        if callback is not None:
+            if profiles:
+                self.requests.append([set(profiles), callback])
+            else:
+                callback()
+        queued = [profile for profile in profiles if profile not in self.in_flight]
+        self.in_flight.update(queued)
+        self.queued += queued
+        self.start_next()
+        return queued
+
+    def start_next(self):
+        if self.retriever is not None or not self.queued:
+            return
+        profiles, self.queued = self.queued, []
+        self.retriever = PasswordRetriever(self.backend, profiles, self.mode, self.max_workers)
+        self.retriever.passwords_retrieved.connect(self.on_passwords_retrieved)
+        self.retriever.progress_updated.connect(self.progress_updated)
+        self.retriever.finished.connect(self.on_retriever_finished)
+        self.retriever.start()
+
+    def on_passwords_retrieved(self, results):
+        self.passwords_retrieved.emit(results)
+        done = {profile for profile, _, _ in results}
+        self.in_flight -= done
+        for request in self.requests:
+            request[0] -= done
+        callbacks = [callback for waiting, callback in self.requests if not waiting]
+        self.requests = [request for request in self.requests if request[0]]
+        for callback in callbacks:
+            callback()
+
+    def on_retriever_finished(self):
+        self.retriever = None
+        if self.queued:
+            self.start_next()
+        else:
+            self.idle.emit()
+
+    def cancel(self):
+        """ Drop everything queued and stop the running batch; waiting callbacks are never called. """
+        self.queued = []
+        self.requests = []
+        self.in_flight = set()
+        retriever, self.retriever = self.retriever, None
+        if retriever is None:
+            return
+        retriever.passwords_retrieved.disconnect(self.on_passwords_retrieved)
+        retriever.progress_updated.disconnect(self.progress_updated)
+        retriever.finished.disconnect(self.on_retriever_finished)
+        retriever.cancel()
+        retriever.wait()
+
+class ExportWorker(QThread):
+    """ Writes records to one or more (path, format) targets off the GUI thread. """
+    progress_updated = pyqtSignal(int)
+    export_finished = pyqtSignal(int)
+    # Carries the error message, or '' when the export was cancelled.
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, targets, records):
+        super().__init__()
+        self.targets = targets
+        self.records = records
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        total = len(self.records) or 1
+        try:
+            count = export_targets(self.targets, self.records,
+                                   lambda done: self.progress_updated.emit(int(done / total * 100)), self.cancelled)
+        except ExportCancelled:
+            self.export_failed.emit('')
+        except (OSError, ExportError) as e:
+            self.export_failed.emit(str(e))
+        else:
+            self.progress_updated.emit(100)
+            self.export_finished.emit(count)
+
+class RefreshScheduler(QObject):
+    """ Runs at most one refresh at a time and queues at most one more.
+
+    Requests are debounced, so a burst of clicks becomes a single refresh.
+    A request made while a refresh is running is remembered and run once it
+    finishes; further requests fold into that same follow-up.
+    """
+    IDLE, RUNNING, QUEUED = 'idle', 'running', 'queued'
+    DEBOUNCE_INTERVAL = 250
+
+    state_changed = pyqtSignal(str)
+
+    def __init__(self, refresh, parent=None):
+        super().__init__(parent)
+        # Starts a refresh; the owner reports the end of it through finished().
+        self.refresh = refresh
+        self.state = self.IDLE
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_INTERVAL)
+        self.debounce_timer.timeout.connect(self.trigger)
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(state)
+
+    def request(self):
+        self.debounce_timer.start()
+
+    def trigger(self):
+        if self.state == self.IDLE:
+            self.run()
+        else:
+            self.set_state(self.QUEUED)
+
+    def run(self):
+        self.set_state(self.RUNNING)
+        self.refresh()
+
+    def started(self):
+        """ Work began outside of request(), e.g. the initial load; later requests wait for it. """
+        if self.state == self.IDLE:
+            self.set_state(self.RUNNING)
+
+    def finished(self):
+        if self.state == self.QUEUED:
+            self.set_state(self.RUNNING)
+            # Let the finished refresh unwind before the follow-up starts.
+            QTimer.singleShot(0, self.refresh)
+        else:
+            self.set_state(self.IDLE)
+
+    def stop(self):
+        self.debounce_timer.stop()
+        self.set_state(self.IDLE)
+
+class NetworkListModel(QAbstractTableModel):
+    NAME_COLUMN, PASSWORD_COLUMN, SHOW_COLUMN, COPY_COLUMN = range(4)
+    HEADERS = ['Network', 'Password', '', '']
+    MASK_CHARACTER = '\u25cf'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.profiles = []
+        self.rows = {}
+        self.passwords = {}
+        # Profiles whose key hasn't arrived yet.
+        self.pending = set()
+        # Per-profile view state, keyed by name so it survives row changes.
+        self.collapsed = set()
+        self.revealed = set()
+
+    def set_profiles(self, profiles, passwords, pending=False):
+        self.beginResetModel()
+        self.profiles = list(profiles)
+        self.rows = {profile: row for row, profile in enumerate(self.profiles)}
+        self.passwords = dict(passwords)
+        self.pending = set(self.profiles) - set(self.passwords) if pending else set()
+        self.collapsed &= set(self.profiles)
+        self.revealed &= set(self.profiles)
+        self.endResetModel()
+
+    def update_passwords(self, results):
+        """ Fill in a batch of (profile, record, error) results with a single dataChanged. """
+        changed_rows = []
+        for profile, record, error in results:
+            row = self.rows.get(profile)
+            if row is None:
+                continue
+            self.passwords[profile] = record['key'] if record else ''
+            self.pending.discard(profile)
+            changed_rows.append(row)
+        if changed_rows:
+            self.emit_rows_changed(min(changed_rows), max(changed_rows))
+
+    def mark_pending(self, profiles):
+        """ Show profiles as loading until their key arrives. """
+        rows = [self.rows[profile] for profile in profiles if profile in self.rows]
+        self.pending.update(profile for profile in profiles if profile in self.rows)
+        if rows:
+            self.emit_rows_changed(min(rows), max(rows))
+
+    def forget_passwords(self, profiles):
+        """ Drop keys that are out of date; the rows stay, without a key, until it is fetched again. """
+        rows = []
+        for profile in profiles:
+            row = self.rows.get(profile)
+            if row is None:
+                continue
+            self.passwords.pop(profile, None)
+            self.pending.discard(profile)
+            self.revealed.discard(profile)
+            rows.append(row)
+        if rows:
+            self.emit_rows_changed(min(rows), max(rows))
+
+    def apply_diff(self, diff, profiles):
+        """ Apply a ProfileDiff row by row so untouched rows, and their state, are left alone.
+
+        profiles is the new listing; added rows are inserted where it has them.
+        """
+        for old_name, new_name in diff.renamed:
+            row = self.rows.pop(old_name)
+            self.profiles[row] = new_name
+            self.rows[new_name] = row
+            if old_name in self.passwords:
+                self.passwords[new_name] = self.passwords.pop(old_name)
+            for state in (self.pending, self.collapsed, self.revealed):
+                if old_name in state:
+                    state.discard(old_name)
+                    state.add(new_name)
+            self.emit_rows_changed(row, row)
+
+        removed_rows = sorted((self.rows.pop(profile) for profile in diff.removed if profile in self.rows),
+                              reverse=True)
+        # Highest row first, so the rows still to be removed keep their index.
+        for row in removed_rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            profile = self.profiles.pop(row)
+            self.passwords.pop(profile, None)
+            for state in (self.pending, self.collapsed, self.revealed):
+                state.discard(profile)
+            self.endRemoveRows()
+        if removed_rows:
+            for row in range(removed_rows[-1], len(self.profiles)):
+                self.rows[self.profiles[row]] = row
+
+        if diff.added:
+            added = set(diff.added)
+            indexes = [row for row, profile in enumerate(profiles) if profile in added]
+            # One insertion per run of consecutive new rows, in listing order, so each index is already right.
+            start = 0
+            while start < len(indexes):
+                end = start
+                while end + 1 < len(indexes) and indexes[end + 1] == indexes[end] + 1:
+                    end += 1
+                first, last = indexes[start], indexes[end]
+                self.beginInsertRows(QModelIndex(), first, last)
+                self.profiles[first:first] = profiles[first:last + 1]
+                self.pending.update(profiles[first:last + 1])
+                self.endInsertRows()
+                start = end + 1
+            for row in range(indexes[0], len(self.profiles)):
+                self.rows[self.profiles[row]] = row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.profiles)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def profile_at(self, row):
+        return self.profiles[row]
+
+    def password_at(self, row):
+        return self.passwords.get(self.profiles[row], '')
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.NAME_COLUMN:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        profile = self.profiles[index.row()]
+        column = index.column()
+        if column == self.NAME_COLUMN:
+            if role == Qt.DisplayRole:
+                return profile
+            if role == Qt.CheckStateRole:
+                return Qt.Unchecked if profile in self.collapsed else Qt.Checked
+            return None
+        if profile in self.collapsed or role != Qt.DisplayRole:
+            return None
+        if profile in self.pending:
+            return 'Loading...' if column == self.PASSWORD_COLUMN else None
+        if column == self.PASSWORD_COLUMN:
+            password = self.passwords.get(profile, '')
+            return password if profile in self.revealed else self.MASK_CHARACTER * len(password)
+        if column == self.SHOW_COLUMN:
+            return 'Hide' if profile in self.revealed else 'Show'
+        return 'Copy'
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if index.isValid() and index.column() == self.NAME_COLUMN and role == Qt.CheckStateRole:
+            profile = self.profiles[index.row()]
+            if value == Qt.Checked:
+                self.collapsed.discard(profile)
+            else:
+                self.collapsed.add(profile)
+            self.emit_rows_changed(index.row(), index.row())
+            return True
+        return False
+
+    def emit_rows_changed(self, first, last):
+        if self.profiles:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, self.columnCount() - 1))
+
+    def toggle_revealed(self, row):
+        profile = self.profiles[row]
+        if profile in self.revealed:
+            self.revealed.discard(profile)
+        else:
+            self.revealed.add(profile)
+        self.emit_rows_changed(row, row)
+
+    def all_expanded(self):
+        return not self.collapsed
+
+    def set_all_expanded(self, expanded):
+        self.collapsed = set() if expanded else set(self.profiles)
+        self.emit_rows_changed(0, len(self.profiles) - 1)
+
+    def set_all_revealed(self, revealed):
+        self.revealed = set(self.profiles) if revealed else set()
+        self.emit_rows_changed(0, len(self.profiles) - 1)
+
+class CompactListProxyModel(QIdentityProxyModel):
+    """ The network list as the compact dropdown sees it: names only, without the expand checkboxes. """
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.CheckStateRole:
+            return None
+        return super().data(index, role)
+
+    def flags(self, index):
+        return super().flags(index) & ~Qt.ItemIsUserCheckable
+
+class NetworkItemDelegate(QStyledItemDelegate):
+    """ Paints the Show/Copy columns as buttons and turns clicks on them into signals. """
+    show_clicked = pyqtSignal(QModelIndex)
+    copy_clicked = pyqtSignal(QModelIndex)
+
+    def button_rect(self, option):
+        return option.rect.adjusted(4, 2, -4, -2)
+
+    def paint(self, painter, option, index):
+        if index.column() not in (NetworkListModel.SHOW_COLUMN, NetworkListModel.COPY_COLUMN):
+            super().paint(painter, option, index)
+            return
+        text = index.data()
+        if not text:
+            return
+        button = QStyleOptionButton()
+        button.rect = self.button_rect(option)
+        button.text = text
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if index.column() in (NetworkListModel.SHOW_COLUMN, NetworkListModel.COPY_COLUMN):
+            if (event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton
+                    and index.data() and self.button_rect(option).contains(event.pos())):
+                if index.column() == NetworkListModel.SHOW_COLUMN:
+                    self.show_clicked.emit(index)
                 else:
-                    password = ''
-                self.password_retrieved.emit(profile, password, '')
-            except subprocess.CalledProcessError as e:
-                self.password_retrieved.emit(profile, '', str(e))
-            self.progress_updated.emit(int((i + 1) / len(self.profiles) * 100))
+                    self.copy_clicked.emit(index)
+                return True
+            return False
+        # The name column's check box expands and collapses the row.
+        return super().editorEvent(event, model, option, index)
+
+class NetworkFilterProxyModel(QSortFilterProxyModel):
+    """ Shows only the profiles a SearchIndex matched, in its ranking order when given one.
+
+    Matches are kept by profile name, so rows inserted or removed before a
+    new search runs can't shift them onto other networks.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ranks = None
+
+    def set_matches(self, matches, ranked=False):
+        """ matches: profile names, best first, or None to show every row. """
+        self.ranks = None if matches is None else {profile: rank for rank, profile in enumerate(matches)}
+        self.invalidateFilter()
+        self.sort(NetworkListModel.NAME_COLUMN if ranked and matches is not None else -1)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.ranks is None or self.sourceModel().profile_at(source_row) in self.ranks
+
+    def lessThan(self, left, right):
+        if self.ranks is None:
+            # Clearing a ranked search re-sorts once more before sorting is switched off.
+            return left.row() < right.row()
+        model = self.sourceModel()
+        return (self.ranks.get(model.profile_at(left.row()), 0)
+                < self.ranks.get(model.profile_at(right.row()), 0))
 
 class NetworkPassTool(QMainWindow):
-    def __init__(self):
+    def __init__(self, backend=None, retrieval_mode=DEFAULT_RETRIEVAL_MODE, max_workers=DEFAULT_MAX_WORKERS,
+                 key_cache=None, web_tutorial=False, snapshot_store=None, lazy=False):
         super().__init__()
+        self.backend = backend or make_backend()
+        # None bypasses the on-disk key cache entirely.
+        self.key_cache = key_cache
+        # Every completed scan is saved here; None turns snapshots off.
+        self.snapshot_store = snapshot_store
         self.profiles = []
         self.passwords = {}
+        self.metadata = {}
+        self.fingerprints = {}
+        self.search_index = SearchIndex()
+        self.search_index_dirty = True
+        self.fuzzy_search = False
         self.compact_mode = False
+        self.tutorial_window = None
+        self.web_tutorial = web_tutorial
+        self.retrieval_mode = retrieval_mode
+        self.max_workers = max_workers
+        self.password_retriever = None
+        # Profiles the running retrieval hasn't reported yet.
+        self.outstanding = set()
+        # Profile name -> BackendError from the last lookup that failed.
+        self.retrieval_errors = {}
+        self.refresh_scheduler = RefreshScheduler(self.refresh_profiles, self)
+        # In lazy mode only names are listed up front; a key is fetched when it is shown, copied or exported.
+        self.lazy = lazy
+        self.key_resolver = KeyResolver(self.backend, retrieval_mode, max_workers, self)
+        self.key_resolver.passwords_retrieved.connect(self.on_passwords_retrieved)
+        self.key_resolver.idle.connect(self.save_key_cache)
+        # Export waiting for lazy keys to be fetched.
+        self.export_waiting = False
+        self.profile_store_watcher = None
+        self.export_worker = None
         self.initUI()
 
     def initUI(self):
@@ -64,7 +632,7 @@ class NetworkPassTool(QMainWindow):
 
         self.create_menu()
         self.create_search_bar()
-        self.create_scroll_area()
+        self.create_network_view()
         self.create_bottom_buttons()
         self.create_status_bar()
 
@@ -74,12 +642,22 @@ class NetworkPassTool(QMainWindow):
         file_menu = self.menu_bar.addMenu('File')
         
         refresh_action = QAction('Refresh Profiles', self)
-        refresh_action.triggered.connect(self.refresh_profiles)
+        refresh_action.triggered.connect(self.refresh_scheduler.request)
         file_menu.addAction(refresh_action)
 
         export_action = QAction('Export Passwords', self)
         export_action.triggered.connect(self.export_passwords)
         file_menu.addAction(export_action)
+
+        compare_action = QAction('Compare Snapshots...', self)
+        compare_action.setEnabled(self.snapshot_store is not None)
+        compare_action.triggered.connect(self.compare_snapshots)
+        file_menu.addAction(compare_action)
+
+        clear_cache_action = QAction('Clear Key Cache', self)
+        clear_cache_action.setEnabled(self.key_cache is not None)
+        clear_cache_action.triggered.connect(self.clear_key_cache)
+        file_menu.addAction(clear_cache_action)
         
         exit_action = QAction('Exit', self)
         exit_action.triggered.connect(self.close)
@@ -91,37 +669,94 @@ class NetworkPassTool(QMainWindow):
         compact_mode_action.triggered.connect(self.toggle_compact_mode)
         view_menu.addAction(compact_mode_action)
 
+        fuzzy_search_action = QAction('Fuzzy Search', self)
+        fuzzy_search_action.setCheckable(True)
+        fuzzy_search_action.toggled.connect(self.set_fuzzy_search)
+        view_menu.addAction(fuzzy_search_action)
+
+        lazy_action = QAction('Fetch Keys On Demand', self)
+        lazy_action.setCheckable(True)
+        lazy_action.setChecked(self.lazy)
+        lazy_action.toggled.connect(self.set_lazy)
+        view_menu.addAction(lazy_action)
+
+        self.watch_action = QAction('Watch Profile Store', self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.setEnabled(bool(getattr(self.backend, 'profile_store', None)))
+        self.watch_action.toggled.connect(self.set_watching)
+        view_menu.addAction(self.watch_action)
+
         help_menu = self.menu_bar.addMenu('Help')
         tutorial_action = QAction('Show Tutorial', self)
         tutorial_action.triggered.connect(self.open_np_tutorial)
         help_menu.addAction(tutorial_action)
+
+        diagnostics_action = QAction('Diagnostics', self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        help_menu.addAction(diagnostics_action)
         
+    def show_diagnostics(self):
+        DiagnosticsDialog(self).exec_()
+
     def open_np_tutorial(self):
-        tutorial_window = TutorialWindow(self)
-        tutorial_window.exec_() 
+        # Kept after the first opening so its rendered pages are reused.
+        if self.tutorial_window is None:
+            self.tutorial_window = TutorialWindow(self, self.web_tutorial)
+        self.tutorial_window.go_to_home_page()
+        self.tutorial_window.exec_() 
 
     def create_search_bar(self):
         search_layout = QHBoxLayout()
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText('Search networks...')
-        self.search_bar.textChanged.connect(self.filter_networks)
+        self.search_bar.textChanged.connect(self.schedule_filter)
         search_layout.addWidget(self.search_bar)
+        # Filtering runs once typing pauses rather than on every keystroke.
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(120)
+        self.filter_timer.timeout.connect(self.filter_networks)
         self.layout.addLayout(search_layout)
 
-    def create_scroll_area(self):
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.network_container = QWidget()
-        self.network_layout = QVBoxLayout()
-        self.network_container.setLayout(self.network_layout)
-        self.scroll_area.setWidget(self.network_container)
-        self.layout.addWidget(self.scroll_area)
+    def create_network_view(self):
+        self.network_model = NetworkListModel(self)
+        self.network_model.modelReset.connect(self.invalidate_search_index)
+        self.network_model.rowsInserted.connect(self.invalidate_search_index)
+        self.network_model.rowsRemoved.connect(self.invalidate_search_index)
+        self.network_proxy = NetworkFilterProxyModel(self)
+        self.network_proxy.setSourceModel(self.network_model)
+
+        self.network_delegate = NetworkItemDelegate(self)
+        self.network_delegate.show_clicked.connect(self.on_show_clicked)
+        self.network_delegate.copy_clicked.connect(self.on_copy_clicked)
+
+        # A table view only paints the rows that are visible, however many profiles there are.
+        self.network_view = QTableView()
+        self.network_view.setModel(self.network_proxy)
+        self.network_view.setItemDelegate(self.network_delegate)
+        self.network_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.network_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.network_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.network_view.setShowGrid(False)
+        self.network_view.setWordWrap(False)
+        self.network_view.verticalHeader().hide()
+        self.network_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.network_view.verticalHeader().setDefaultSectionSize(34)
+        header = self.network_view.horizontalHeader()
+        header.setSectionResizeMode(NetworkListModel.NAME_COLUMN, QHeaderView.Stretch)
+        header.setSectionResizeMode(NetworkListModel.PASSWORD_COLUMN, QHeaderView.Fixed)
+        header.setSectionResizeMode(NetworkListModel.SHOW_COLUMN, QHeaderView.Fixed)
+        header.setSectionResizeMode(NetworkListModel.COPY_COLUMN, QHeaderView.Fixed)
+        header.resizeSection(NetworkListModel.PASSWORD_COLUMN, 300)
+        header.resizeSection(NetworkListModel.SHOW_COLUMN, 85)
+        header.resizeSection(NetworkListModel.COPY_COLUMN, 85)
+        self.layout.addWidget(self.network_view)
 
     def create_bottom_buttons(self):
         self.button_layout_bottom = QHBoxLayout()
         
         self.refresh_button = QPushButton('Refresh Profiles')
-        self.refresh_button.clicked.connect(self.refresh_profiles)
+        self.refresh_button.clicked.connect(self.refresh_scheduler.request)
         self.button_layout_bottom.addWidget(self.refresh_button)
 
         self.toggle_all_button = QPushButton('Toggle All')
@@ -143,93 +778,250 @@ class NetworkPassTool(QMainWindow):
         self.layout.addLayout(self.button_layout_bottom)
 
     def create_status_bar(self):
+        status_layout = QHBoxLayout()
         self.status_bar = QLabel('Ready')
-        self.layout.addWidget(self.status_bar)
-
+        status_layout.addWidget(self.status_bar, 1)
+        self.refresh_state_label = QLabel()
+        status_layout.addWidget(self.refresh_state_label)
+        self.layout.addLayout(status_layout)
+        self.refresh_scheduler.state_changed.connect(self.show_refresh_state)
+        self.show_refresh_state(self.refresh_scheduler.state)
+
+        progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
-        self.layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_export_button = QPushButton('Cancel Export')
+        self.cancel_export_button.setVisible(False)
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        progress_layout.addWidget(self.cancel_export_button)
+        self.key_resolver.progress_updated.connect(self.progress_bar.setValue)
+        self.layout.addLayout(progress_layout)
+
+    def show_refresh_state(self, state):
+        self.refresh_state_label.setText({RefreshScheduler.IDLE: 'Idle', RefreshScheduler.RUNNING: 'Refreshing',
+                                          RefreshScheduler.QUEUED: 'Refresh queued'}[state])
 
     def load_profiles(self):
+        if self.key_cache is not None and self.load_cached_profiles():
+            return
         self.profiles = []
         self.passwords = {}
+        self.metadata = {}
+        self.fingerprints = {}
         try:
-            result = subprocess.check_output('netsh wlan show profile', shell=True, text=True)
-            self.profiles = [line.split(':')[1].strip() for line in result.split('\n') if 'All User Profile' in line]
+            with instrumentation.span('profiles.list'):
+                self.profiles = self.backend.list_profiles()
+            with instrumentation.span('profiles.fingerprints'):
+                self.fingerprints = self.backend.profile_fingerprints() or {}
+            if self.lazy:
+                self.status_bar.setText(f'Found {len(self.profiles)} networks, keys are fetched when needed')
+                self.populate_network_list()
+                return
             self.status_bar.setText(f'Found {len(self.profiles)} networks')
+            # Names are shown straight away; keys stream into the rows as they arrive.
+            self.populate_network_list(pending=True)
             self.retrieve_passwords()
-        except subprocess.CalledProcessError as e:
+        except BackendError as e:
             QMessageBox.critical(self, 'Error', f'Failed to retrieve network profiles.\n{str(e)}')
 
-    def retrieve_passwords(self):
+    def load_cached_profiles(self):
+        if not self.key_cache.load() or not self.key_cache.entries:
+            return False
+        records = self.key_cache.records()
+        self.profiles = [profile for profile in self.key_cache.profiles if profile in records]
+        self.passwords = {profile: records[profile]['key'] for profile in self.profiles}
+        self.metadata = {profile: {field: value for field, value in records[profile].items() if field != 'key'}
+                         for profile in self.profiles}
+        self.fingerprints = self.key_cache.fingerprints()
+        self.populate_network_list()
+        self.status_bar.setText(f'Loaded {len(self.profiles)} networks from cache, checking for changes...')
+        # Let the cached rows paint before the profile list is read again.
+        QTimer.singleShot(0, self.revalidate_cache)
+        return True
+
+    def revalidate_cache(self):
+        self.sync_profiles(trust_cache=True)
+
+    def save_key_cache(self):
+        if self.key_cache is None:
+            return
+        self.key_cache.evict(self.profiles)
+        try:
+            self.key_cache.save()
+        except (OSError, KeyCacheError) as e:
+            self.status_bar.setText(f'Could not update the key cache: {e}')
+
+    def save_snapshot(self):
+        if self.snapshot_store is None:
+            return
+        # Keys that failed, or that lazy mode hasn't fetched, carry over from the last snapshot.
+        failed = [profile for profile in self.profiles
+                  if profile in self.retrieval_errors or profile not in self.passwords]
+        records = [record for record in self.iter_export_records() if record['name'] not in self.retrieval_errors]
+        try:
+            self.snapshot_store.save(records, keep=failed)
+        except (OSError, SnapshotError, KeyCacheError) as e:
+            self.status_bar.setText(f'Could not save a snapshot: {e}')
+
+    def compare_snapshots(self):
+        if self.snapshot_store is None:
+            return
+        try:
+            SnapshotCompareDialog(self.snapshot_store, self).exec_()
+        except SnapshotError as e:
+            QMessageBox.critical(self, 'Error', f'Failed to read snapshots.\n{str(e)}')
+
+    def clear_key_cache(self):
+        try:
+            self.key_cache.clear()
+            self.status_bar.setText('Key cache cleared')
+        except OSError as e:
+            QMessageBox.critical(self, 'Error', f'Failed to clear the key cache.\n{str(e)}')
+
+    def retrieve_passwords(self, profiles=None):
+        profiles = self.profiles if profiles is None else profiles
+        if self.password_retriever is not None and self.password_retriever.isRunning():
+            # A new refresh supersedes the running one; whatever it hadn't fetched yet is fetched again.
+            unfinished = [profile for profile in self.password_retriever.profiles if profile in self.outstanding]
+            profiles = list(dict.fromkeys(list(profiles) + unfinished))
+            self.cancel_retrieval()
+        self.outstanding = set(profiles)
+        self.refresh_scheduler.started()
+        self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
-        self.password_retriever = PasswordRetriever(self.profiles)
-        self.password_retriever.password_retrieved.connect(self.on_password_retrieved)
+        self.password_retriever = PasswordRetriever(self.backend, profiles, self.retrieval_mode, self.max_workers)
+        self.password_retriever.passwords_retrieved.connect(self.on_passwords_retrieved)
         self.password_retriever.progress_updated.connect(self.progress_bar.setValue)
         self.password_retriever.finished.connect(self.on_password_retrieval_finished)
         self.password_retriever.start()
 
-    def on_password_retrieved(self, profile, password, error):
-        self.passwords[profile] = password
-        if error:
-            print(f"Error retrieving password for {profile}: {error}")
+    def cancel_retrieval(self):
+        retriever, self.password_retriever = self.password_retriever, None
+        if retriever is None:
+            return
+        retriever.passwords_retrieved.disconnect(self.on_passwords_retrieved)
+        retriever.progress_updated.disconnect(self.progress_bar.setValue)
+        retriever.finished.disconnect(self.on_password_retrieval_finished)
+        retriever.cancel()
+        retriever.wait()
+
+    def set_lazy(self, enabled):
+        if enabled == self.lazy:
+            return
+        self.lazy = enabled
+        if enabled:
+            # Keys not fetched yet stay that way until they are needed.
+            if self.password_retriever is not None:
+                self.cancel_retrieval()
+                self.network_model.forget_passwords(self.outstanding)
+                self.outstanding = set()
+                self.progress_bar.setVisible(False)
+                self.refresh_scheduler.finished()
+            return
+        missing = [profile for profile in self.profiles if self.needs_key(profile)]
+        if missing:
+            self.network_model.mark_pending(missing)
+            self.retrieve_passwords(missing)
+
+    def needs_key(self, profile):
+        return profile not in self.passwords or profile in self.retrieval_errors
+
+    def resolve_keys(self, profiles, callback=None):
+        """ Fetch whichever keys of profiles haven't been fetched (lazy mode), then call callback(). """
+        queued = self.key_resolver.resolve([profile for profile in profiles if self.needs_key(profile)], callback)
+        self.network_model.mark_pending(queued)
+
+    def set_watching(self, enabled):
+        if not enabled:
+            if self.profile_store_watcher is not None:
+                self.profile_store_watcher.stop()
+            return
+        if self.profile_store_watcher is None:
+            self.profile_store_watcher = ProfileStoreWatcher(self.backend.profile_store, self)
+            self.profile_store_watcher.changed.connect(self.sync_from_profile_store)
+        if not self.profile_store_watcher.start():
+            self.status_bar.setText(f'Cannot watch {self.backend.profile_store} (missing, or needs administrator '
+                                    f'rights)')
+            self.watch_action.setChecked(False)
+
+    def closeEvent(self, event):
+        if self.export_worker is not None:
+            # Cancelling leaves any existing files untouched; don't quit with a half-written export.
+            self.export_worker.cancel()
+            self.export_worker.wait()
+        if self.profile_store_watcher is not None:
+            self.profile_store_watcher.stop()
+        self.refresh_scheduler.stop()
+        self.cancel_retrieval()
+        self.key_resolver.cancel()
+        # Only once the retrievers above have stopped using it.
+        self.backend.close()
+        super().closeEvent(event)
+
+    def on_passwords_retrieved(self, results):
+        for profile, record, error in results:
+            self.outstanding.discard(profile)
+            self.passwords[profile] = record['key'] if record else ''
+            if record:
+                self.metadata[profile] = {field: value for field, value in record.items() if field != 'key'}
+                if self.key_cache is not None:
+                    self.key_cache.store(record, self.fingerprints.get(profile))
+            elif self.key_cache is not None:
+                self.key_cache.invalidate(profile)
+            if error:
+                self.retrieval_errors[profile] = error
+            else:
+                self.retrieval_errors.pop(profile, None)
+        self.network_model.update_passwords(results)
+        self.invalidate_search_index()
 
     def on_password_retrieval_finished(self):
-        self.progress_bar.setVisible(False)
-        self.populate_network_list()
-
-    def populate_network_list(self):
-        for i in reversed(range(self.network_layout.count())): 
-            self.network_layout.itemAt(i).widget().setParent(None)
+        if self.export_worker is None:
+            self.progress_bar.setVisible(False)
+        self.password_retriever = None
+        errors = [self.retrieval_errors[profile] for profile in self.profiles if profile in self.retrieval_errors]
+        if errors:
+            kinds = {}
+            for error in errors:
+                kinds[error.kind] = kinds.get(error.kind, 0) + 1
+            summary = ', '.join(f'{count} {kind.replace("_", " ")}' for kind, count in sorted(kinds.items()))
+            self.status_bar.setText(f'{len(errors)} of {len(self.profiles)} keys could not be read ({summary})')
+        self.save_key_cache()
+        self.save_snapshot()
+        self.refresh_scheduler.finished()
+
+    def populate_network_list(self, pending=False):
+        with instrumentation.span('gui.populate', rows=len(self.profiles)):
+            self.network_model.set_profiles(self.profiles, self.passwords, pending)
+
+    def on_show_clicked(self, index):
+        row = self.network_proxy.mapToSource(index).row()
+        profile = self.network_model.profile_at(row)
+        if self.lazy and self.needs_key(profile) and profile not in self.network_model.revealed:
+            # The row shows 'Loading...' until the key arrives, then the key itself.
+            self.resolve_keys([profile])
+        self.network_model.toggle_revealed(row)
+
+    def on_copy_clicked(self, index):
+        self.copy_profile_password(self.network_model.profile_at(self.network_proxy.mapToSource(index).row()))
+
+    def copy_profile_password(self, profile):
+        if self.lazy and self.needs_key(profile):
+            self.status_bar.setText(f'Fetching the key of {profile}...')
+            self.resolve_keys([profile], lambda: self.copy_fetched_password(profile))
+        else:
+            self.copy_to_clipboard(self.passwords.get(profile, ''))
 
-        for profile in self.profiles:
-            self.create_profile_groupbox(profile)
-
-    def create_profile_groupbox(self, profile_name):
-        frame = QFrame()
-        frame.setFrameShape(QFrame.Box)
-        frame.setLayout(QHBoxLayout())
-
-        checkbox = QCheckBox(profile_name)
-        checkbox.setChecked(True)
-        checkbox.setStyleSheet("text-align: left;")  # Ensure text is aligned to the left
-        checkbox.stateChanged.connect(lambda state, fr=frame: self.toggle_groupbox(fr, state))
-        frame.layout().addWidget(checkbox)
-
-        password_field = QLineEdit()
-        password_field.setEchoMode(QLineEdit.Password)
-        password_field.setReadOnly(True)
-        password_field.setFixedWidth(300)
-        password_field.setText(self.passwords.get(profile_name, ''))
-        frame.layout().addWidget(password_field)
-
-        show_password_button = QPushButton('Show')
-        show_password_button.setFixedSize(75, 30)
-        show_password_button.clicked.connect(lambda: self.toggle_password_visibility(password_field, show_password_button))
-        frame.layout().addWidget(show_password_button)
-
-        copy_password_button = QPushButton('Copy')
-        copy_password_button.setFixedSize(75, 30)
-        copy_password_button.clicked.connect(lambda: self.copy_to_clipboard(password_field.text()))
-        frame.layout().addWidget(copy_password_button)
-
-        self.network_layout.addWidget(frame)
-
-    def toggle_groupbox(self, frame, state):
-        for i in range(1, frame.layout().count()):
-            item = frame.layout().itemAt(i)
-            if item and item.widget():
-                item.widget().setVisible(state == Qt.Checked)
-        frame.setFixedHeight(40 if state == Qt.Unchecked else frame.sizeHint().height())
+    def copy_fetched_password(self, profile):
+        error = self.retrieval_errors.get(profile)
+        if error is not None:
+            self.status_bar.setText(f'Could not read the key of {profile}: {error}')
+        else:
+            self.copy_to_clipboard(self.passwords.get(profile, ''))
 
     def toggle_all_groupboxes(self):
-        all_checked = all(self.network_layout.itemAt(i).widget().findChild(QCheckBox).isChecked() 
-                          for i in range(self.network_layout.count()))
-        new_state = not all_checked
-        for i in range(self.network_layout.count()):
-            frame = self.network_layout.itemAt(i).widget()
-            checkbox = frame.findChild(QCheckBox)
-            checkbox.setChecked(new_state)
+        self.network_model.set_all_expanded(not self.network_model.all_expanded())
 
     def toggle_password_visibility(self, password_field, button):
         if password_field.echoMode() == QLineEdit.Password:
@@ -241,12 +1033,9 @@ class NetworkPassTool(QMainWindow):
 
     def toggle_all_passwords(self):
         show_all = self.show_all_button.text() == 'Show All Passwords'
-        for i in range(self.network_layout.count()):
-            frame = self.network_layout.itemAt(i).widget()
-            password_field = frame.findChild(QLineEdit)
-            show_button = frame.findChildren(QPushButton)[0]
-            password_field.setEchoMode(QLineEdit.Normal if show_all else QLineEdit.Password)
-            show_button.setText('Hide' if show_all else 'Show')
+        if show_all and self.lazy:
+            self.resolve_keys(self.profiles)
+        self.network_model.set_all_revealed(show_all)
         self.show_all_button.setText('Hide All Passwords' if show_all else 'Show All Passwords')
 
     def copy_to_clipboard(self, text):
@@ -255,138 +1044,279 @@ class NetworkPassTool(QMainWindow):
         self.status_bar.setText('Password copied to clipboard')
 
     def export_passwords(self):
-        export_format, ok = QInputDialog.getItem(self, "Select Export Format", 
-                                                 "Choose the export format:", 
-                                                 ["Text File", "CSV File", "JSON File", "XML File"], 0, False)
-        if ok and export_format:
-            file_filter = "Text files (*.txt)" if export_format == "Text File" else \
-                          "CSV files (*.csv)" if export_format == "CSV File" else \
-                          "JSON files (*.json)" if export_format == "JSON File" else \
-                          "XML files (*.xml)"
-            file_name, _ = QFileDialog.getSaveFileName(self, "Save File", "", file_filter)
-            if file_name:
-                try:
-                    if export_format == "Text File":
-                        self.export_to_text(file_name)
-                    elif export_format == "CSV File":
-                        self.export_to_csv(file_name)
-                    elif export_format == "JSON File":
-                        self.export_to_json(file_name)
-                    else:
-                        self.export_to_xml(file_name)
-                    self.status_bar.setText(f'Passwords exported to {file_name}')
-                except Exception as e:
-                    QMessageBox.critical(self, 'Error', f'Failed to export passwords.\n{str(e)}')
-
-    def export_to_text(self, file_name):
-        with open(file_name, 'w') as file:
-            for profile, password in self.passwords.items():
-                file.write(f'Network: {profile}\nPassword: {password}\n\n')
-
-    def export_to_csv(self, file_name):
-        with open(file_name, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Network', 'Password'])
-            for profile, password in self.passwords.items():
-                writer.writerow([profile, password])
-
-    def export_to_json(self, file_name):
-        with open(file_name, 'w') as file:
-            json.dump(self.passwords, file, indent=4)
-
-    def export_to_xml(self, file_name):
-        root = ET.Element("Networks")
-        for profile, password in self.passwords.items():
-            network = ET.SubElement(root, "Network")
-            ET.SubElement(network, "Profile").text = profile
-            ET.SubElement(network, "Password").text = password
-
-        tree = ET.ElementTree(root)
-        tree.write(file_name, encoding='utf-8', xml_declaration=True)
+        if self.export_worker is not None or self.export_waiting:
+            QMessageBox.information(self, 'Export', 'An export is already running.')
+            return
+        dialog = ExportDialog(self.snapshot_store, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        targets = dialog.targets()
+        since = dialog.since_snapshot()
+        missing = [profile for profile in self.profiles if self.needs_key(profile)] if since is None else []
+        if self.lazy and missing:
+            self.export_waiting = True
+            self.progress_bar.setValue(0)
+            self.progress_bar.setVisible(True)
+            self.status_bar.setText(f'Fetching {len(missing)} keys to export...')
+            self.resolve_keys(missing, lambda: self.start_export(targets, since))
+            return
+        self.start_export(targets, since)
+
+    def start_export(self, targets, since):
+        self.export_waiting = False
+        try:
+            # The worker gets its own copy, so refreshes can't change the data under it.
+            if since is None:
+                records = list(self.iter_export_records())
+            else:
+                records = list(self.snapshot_store.diff_records(since, self.snapshot_store.latest()))
+        except SnapshotError as e:
+            QMessageBox.critical(self, 'Error', f'Failed to read snapshots.\n{str(e)}')
+            return
+        self.export_worker = ExportWorker(targets, records)
+        self.export_worker.progress_updated.connect(self.progress_bar.setValue)
+        self.export_worker.export_finished.connect(self.on_export_finished)
+        self.export_worker.export_failed.connect(self.on_export_failed)
+        self.export_worker.finished.connect(self.on_export_worker_finished)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.cancel_export_button.setVisible(True)
+        self.status_bar.setText(f'Exporting {len(records)} networks...')
+        self.export_worker.start()
+
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.status_bar.setText('Cancelling export...')
+
+    def on_export_finished(self, count):
+        paths = ', '.join(path for path, _ in self.export_worker.targets)
+        self.status_bar.setText(f'{count} passwords exported to {paths}')
+
+    def on_export_failed(self, message):
+        if message:
+            QMessageBox.critical(self, 'Error', f'Failed to export passwords.\n{message}')
+        else:
+            self.status_bar.setText('Export cancelled, nothing was written')
+
+    def on_export_worker_finished(self):
+        self.export_worker = None
+        self.cancel_export_button.setVisible(False)
+        if self.password_retriever is None:
+            self.progress_bar.setVisible(False)
+
+    def iter_export_records(self):
+        for profile in self.profiles:
+            if profile in self.passwords:
+                record = dict(self.metadata.get(profile, {}))
+                record['name'] = profile
+                record['key'] = self.passwords[profile]
+                yield record
+
+    def schedule_filter(self):
+        self.filter_timer.start()
+
+    def invalidate_search_index(self):
+        self.search_index_dirty = True
+        # New rows, or metadata that arrived later, may match the search now.
+        if self.search_bar.text():
+            self.schedule_filter()
+
+    def set_fuzzy_search(self, enabled):
+        self.fuzzy_search = enabled
+        self.filter_networks()
 
     def filter_networks(self):
-        search_text = self.search_bar.text().lower()
-        for i in range(self.network_layout.count()):
-            frame = self.network_layout.itemAt(i).widget()
-            frame.setVisible(search_text in frame.findChild(QCheckBox).text().lower())
+        self.filter_timer.stop()
+        if self.search_index_dirty:
+            self.search_index.build(self.network_model.profiles, self.metadata)
+            self.search_index_dirty = False
+        matches = self.search_index.search(self.search_bar.text(), self.fuzzy_search)
+        if matches is not None:
+            profiles = self.network_model.profiles
+            matches = [profiles[row] for row in matches]
+        self.network_proxy.set_matches(matches, ranked=self.fuzzy_search)
 
     def refresh_profiles(self):
-        self.load_profiles()
+        """ Run by the refresh scheduler; use refresh_scheduler.request() to ask for a refresh. """
+        if not self.profiles:
+            self.load_profiles()
+        else:
+            self.sync_profiles()
+        if self.password_retriever is None:
+            # Nothing left to fetch, so the refresh is already over.
+            self.refresh_scheduler.finished()
+
+    def sync_profiles(self, trust_cache=False):
+        try:
+            with instrumentation.span('profiles.list'):
+                profiles = self.backend.list_profiles()
+            with instrumentation.span('profiles.fingerprints'):
+                fingerprints = self.backend.profile_fingerprints() or {}
+        except BackendError as e:
+            QMessageBox.critical(self, 'Error', f'Failed to retrieve network profiles.\n{str(e)}')
+            return
+        self.apply_profile_changes(profiles, fingerprints, trust_cache)
+
+    def sync_from_profile_store(self):
+        """ Pick up changes the profile store watcher saw, from file fingerprints alone (no netsh listing). """
+        if self.refresh_scheduler.state != RefreshScheduler.IDLE:
+            # Whatever is running may be stale already; let the scheduler run one more refresh after it.
+            self.refresh_scheduler.request()
+            return
+        with instrumentation.span('profiles.fingerprints'):
+            fingerprints = self.backend.profile_fingerprints()
+        if fingerprints is None:
+            return
+        # Profiles the store never had a file for (fingerprints unavailable) are left as they are.
+        profiles = [profile for profile in self.profiles if profile in fingerprints or profile not in self.fingerprints]
+        present = set(profiles)
+        profiles += [profile for profile in fingerprints if profile not in present]
+        self.apply_profile_changes(profiles, fingerprints)
+
+    def apply_profile_changes(self, profiles, fingerprints, trust_cache=False):
+        """ Update everything to a new profile listing and fetch only the keys that may have changed. """
+        diff = diff_profiles(self.profiles, self.fingerprints, profiles, fingerprints)
+        for profile in diff.removed:
+            self.passwords.pop(profile, None)
+            self.metadata.pop(profile, None)
+        for old_name, new_name in diff.renamed:
+            if old_name in self.passwords:
+                self.passwords[new_name] = self.passwords.pop(old_name)
+            if old_name in self.metadata:
+                self.metadata[new_name] = self.metadata.pop(old_name)
+        self.profiles = profiles
+        self.fingerprints = fingerprints
+        self.network_model.apply_diff(diff, profiles)
+
+        stale = diff.added + [new_name for _, new_name in diff.renamed] + diff.changed
+        if trust_cache and self.key_cache is not None:
+            valid = self.key_cache.valid_profiles(profiles, fingerprints)
+            stale = [profile for profile in stale if profile not in valid]
+        if self.lazy:
+            # Keys that may have changed are dropped, and fetched again only once they are needed.
+            for profile in stale:
+                self.passwords.pop(profile, None)
+            self.network_model.forget_passwords(stale)
+            stale = []
+        self.status_bar.setText(f'Found {len(self.profiles)} networks ({len(diff.added)} added, '
+                                f'{len(diff.removed)} removed, {len(diff.renamed)} renamed, '
+                                f'{len(diff.changed)} changed)')
+        if stale:
+            self.retrieve_passwords(stale)
+        else:
+            self.save_key_cache()
+            self.save_snapshot()
+
+    def create_compact_panel(self):
+        """ Built once, the first time compact mode is used; later switches only show or hide it. """
+        self.compact_widget = QWidget()
+        compact_layout = QVBoxLayout(self.compact_widget)
+        compact_layout.setContentsMargins(0, 0, 0, 0)
+
+        # The dropdown shows the list's own model, so nothing is copied when modes are switched.
+        self.compact_model = CompactListProxyModel(self)
+        self.compact_model.setSourceModel(self.network_model)
+        self.compact_dropdown = QComboBox()
+        self.compact_dropdown.setEditable(True)
+        self.compact_dropdown.setInsertPolicy(QComboBox.NoInsert)
+        self.compact_dropdown.setModel(self.compact_model)
+        self.compact_dropdown.setModelColumn(NetworkListModel.NAME_COLUMN)
+        self.compact_dropdown.view().setUniformItemSizes(True)
+        completer = QCompleter(self.compact_model, self.compact_dropdown)
+        completer.setCompletionColumn(NetworkListModel.NAME_COLUMN)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchContains)
+        completer.popup().setUniformItemSizes(True)
+        self.compact_dropdown.setCompleter(completer)
+        self.compact_dropdown.currentIndexChanged.connect(self.show_compact_profile)
+        compact_layout.addWidget(self.compact_dropdown)
+
+        self.compact_groupbox = QGroupBox()
+        form_layout = QFormLayout(self.compact_groupbox)
+        password_layout = QHBoxLayout()
+        self.compact_password_field = QLineEdit()
+        self.compact_password_field.setEchoMode(QLineEdit.Password)
+        self.compact_password_field.setReadOnly(True)
+        password_layout.addWidget(self.compact_password_field)
+
+        self.compact_show_button = QPushButton('Show')
+        self.compact_show_button.setFixedSize(75, 30)
+        self.compact_show_button.clicked.connect(self.toggle_compact_password)
+        password_layout.addWidget(self.compact_show_button)
+
+        compact_copy_button = QPushButton('Copy')
+        compact_copy_button.setFixedSize(75, 30)
+        compact_copy_button.clicked.connect(self.copy_compact_password)
+        password_layout.addWidget(compact_copy_button)
+        form_layout.addRow('Password:', password_layout)
+        compact_layout.addWidget(self.compact_groupbox)
+
+        # Keys that arrive, or change, while a profile is shown update the panel in place.
+        self.network_model.dataChanged.connect(self.on_compact_rows_changed)
+        self.network_model.modelReset.connect(self.update_compact_panel)
+        self.layout.insertWidget(3, self.compact_widget)
 
     def toggle_compact_mode(self):
         if not self.compact_mode:
+            if not hasattr(self, 'compact_widget'):
+                self.create_compact_panel()
             self.compact_mode_button.setText('Full Mode')
             self.setMinimumWidth(400)
             self.setMaximumWidth(400)
             self.setGeometry(100, 100, 350, 150)
             self.search_bar.hide()
-            self.scroll_area.hide()
+            self.network_view.hide()
             self.toggle_all_button.hide()
             self.show_all_button.hide()
-            for i in range(self.network_layout.count()):
-                self.network_layout.itemAt(i).widget().hide()
-            self.compact_layout = QVBoxLayout()
-            self.compact_dropdown = QComboBox()
-            self.compact_dropdown.addItems(self.profiles)
-            self.compact_dropdown.currentIndexChanged.connect(self.show_compact_profile)
-            self.compact_layout.addWidget(self.compact_dropdown)
-            self.compact_profile_container = QVBoxLayout()
-            self.compact_layout.addLayout(self.compact_profile_container)
-            self.layout.insertLayout(3, self.compact_layout)
+            self.compact_widget.show()
             self.compact_mode = True
+            self.update_compact_panel()
         else:
             self.compact_mode_button.setText('Compact Mode')
             self.setMinimumWidth(710)
             self.setMaximumWidth(710)
             self.setGeometry(100, 100, 710, 300)
+            self.compact_widget.hide()
             self.search_bar.show()
-            self.scroll_area.show()
+            self.network_view.show()
             self.toggle_all_button.show()
             self.show_all_button.show()
-            for i in range(self.network_layout.count()):
-                self.network_layout.itemAt(i).widget().show()
-            self.clear_layout(self.compact_profile_container)
-            self.layout.removeItem(self.compact_layout)
-            self.compact_dropdown.deleteLater()
-            self.compact_profile_container.deleteLater()
-            self.compact_layout.deleteLater()
             self.compact_mode = False
 
     def show_compact_profile(self, index):
-        profile_name = self.compact_dropdown.itemText(index)
-        self.clear_layout(self.compact_profile_container)
-        self.create_profile_groupbox_compact(profile_name)
+        # A newly picked profile always starts out masked.
+        self.compact_password_field.setEchoMode(QLineEdit.Password)
+        self.compact_show_button.setText('Show')
+        self.update_compact_panel()
 
-    def create_profile_groupbox_compact(self, profile_name):
-        groupbox = QGroupBox(profile_name)
-        layout = QFormLayout()
-
-        password_layout = QHBoxLayout()
-        password_field = QLineEdit()
-        password_field.setEchoMode(QLineEdit.Password)
-        password_field.setReadOnly(True)
-        password_field.setText(self.passwords.get(profile_name, ''))
-        password_layout.addWidget(password_field)
-
-        show_password_button = QPushButton('Show')
-        show_password_button.setFixedSize(75, 30)
-        show_password_button.clicked.connect(lambda: self.toggle_password_visibility(password_field, show_password_button))
-        password_layout.addWidget(show_password_button)
-
-        copy_password_button = QPushButton('Copy')
-        copy_password_button.setFixedSize(75, 30)
-        copy_password_button.clicked.connect(lambda: self.copy_to_clipboard(password_field.text()))
-        password_layout.addWidget(copy_password_button)
-
-        layout.addRow('Password:', password_layout)
-        groupbox.setLayout(layout)
-        self.compact_profile_container.addWidget(groupbox)
-
-    def clear_layout(self, layout):
-        while layout.count():
-            child = layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+    def update_compact_panel(self):
+        if not self.compact_mode:
+            return
+        row = self.compact_dropdown.currentIndex()
+        if row < 0 or row >= self.network_model.rowCount():
+            self.compact_groupbox.setTitle('')
+            self.compact_password_field.clear()
+            return
+        profile = self.network_model.profile_at(row)
+        # Only keys never asked for; a failed lookup is retried from Show or Copy, not on every repaint.
+        if self.lazy and profile not in self.passwords and profile not in self.network_model.pending:
+            self.resolve_keys([profile])
+        self.compact_groupbox.setTitle(profile)
+        self.compact_password_field.setPlaceholderText('Loading...' if profile in self.network_model.pending else '')
+        self.compact_password_field.setText(self.network_model.password_at(row))
+
+    def on_compact_rows_changed(self, top_left, bottom_right):
+        if top_left.row() <= self.compact_dropdown.currentIndex() <= bottom_right.row():
+            self.update_compact_panel()
+
+    def toggle_compact_password(self):
+        self.toggle_password_visibility(self.compact_password_field, self.compact_show_button)
+
+    def copy_compact_password(self):
+        row = self.compact_dropdown.currentIndex()
+        if 0 <= row < self.network_model.rowCount():
+            self.copy_profile_password(self.network_model.profile_at(row))
 
     def show_tutorial(self):
         tutorial = QDialog(self)
@@ -455,7 +1385,7 @@ class NetworkPassTool(QMainWindow):
         sys.exit()
         
 class TutorialWindow(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, use_web_engine=False):
         super(TutorialWindow, self).__init__(parent)
         self.setWindowTitle("Interactive Tutorial")
         self.setGeometry(100, 100, 850, 600)
@@ -463,8 +1393,16 @@ class TutorialWindow(QDialog):
 
         self.layout = QVBoxLayout()
 
-        self.webView = QWebEngineView()
-        self.layout.addWidget(self.webView)
+        # The pages are static rich text, which QTextBrowser renders without a browser
+        # process. QtWebEngine starts a whole Chromium, so it is only an opt-in fallback.
+        self.use_web_engine = use_web_engine
+        if use_web_engine:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
+            self.viewer = QWebEngineView()
+        else:
+            self.viewer = QTextBrowser()
+            self.viewer.setOpenExternalLinks(True)
+        self.layout.addWidget(self.viewer)
 
         self.navigation_layout = QHBoxLayout()
         self.home_button = QPushButton("Home")
@@ -491,15 +1429,17 @@ class TutorialWindow(QDialog):
         self.setLayout(self.layout)
 
         self.current_page_index = 0
+        # Pages are generated the first time they are shown and kept afterwards.
         self.tutorial_pages = [
-            self.create_welcome_page(),
-            self.create_admin_privileges_page(),
-            self.create_interface_overview_page(),
-            self.create_view_networks_page(),
-            self.create_refresh_profiles_page(),
-            self.create_export_passwords_page(),
-            self.create_about_us_page()
+            self.create_welcome_page,
+            self.create_admin_privileges_page,
+            self.create_interface_overview_page,
+            self.create_view_networks_page,
+            self.create_refresh_profiles_page,
+            self.create_export_passwords_page,
+            self.create_about_us_page
         ]
+        self.rendered_pages = {}
 
         self.load_tutorial_page(self.current_page_index)
 
@@ -613,9 +1553,9 @@ class TutorialWindow(QDialog):
             <p>To export the network passwords:</p>
             <ol>
                 <li>Click the 'Export Passwords' button in the menu or at the bottom of the main window.</li>
-                <li>Select the desired export format (Text File, CSV File, JSON File) and click 'OK'.</li>
-                <li>Choose the location to save the file and enter a file name.</li>
-                <li>Click 'Save' to export the passwords to the selected file format.</li>
+                <li>Tick one or more export formats (Text, CSV, JSON, XML, NDJSON).</li>
+                <li>Enter a file name or click 'Browse...'; each format adds its own extension.</li>
+                <li>Click 'OK'. The export runs in the background; 'Cancel Export' stops it without writing anything.</li>
             </ol>
         </body>
         </html>
@@ -680,7 +1620,16 @@ class TutorialWindow(QDialog):
         """
 
     def load_tutorial_page(self, index):
-        self.webView.setHtml(self.tutorial_pages[index])
+        page = self.rendered_pages.get(index)
+        if page is None:
+            html = self.tutorial_pages[index]()
+            page = self.rendered_pages[index] = html if self.use_web_engine else QTextDocument(self)
+            if not self.use_web_engine:
+                page.setHtml(html)
+        if self.use_web_engine:
+            self.viewer.setHtml(page)
+        else:
+            self.viewer.setDocument(page)
         self.progress_bar.setValue(int((index + 1) / len(self.tutorial_pages) * 100))
     
     def go_to_next_page(self):
@@ -697,9 +1646,374 @@ class TutorialWindow(QDialog):
         self.current_page_index = 0
         self.load_tutorial_page(self.current_page_index)
 
+class ProfileStoreWatcher(QObject):
+    """ Watches the WLAN profile store and reports, debounced, when its files change.
+
+    Each interface folder is watched as well as the store itself, so adding,
+    removing or rewriting a profile file shows up without any polling.
+    """
+    DEBOUNCE_INTERVAL = 500
+
+    changed = pyqtSignal()
+
+    def __init__(self, root, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_INTERVAL)
+        self.debounce_timer.timeout.connect(self.changed)
+
+    def start(self):
+        """ Returns False if the store can't be watched (missing, or not readable without admin rights). """
+        if not os.path.isdir(self.root):
+            return False
+        self.watch_folders()
+        return bool(self.watcher.directories())
+
+    def stop(self):
+        self.debounce_timer.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+
+    def watch_folders(self):
+        try:
+            folders = [entry.path for entry in os.scandir(self.root) if entry.is_dir()]
+        except OSError:
+            folders = []
+        wanted = {os.path.normpath(path) for path in [self.root] + folders}
+        watched = {os.path.normpath(path) for path in self.watcher.directories()}
+        if wanted - watched:
+            self.watcher.addPaths(sorted(wanted - watched))
+
+    def on_directory_changed(self, path):
+        if os.path.normpath(path) == os.path.normpath(self.root):
+            # A new interface folder needs watching too.
+            self.watch_folders()
+        self.debounce_timer.start()
+
+class ExportDialog(QDialog):
+    """ Choose one or more export formats and where to write them; all are written in one pass. """
+    def __init__(self, snapshot_store=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Export Passwords')
+        layout = QVBoxLayout(self)
+
+        # Either everything, or only what changed since an earlier snapshot.
+        self.contents_combo = QComboBox()
+        self.contents_combo.addItem('All networks', None)
+        if snapshot_store is not None:
+            try:
+                for snapshot_id, created, count in reversed(snapshot_store.summaries()[:-1]):
+                    self.contents_combo.addItem(f'Changes since {snapshot_label(created, count)}', snapshot_id)
+            except SnapshotError:
+                pass
+        layout.addWidget(self.contents_combo)
+
+        formats_box = QGroupBox('Formats')
+        formats_layout = QVBoxLayout(formats_box)
+        self.format_checkboxes = {}
+        for index, label in enumerate(EXPORTERS):
+            checkbox = QCheckBox(f'{label} ({EXPORTERS[label].extension})')
+            checkbox.setChecked(index == 0)
+            checkbox.toggled.connect(self.update_ok_button)
+            formats_layout.addWidget(checkbox)
+            self.format_checkboxes[label] = checkbox
+        layout.addWidget(formats_box)
+
+        form_layout = QFormLayout()
+        path_layout = QHBoxLayout()
+        self.path_field = QLineEdit()
+        self.path_field.setPlaceholderText('File name; each format adds its own extension')
+        self.path_field.textChanged.connect(self.update_ok_button)
+        path_layout.addWidget(self.path_field)
+        browse_button = QPushButton('Browse...')
+        browse_button.clicked.connect(self.browse)
+        path_layout.addWidget(browse_button)
+        form_layout.addRow('Save as:', path_layout)
+        self.compression_combo = QComboBox()
+        self.compression_combo.addItem('None', '')
+        for suffix in available_compressions():
+            self.compression_combo.addItem(suffix, suffix)
+        form_layout.addRow('Compression:', self.compression_combo)
+        layout.addLayout(form_layout)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+        self.update_ok_button()
+
+    def since_snapshot(self):
+        return self.contents_combo.currentData()
+
+    def selected_formats(self):
+        return [label for label, checkbox in self.format_checkboxes.items() if checkbox.isChecked()]
+
+    def update_ok_button(self):
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(
+            bool(self.selected_formats()) and bool(self.path_field.text().strip()))
+
+    def browse(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, 'Save File', self.path_field.text())
+        if file_name:
+            self.path_field.setText(file_name)
+
+    def targets(self):
+        """ (path, format label) for every selected format. """
+        base = self.path_field.text().strip()
+        compression = self.compression_combo.currentData()
+        # A name that already ends in a compression or format extension is used as the stem.
+        for suffix in available_compressions():
+            if base.lower().endswith(suffix):
+                base = base[:-len(suffix)]
+                break
+        for label in self.selected_formats():
+            if base.lower().endswith(EXPORTERS[label].extension):
+                base = base[:-len(EXPORTERS[label].extension)]
+                break
+        return [(f'{base}{EXPORTERS[label].extension}{compression}', label) for label in self.selected_formats()]
+
+def snapshot_label(created, count):
+    return f'{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))} ({count} networks)'
+
+class SnapshotCompareDialog(QDialog):
+    """ Added, removed and key-rotated networks between two saved scans. """
+    def __init__(self, snapshot_store, parent=None):
+        super().__init__(parent)
+        self.snapshot_store = snapshot_store
+        self.setWindowTitle('Compare Snapshots')
+        self.resize(600, 450)
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+        self.old_combo = QComboBox()
+        self.new_combo = QComboBox()
+        summaries = snapshot_store.summaries()
+        for snapshot_id, created, count in reversed(summaries):
+            for combo in (self.old_combo, self.new_combo):
+                combo.addItem(snapshot_label(created, count), snapshot_id)
+        # Newest against the one before it, to start with.
+        self.old_combo.setCurrentIndex(min(1, len(summaries) - 1))
+        self.old_combo.currentIndexChanged.connect(self.compare)
+        self.new_combo.currentIndexChanged.connect(self.compare)
+        form_layout.addRow('Older:', self.old_combo)
+        form_layout.addRow('Newer:', self.new_combo)
+        layout.addLayout(form_layout)
+
+        self.result_view = QTextBrowser()
+        layout.addWidget(self.result_view)
+
+        button_layout = QHBoxLayout()
+        self.export_button = QPushButton('Export Changes...')
+        self.export_button.clicked.connect(self.export_changes)
+        button_layout.addWidget(self.export_button)
+        close_button = QPushButton('Close')
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+        self.compare()
+
+    def compare(self):
+        old_id, new_id = self.old_combo.currentData(), self.new_combo.currentData()
+        self.export_button.setEnabled(old_id is not None and old_id != new_id)
+        if old_id is None:
+            self.result_view.setHtml('<p>No snapshots have been saved yet.</p>')
+            return
+        try:
+            diff = self.snapshot_store.diff(old_id, new_id)
+        except SnapshotError as e:
+            self.result_view.setHtml(f'<p>{html.escape(str(e))}</p>')
+            return
+        sections = []
+        for title, names in (('Added', diff.added), ('Removed', diff.removed), ('Key rotated', diff.rotated),
+                             ('Settings changed', diff.changed)):
+            items = ''.join(f'<li>{html.escape(name)}</li>' for name in names) or '<li><i>none</i></li>'
+            sections.append(f'<h3>{title} ({len(names)})</h3><ul>{items}</ul>')
+        self.result_view.setHtml(''.join(sections))
+
+    def export_changes(self):
+        filters = {file_filter(label): label for label in EXPORTERS}
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, 'Export Changes', '', ';;'.join(filters))
+        if not file_name:
+            return
+        try:
+            records = self.snapshot_store.diff_records(self.old_combo.currentData(), self.new_combo.currentData(),
+                                                       include_changed=True)
+            count = export_records(file_name, filters[selected_filter], records)
+        except (OSError, ExportError, SnapshotError) as e:
+            QMessageBox.critical(self, 'Error', f'Failed to export changes.\n{str(e)}')
+            return
+        QMessageBox.information(self, 'Export Changes', f'{count} changes exported to {file_name}')
+
+class DiagnosticsDialog(QDialog):
+    """ Counters and latency histograms recorded by the instrumentation module. """
+    COLUMNS = ['Metric', 'Count', 'Mean ms', 'p50 ms', 'p90 ms', 'p99 ms', 'Max ms']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Diagnostics')
+        self.resize(700, 420)
+        layout = QVBoxLayout(self)
+
+        self.enabled_checkbox = QCheckBox('Record timings')
+        self.enabled_checkbox.setChecked(instrumentation.is_enabled())
+        self.enabled_checkbox.toggled.connect(self.set_enabled)
+        layout.addWidget(self.enabled_checkbox)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        for text, slot in (('Refresh', self.refresh), ('Reset', self.reset), ('Export JSON', self.export_json),
+                           ('Export Chrome Trace', self.export_trace), ('Close', self.accept)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+        self.refresh()
+
+    def set_enabled(self, enabled):
+        instrumentation.enable(enabled)
+
+    def refresh(self):
+        snapshot = instrumentation.snapshot()
+        rows = [[name, summary['count'], summary['mean_ms'], summary['p50_ms'], summary['p90_ms'],
+                 summary['p99_ms'], summary['max_ms']] for name, summary in snapshot['histograms'].items()]
+        rows += [[name, value, None, None, None, None, None] for name, value in snapshot['counters'].items()]
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem('' if value is None else str(value)))
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def export_json(self):
+        self.export(instrumentation.export_json, 'JSON files (*.json)')
+
+    def export_trace(self):
+        self.export(instrumentation.export_chrome_trace, 'Chrome trace files (*.json)')
+
+    def export(self, write, file_filter):
+        file_name, _ = QFileDialog.getSaveFileName(self, 'Save Diagnostics', '', file_filter)
+        if file_name:
+            try:
+                write(file_name)
+            except OSError as e:
+                QMessageBox.critical(self, 'Error', f'Failed to save diagnostics.\n{str(e)}')
+
+class StartupProfiler(QObject):
+    """ Times startup for --profile-startup and checks it against the tracked startup budget.
+
+    Reports imports, window construction and time from process start to the
+    first paint of the main window, then quits with 1 if any is over budget.
+    """
+    def __init__(self, budget_path):
+        super().__init__()
+        self.budget_path = budget_path
+        self.timings = {'imports_ms': (STARTUP_IMPORTED - STARTUP_STARTED) * 1000}
+        self.window = None
+        self.window_started = None
+
+    def start_window(self):
+        self.window_started = time.perf_counter()
+
+    def watch(self, window):
+        self.timings['window_ms'] = (time.perf_counter() - self.window_started) * 1000
+        self.window = window
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if (event.type() == QEvent.Paint and isinstance(watched, QWidget)
+                and watched.window() is self.window and 'first_paint_ms' not in self.timings):
+            self.timings['first_paint_ms'] = (time.perf_counter() - STARTUP_STARTED) * 1000
+            QApplication.instance().removeEventFilter(self)
+            QTimer.singleShot(0, self.finish)
+        return False
+
+    def finish(self):
+        with open(self.budget_path) as file:
+            budget = json.load(file)
+        over_budget = [phase for phase, limit in budget.items() if self.timings.get(phase, 0) > limit]
+        report = {'timings': {phase: round(value, 1) for phase, value in self.timings.items()},
+                  'budget': budget, 'over_budget': over_budget}
+        print(json.dumps(report, indent=4))
+        QApplication.instance().exit(1 if over_budget else 0)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description='TSTP:Network Password Tool',
+                                     epilog='Run with --cli for the headless command line (--cli --help).')
+    parser.add_argument('--backend', choices=BACKEND_NAMES, default=DEFAULT_BACKEND,
+                        help='Where profiles and keys are read from (default: %(default)s)')
+    parser.add_argument('--replay-file', help='Recorded netsh output for the replay backend')
+    parser.add_argument('--inventory-file', help='Inventory database to browse with the inventory backend')
+    parser.add_argument('--system-root', type=directory,
+                        help='Directory the linux backend reads /etc and /run under (default: /)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_NETSH_TIMEOUT,
+                        help=f'Seconds a single netsh call may take (default: {DEFAULT_NETSH_TIMEOUT:g})')
+    parser.add_argument('--profile-store',
+                        help='WLAN profile store to fingerprint and watch (default: the Windows profile store)')
+    parser.add_argument('--lazy', action='store_true',
+                        help='List network names only; fetch a key when it is shown, copied or exported')
+    parser.add_argument('--watch', action='store_true',
+                        help='Watch the profile store and fetch changed profiles as they change')
+    parser.add_argument('--replay-latency', type=float, default=0.0,
+                        help='Seconds of simulated latency per replayed netsh call')
+    parser.add_argument('--replay-failure-rate', type=float, default=0.0,
+                        help='Probability that a replayed netsh call fails')
+    parser.add_argument('--retrieval-mode', choices=RETRIEVAL_MODES, default=DEFAULT_RETRIEVAL_MODE,
+                        help='How key lookups are fanned out (default: %(default)s)')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help='Maximum number of concurrent key lookups (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the encrypted key cache (nothing is read from or written to it)')
+    parser.add_argument('--cache-file', help='Location of the encrypted key cache')
+    parser.add_argument('--no-snapshots', action='store_true', help='Do not save a snapshot of each completed scan')
+    parser.add_argument('--snapshot-dir', help='Location of the snapshot store')
+    parser.add_argument('--web-tutorial', action='store_true',
+                        help='Render the tutorial with QtWebEngine instead of the built-in rich text viewer')
+    parser.add_argument('--instrument', action='store_true',
+                        help='Record timings from startup on (see Help > Diagnostics)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report startup timings against startup_budget.json and quit after the first paint')
+    # Anything we don't recognise is left for Qt (e.g. -style, -platform).
+    return parser.parse_known_args(argv)
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    ex = NetworkPassTool()
+    args, qt_argv = parse_arguments(sys.argv[1:])
+    instrumentation.enable(args.instrument)
+    profiler = StartupProfiler(resource_path('startup_budget.json')) if args.profile_startup else None
+    # Lets QtWebEngine be imported after the application exists.
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    app = QApplication(sys.argv[:1] + qt_argv)
+    try:
+        backend = make_backend(args.backend, args.replay_file, args.timeout, inventory_file=args.inventory_file,
+                               profile_store=args.profile_store, system_root=args.system_root,
+                               latency=args.replay_latency, failure_rate=args.replay_failure_rate)
+    except (BackendError, OSError, ValueError) as e:
+        QMessageBox.critical(None, 'Error', f'Failed to start the {args.backend} backend.\n{str(e)}')
+        sys.exit(1)
+    # Read-only sources like the inventory are browsed as they are, never cached.
+    key_cache = None if args.no_cache or getattr(backend, 'read_only', False) else KeyCache(args.cache_file)
+    if profiler:
+        profiler.start_window()
+    snapshot_store = None
+    if not args.no_snapshots and not getattr(backend, 'read_only', False):
+        snapshot_store = SnapshotStore(args.snapshot_dir, key_cache.provider() if key_cache else None)
+    ex = NetworkPassTool(backend, args.retrieval_mode, args.max_workers, key_cache, args.web_tutorial,
+                         snapshot_store, args.lazy)
+    if profiler:
+        profiler.watch(ex)
     ex.show()
     ex.load_profiles()
+    if args.watch:
+        ex.watch_action.setChecked(True)
     sys.exit(app.exec_())
@@ -0,0 +1,136 @@
+""" Single-pass parsers for 'netsh wlan show profile' output.
+
+netsh translates its labels, so fields are found by the position of a line
+within its section, the same on every Windows language. Known English and
+common translated labels are used first when present.
+"""
+import re
+
+# Every field a parsed profile record carries, in export order.
+RECORD_FIELDS = ('name', 'ssid', 'key', 'authentication', 'cipher', 'connection_mode', 'network_type',
+                 'radio_type', 'security_key', 'cost', 'congested', 'approaching_data_limit', 'over_data_limit',
+                 'roaming', 'cost_source', 'interface')
+
+PROFILE_SECTION, CONNECTIVITY_SECTION, SECURITY_SECTION, COST_SECTION = range(4)
+
+# Position of each field within its section, for labels we don't recognise.
+POSITIONAL_FIELDS = {
+    PROFILE_SECTION: {2: 'name', 4: 'connection_mode'},
+    CONNECTIVITY_SECTION: {1: 'ssid', 2: 'network_type', 3: 'radio_type'},
+    COST_SECTION: {0: 'cost', 1: 'congested', 2: 'approaching_data_limit', 3: 'over_data_limit',
+                   4: 'roaming', 5: 'cost_source'},
+}
+
+LABELS = {
+    'name': 'name', 'connection mode': 'connection_mode',
+    'ssid name': 'ssid', 'network type': 'network_type', 'radio type': 'radio_type',
+    'authentication': 'authentication', 'cipher': 'cipher', 'security key': 'security_key',
+    'key content': 'key', 'cost': 'cost', 'congested': 'congested',
+    'approaching data limit': 'approaching_data_limit', 'over data limit': 'over_data_limit',
+    'roaming': 'roaming', 'cost source': 'cost_source',
+    # German, French, Spanish, Italian, Portuguese, Dutch
+    'schlüsselinhalt': 'key', 'contenu de la clé': 'key', 'contenido de la clave': 'key',
+    'contenuto chiave': 'key', 'conteúdo da chave': 'key', 'inhoud van sleutel': 'key',
+    'authentifizierung': 'authentication', 'authentification': 'authentication',
+    'autenticación': 'authentication', 'autenticazione': 'authentication', 'autenticação': 'authentication',
+    'verificatie': 'authentication',
+    'verschlüsselung': 'cipher', 'chiffrement': 'cipher', 'cifrado': 'cipher', 'crittografia': 'cipher',
+    'codificação': 'cipher', 'codering': 'cipher',
+}
+
+INTERFACE_PATTERN = re.compile(
+    r"\s(?:on interface|auf Schnittstelle|sur l'interface|en la interfaz|sull'interfaccia|na interface|"
+    r"op interface)\s+(.+?):\s*$", re.IGNORECASE)
+ENTRY_PATTERN = re.compile(r'^\s+([^:]+?)\s*:(?: (.*))?$')
+RULE_PATTERN = re.compile(r'^\s*-{3,}\s*$')
+
+
+def empty_profile_record(name=''):
+    record = dict.fromkeys(RECORD_FIELDS, '')
+    record['name'] = record['ssid'] = name
+    return record
+
+
+def parse_profile_list(text):
+    """ Profile names from 'netsh wlan show profiles', in order, without duplicates.
+
+    Every 'label : value' line below a dashed rule is a profile, whatever the label says.
+    """
+    names = []
+    seen = set()
+    below_rule = False
+    for line in text.splitlines():
+        if RULE_PATTERN.match(line):
+            below_rule = True
+            continue
+        if not below_rule:
+            continue
+        match = ENTRY_PATTERN.match(line.rstrip())
+        if match and match.group(2):
+            name = match.group(2).strip()
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def parse_profile(text, name=''):
+    """ Parse 'netsh wlan show profile name=... key=clear' output into a profile record in one pass. """
+    record = empty_profile_record(name)
+    section = -1
+    position = 0
+    security_entries = []
+    found = set()
+    for line in text.splitlines():
+        line = line.rstrip()
+        if RULE_PATTERN.match(line):
+            section += 1
+            position = 0
+            continue
+        if section < 0:
+            if not record['interface']:
+                match = INTERFACE_PATTERN.search(line)
+                if match:
+                    record['interface'] = match.group(1)
+            continue
+        match = ENTRY_PATTERN.match(line)
+        if not match:
+            continue
+        label, value = match.group(1).casefold(), (match.group(2) or '').strip()
+        if section == SECURITY_SECTION:
+            security_entries.append((label, value))
+        field = LABELS.get(label)
+        if field is None:
+            field = POSITIONAL_FIELDS.get(section, {}).get(position)
+        position += 1
+        # Authentication and cipher repeat once per supported suite; the first pair is the one in use.
+        if field and field not in found:
+            found.add(field)
+            record[field] = value
+
+    if security_entries and not {'authentication', 'cipher', 'security_key'} <= found:
+        _apply_security_layout(record, security_entries, found)
+    if record['ssid'].startswith('"') and record['ssid'].endswith('"') and len(record['ssid']) > 1:
+        record['ssid'] = record['ssid'][1:-1]
+    if not record['ssid']:
+        record['ssid'] = record['name']
+    return record
+
+
+def _apply_security_layout(record, entries, found):
+    # The security section is (authentication, cipher) pairs, then the security key line,
+    # then the key content when there is a key and key=clear was asked for.
+    if len(entries) < 2:
+        return
+    first_label, second_label = entries[0][0], entries[1][0]
+    index = 0
+    while index + 1 < len(entries) and entries[index][0] == first_label and entries[index + 1][0] == second_label:
+        index += 2
+    fields = {'authentication': entries[0][1], 'cipher': entries[1][1]}
+    if index < len(entries):
+        fields['security_key'] = entries[index][1]
+    if index + 1 < len(entries):
+        fields['key'] = entries[index + 1][1]
+    for field, value in fields.items():
+        if field not in found:
+            record[field] = value
@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+# added, removed and changed are lists of profile names; renamed is a list of (old, new) pairs.
+ProfileDiff = namedtuple('ProfileDiff', ['added', 'removed', 'renamed', 'changed'])
+
+
+def _store_path(fingerprint):
+    return fingerprint[0] if fingerprint else None
+
+
+def diff_profiles(old_profiles, old_fingerprints, new_profiles, new_fingerprints):
+    """ Work out what changed between two profile listings.
+
+    Fingerprints map profile name -> (store path, mtime, size) as returned by
+    ProfileBackend.profile_fingerprints(). When either side has none, every
+    surviving profile counts as changed because its key can't be vouched for.
+    """
+    old_set, new_set = set(old_profiles), set(new_profiles)
+    added = [profile for profile in new_profiles if profile not in old_set]
+    removed = [profile for profile in old_profiles if profile not in new_set]
+    renamed = []
+
+    if old_fingerprints and new_fingerprints:
+        # A renamed profile keeps its file in the profile store.
+        removed_by_path = {_store_path(old_fingerprints.get(profile)): profile for profile in removed}
+        removed_by_path.pop(None, None)
+        for profile in list(added):
+            old_name = removed_by_path.get(_store_path(new_fingerprints.get(profile)))
+            if old_name is not None:
+                renamed.append((old_name, profile))
+                added.remove(profile)
+                removed.remove(old_name)
+        changed = [profile for profile in new_profiles
+                   if profile in old_set and old_fingerprints.get(profile) != new_fingerprints.get(profile)]
+    else:
+        changed = [profile for profile in new_profiles if profile in old_set]
+    return ProfileDiff(added, removed, renamed, changed)
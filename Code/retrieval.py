@@ -0,0 +1,60 @@
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import instrumentation
+from async_retrieval import DEFAULT_CALL_TIMEOUT, AsyncRetrievalEngine, iter_results
+from backends import BackendError
+
+RETRIEVAL_MODES = ('async', 'sequential', 'thread', 'process')
+DEFAULT_RETRIEVAL_MODE = 'async'
+DEFAULT_MAX_WORKERS = 8
+
+
+def fetch_one(backend, profile):
+    """ Fetch one profile. Returns (profile, record, error); record is None on failure. """
+    try:
+        with instrumentation.span('fetch.profile', profile=profile):
+            record = backend.fetch_profile(profile)
+    except BackendError as e:
+        instrumentation.count(f'fetch.error.{e.kind}')
+        return profile, None, e
+    instrumentation.count('fetch.ok')
+    return profile, record, None
+
+
+def make_engine(backend, max_workers=DEFAULT_MAX_WORKERS, deadline=None):
+    """ Async engine for backend; its own timeout, if any, bounds each call. """
+    call_timeout = backend.timeout if getattr(backend, 'timeout', None) else DEFAULT_CALL_TIMEOUT
+    return AsyncRetrievalEngine(backend, max_workers, call_timeout, deadline)
+
+
+def retrieve_profiles(backend, profiles, mode=DEFAULT_RETRIEVAL_MODE, max_workers=DEFAULT_MAX_WORKERS, deadline=None,
+                      ordered=True):
+    """ Yield (profile, record, error) for every profile, in the order given, or as they complete without ordered.
+
+    Lookups run on the asyncio engine, or on a bounded thread or process pool,
+    unless mode is 'sequential'. Bulk backends are asked for everything at once
+    instead. deadline (seconds) only applies to the async engine.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f'Unknown retrieval mode: {mode}')
+    profiles = list(profiles)
+    if backend.bulk or mode == 'sequential' or max_workers <= 1 or len(profiles) <= 1:
+        yield from backend.fetch_profiles(profiles)
+        return
+    if mode == 'async':
+        yield from iter_results(make_engine(backend, max_workers, deadline), profiles, ordered)
+        return
+
+    workers = min(max_workers, len(profiles))
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    executor = executor_class(max_workers=workers)
+    try:
+        if ordered:
+            yield from executor.map(functools.partial(fetch_one, backend), profiles)
+        else:
+            for future in as_completed([executor.submit(fetch_one, backend, profile) for profile in profiles]):
+                yield future.result()
+    finally:
+        # If the caller stops early (deadline, cancel), lookups that haven't started are dropped.
+        executor.shutdown(wait=True, cancel_futures=True)
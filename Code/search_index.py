@@ -0,0 +1,86 @@
+import unicodedata
+
+METADATA_FIELDS = ('authentication', 'cipher', 'host')
+
+
+def normalize(text):
+    """ Case-fold and strip accents so 'Café' matches 'cafe'. """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(character for character in decomposed if not unicodedata.combining(character)).casefold()
+
+
+def subsequence_score(query, key):
+    """ Score how well query matches key as a subsequence (lower is better), or None if it doesn't. """
+    position = key.find(query[0])
+    if position < 0:
+        return None
+    start = previous = position
+    gaps = 0
+    for character in query[1:]:
+        position = key.find(character, previous + 1)
+        if position < 0:
+            return None
+        gaps += position - previous - 1
+        previous = position
+    # Tight matches near the start of the name rank first.
+    return gaps * 4 + start + (previous - start + 1 - len(query))
+
+
+class SearchIndex:
+    """ Precomputed search keys for profile names and metadata.
+
+    Searches narrow incrementally: when a query extends the previous one, only
+    the previous matches are checked again.
+    """
+    def __init__(self):
+        self.name_keys = []
+        self.metadata_keys = []
+        self.reset()
+
+    def reset(self):
+        self.last_query = None
+        self.last_fuzzy = None
+        self.last_matches = None
+
+    def build(self, names, metadata=None):
+        metadata = metadata or {}
+        self.name_keys = [normalize(name) for name in names]
+        self.metadata_keys = [
+            ' '.join(normalize(metadata[name].get(field) or '') for field in METADATA_FIELDS) if name in metadata else ''
+            for name in names
+        ]
+        self.reset()
+
+    def search(self, query, fuzzy=False):
+        """ Return matching row numbers, best first when fuzzy, or None when everything matches. """
+        query = normalize(query).strip()
+        if not query:
+            self.reset()
+            return None
+        if self.last_matches is not None and fuzzy == self.last_fuzzy and query.startswith(self.last_query):
+            candidates = self.last_matches
+        else:
+            candidates = range(len(self.name_keys))
+
+        name_keys, metadata_keys = self.name_keys, self.metadata_keys
+        if fuzzy:
+            scored = []
+            for row in candidates:
+                if query in name_keys[row]:
+                    score = name_keys[row].index(query) - 1000
+                else:
+                    score = subsequence_score(query, name_keys[row])
+                    if score is None:
+                        if query not in metadata_keys[row]:
+                            continue
+                        score = 1000
+                scored.append((score, row))
+            scored.sort()
+            matches = [row for _, row in scored]
+        else:
+            matches = [row for row in candidates if query in name_keys[row] or query in metadata_keys[row]]
+
+        self.last_query, self.last_fuzzy = query, fuzzy
+        # Narrowing needs the candidates in row order, whatever order they are returned in.
+        self.last_matches = sorted(matches) if fuzzy else matches
+        return matches
@@ -0,0 +1,221 @@
+""" Content-addressed store of scan snapshots.
+
+Every record is stored once, encrypted, under an address derived from its
+content, so a profile that doesn't change between scans costs nothing in
+later snapshots. A snapshot is a small manifest listing what changed since
+the previous one. Once the changes since the last complete manifest add
+up to FULL_MANIFEST_CHURN of the profiles, or MAX_DELTA_CHAIN deltas
+follow it, a complete manifest is written instead, so storage grows with
+churn rather than with the number of scans and replaying a snapshot never
+reads more than one full manifest and a bounded number of deltas.
+Manifests keep a keyed tag of each key, so two snapshots are compared
+without decrypting anything.
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+from collections import namedtuple
+
+from key_cache import KeyCacheError, default_cache_dir, default_key_provider
+
+FULL_MANIFEST_CHURN = 0.5
+MAX_DELTA_CHAIN = 50
+MANIFEST_VERSION = 1
+
+# Profile names, sorted. 'rotated' profiles have a new key, 'changed' ones only new metadata.
+SnapshotDiff = namedtuple('SnapshotDiff', ['added', 'removed', 'rotated', 'changed'])
+CHANGE_ADDED, CHANGE_REMOVED, CHANGE_ROTATED, CHANGE_CHANGED = 'added', 'removed', 'key_rotated', 'changed'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def default_snapshot_dir():
+    return os.path.join(default_cache_dir(), 'snapshots')
+
+
+def _write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+def _snapshot_id(created):
+    return (f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime(created))}{int(created * 1000) % 1000:03d}'
+            f'-{os.urandom(3).hex()}')
+
+
+class SnapshotStore:
+    def __init__(self, root=None, key_provider=None, full_churn=FULL_MANIFEST_CHURN, max_chain=MAX_DELTA_CHAIN):
+        self.root = root or default_snapshot_dir()
+        self.key_provider = key_provider
+        self.full_churn = full_churn
+        self.max_chain = max_chain
+        self.tag_key = None
+        # Snapshot id -> {name: [address, key tag]}, reconstructed manifests.
+        self.entry_cache = {}
+
+    def provider(self):
+        if self.key_provider is None:
+            self.key_provider = default_key_provider()
+        return self.key_provider
+
+    def secret(self):
+        """ Keys addresses and key tags, so they can't be used to guess keys offline. """
+        if self.tag_key is None:
+            path = os.path.join(self.root, 'store.key')
+            try:
+                with open(path, 'rb') as file:
+                    self.tag_key = self.provider().unprotect(file.read())
+            except FileNotFoundError:
+                self.tag_key = os.urandom(32)
+                _write_atomically(path, self.provider().protect(self.tag_key))
+            except (OSError, KeyCacheError) as e:
+                raise SnapshotError(f'Could not read the snapshot store key: {e}') from e
+        return self.tag_key
+
+    def object_path(self, address):
+        return os.path.join(self.root, 'objects', address[:2], address[2:])
+
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.root, 'manifests', f'{snapshot_id}.json')
+
+    def put_record(self, record):
+        """ Store a record unless an identical one is already there. Returns (address, key tag). """
+        data = json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        address = hmac.new(self.secret(), b'record\0' + data, hashlib.sha256).hexdigest()
+        key_tag = hmac.new(self.secret(), b'key\0' + (record.get('key') or '').encode('utf-8'),
+                           hashlib.sha256).hexdigest()[:32]
+        path = self.object_path(address)
+        if not os.path.exists(path):
+            _write_atomically(path, self.provider().protect(data))
+        return address, key_tag
+
+    def get_record(self, address):
+        try:
+            with open(self.object_path(address), 'rb') as file:
+                return json.loads(self.provider().unprotect(file.read()).decode('utf-8'))
+        except (OSError, ValueError, KeyCacheError) as e:
+            raise SnapshotError(f'Could not read snapshot object {address}: {e}') from e
+
+    def snapshot_ids(self):
+        """ Every snapshot id, oldest first. """
+        try:
+            names = os.listdir(os.path.join(self.root, 'manifests'))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def latest(self):
+        ids = self.snapshot_ids()
+        return ids[-1] if ids else None
+
+    def manifest(self, snapshot_id):
+        try:
+            with open(self.manifest_path(snapshot_id), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f'Could not read snapshot {snapshot_id}: {e}') from e
+
+    def entries(self, snapshot_id):
+        """ {name: [address, key tag]} for every profile in a snapshot. """
+        if snapshot_id in self.entry_cache:
+            return self.entry_cache[snapshot_id]
+        chain = []
+        current = snapshot_id
+        # Walk back to the nearest snapshot whose entries are known, then replay forwards.
+        while current is not None and current not in self.entry_cache:
+            manifest = self.manifest(current)
+            chain.append(manifest)
+            if 'entries' in manifest:
+                break
+            current = manifest['parent']
+        entries = dict(self.entry_cache[current]) if current in self.entry_cache else {}
+        for manifest in reversed(chain):
+            if 'entries' in manifest:
+                entries = dict(manifest['entries'])
+            else:
+                for name in manifest['removed']:
+                    entries.pop(name, None)
+                entries.update(manifest['added'])
+            self.entry_cache[manifest['id']] = dict(entries)
+        return self.entry_cache[snapshot_id]
+
+    def records(self, snapshot_id):
+        return {name: self.get_record(address) for name, (address, _) in self.entries(snapshot_id).items()}
+
+    def save(self, records, host='', keep=()):
+        """ Save a scan as a new snapshot and return its id. Only records not stored yet are written.
+
+        Profiles named in keep (e.g. lookups that failed this time) carry over
+        their entry from the previous snapshot instead of looking removed.
+        """
+        parent = self.latest()
+        entries = {}
+        if keep and parent is not None:
+            previous = self.entries(parent)
+            entries.update((name, previous[name]) for name in keep if name in previous)
+        for record in records:
+            entries[record['name']] = list(self.put_record(record))
+        created = time.time()
+        snapshot_id = _snapshot_id(created)
+        # Ids sort in the order snapshots were taken, even two taken within the clock's resolution.
+        while parent is not None and snapshot_id <= parent:
+            created += 0.001
+            snapshot_id = _snapshot_id(created)
+        manifest = {'version': MANIFEST_VERSION, 'id': snapshot_id, 'created': created, 'host': host,
+                    'parent': parent, 'count': len(entries)}
+        if parent is None:
+            manifest['entries'] = entries
+        else:
+            previous = self.entries(parent)
+            added = {name: entry for name, entry in entries.items() if previous.get(name) != entry}
+            removed = sorted(name for name in previous if name not in entries)
+            # Changes recorded in deltas, and the number of deltas, since the last complete manifest.
+            parent_manifest = self.manifest(parent)
+            churn = parent_manifest.get('churn', 0) + len(added) + len(removed)
+            depth = parent_manifest.get('depth', 0) + 1
+            if churn > self.full_churn * max(len(entries), 1) or depth > self.max_chain:
+                manifest['entries'] = entries
+            else:
+                manifest.update(added=added, removed=removed, churn=churn, depth=depth)
+        _write_atomically(self.manifest_path(manifest['id']), json.dumps(manifest).encode('utf-8'))
+        self.entry_cache[manifest['id']] = entries
+        return manifest['id']
+
+    def summaries(self):
+        """ (id, created, profile count) for every snapshot, oldest first. """
+        summaries = []
+        for snapshot_id in self.snapshot_ids():
+            manifest = self.manifest(snapshot_id)
+            summaries.append((snapshot_id, manifest['created'], manifest['count']))
+        return summaries
+
+    def diff(self, old_id, new_id):
+        old, new = self.entries(old_id), self.entries(new_id)
+        rotated, changed = [], []
+        for name in sorted(set(old) & set(new)):
+            if old[name][1] != new[name][1]:
+                rotated.append(name)
+            elif old[name][0] != new[name][0]:
+                changed.append(name)
+        return SnapshotDiff(sorted(set(new) - set(old)), sorted(set(old) - set(new)), rotated, changed)
+
+    def diff_records(self, old_id, new_id, include_changed=False):
+        """ Yield the records behind a diff, each with a 'change' field; removed ones as they last were. """
+        diff = self.diff(old_id, new_id)
+        old, new = self.entries(old_id), self.entries(new_id)
+        groups = [(CHANGE_ADDED, diff.added, new), (CHANGE_REMOVED, diff.removed, old),
+                  (CHANGE_ROTATED, diff.rotated, new)]
+        if include_changed:
+            groups.append((CHANGE_CHANGED, diff.changed, new))
+        for change, names, entries in groups:
+            for name in names:
+                record = self.get_record(entries[name][0])
+                record['change'] = change
+                yield record
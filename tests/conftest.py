@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The application modules live in Code/ and import each other by plain name.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def app():
+    QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def recording_file(tmp_path):
+    """ A replay recording with three synthetic profiles and two named like CLI commands. """
+    from backends import netsh_command, profile_argv, synthetic_recording
+    recording = synthetic_recording(3)
+    # Profiles named like the commands, to be picked out by --filter.
+    for name in ('extract', 'inventory'):
+        recording['wlan show profile'] += f'    All User Profile     : {name}\n'
+        recording[netsh_command(profile_argv(name))] = recording[netsh_command(profile_argv('Network 00000'))]
+    path = tmp_path / 'recording.json'
+    path.write_text(json.dumps(recording), encoding='utf-8')
+    return str(path)
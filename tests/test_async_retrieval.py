@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+from async_retrieval import AsyncRetrievalEngine
+from backends import (ERROR_CANCELLED, ERROR_DEADLINE, ERROR_EXIT_STATUS, ERROR_INTERRUPTED, ERROR_TIMEOUT,
+                      BackendError, ReplayBackend, synthetic_recording)
+
+
+class FlakyBackend(ReplayBackend):
+    """ Replays a recording; each profile's first failures lookups fail with kind. """
+    def __init__(self, recording, failures, kind=ERROR_INTERRUPTED, **options):
+        super().__init__(recording, **options)
+        self.remaining_failures = failures
+        self.kind = kind
+        self.calls = {}
+
+    async def fetch_profile_async(self, profile):
+        self.calls[profile] = self.calls.get(profile, 0) + 1
+        if self.calls[profile] <= self.remaining_failures:
+            raise BackendError(f'Lookup of {profile} failed', self.kind)
+        return await super().fetch_profile_async(profile)
+
+
+def run(engine, profiles):
+    results = {}
+    asyncio.run(engine.run(profiles, lambda profile, record, error: results.setdefault(profile, (record, error))))
+    assert set(results) == set(profiles)
+    return results
+
+
+def kinds(results):
+    return {profile: error.kind if error else None for profile, (_, error) in results.items()}
+
+
+def profiles(count):
+    return [f'Network {i:05d}' for i in range(count)]
+
+
+def test_each_call_is_timed_out():
+    engine = AsyncRetrievalEngine(ReplayBackend(synthetic_recording(3), latency=1.0), call_timeout=0.1, retries=0)
+    started = time.monotonic()
+    results = run(engine, profiles(3))
+    assert set(kinds(results).values()) == {ERROR_TIMEOUT}
+    assert time.monotonic() - started < 0.5
+
+
+def test_the_deadline_bounds_the_whole_run():
+    backend = ReplayBackend(synthetic_recording(5), latency=0.2)
+    engine = AsyncRetrievalEngine(backend, max_concurrency=1, call_timeout=5, deadline=0.5)
+    started = time.monotonic()
+    results = kinds(run(engine, profiles(5)))
+    assert time.monotonic() - started < 0.8
+    assert results['Network 00000'] is None
+    assert results['Network 00004'] == ERROR_DEADLINE
+
+
+def test_transient_failures_are_retried_with_backoff():
+    backend = FlakyBackend(synthetic_recording(2), failures=2)
+    engine = AsyncRetrievalEngine(backend, retries=2, backoff=0.1)
+    started = time.monotonic()
+    results = run(engine, profiles(2))
+    # Two retries wait 0.1 then 0.2 seconds.
+    assert time.monotonic() - started >= 0.3
+    assert results['Network 00001'][0]['key'] == 'secret:00000001'
+    assert backend.calls == {'Network 00000': 3, 'Network 00001': 3}
+
+
+def test_retries_run_out():
+    backend = FlakyBackend(synthetic_recording(1), failures=5)
+    results = run(AsyncRetrievalEngine(backend, retries=2, backoff=0.01), profiles(1))
+    assert kinds(results) == {'Network 00000': ERROR_INTERRUPTED}
+    assert backend.calls['Network 00000'] == 3
+
+
+def test_unrecognised_failures_are_not_retried():
+    backend = FlakyBackend(synthetic_recording(1), failures=1, kind=ERROR_EXIT_STATUS)
+    results = run(AsyncRetrievalEngine(backend, retries=2, backoff=0.01), profiles(1))
+    assert kinds(results) == {'Network 00000': ERROR_EXIT_STATUS}
+    assert backend.calls['Network 00000'] == 1
+
+
+def test_cancel_from_another_thread():
+    engine = AsyncRetrievalEngine(ReplayBackend(synthetic_recording(4), latency=5), call_timeout=10)
+    threading.Timer(0.2, engine.cancel).start()
+    started = time.monotonic()
+    results = run(engine, profiles(4))
+    assert time.monotonic() - started < 1
+    assert set(kinds(results).values()) == {ERROR_CANCELLED}
+    # A cancelled engine stays cancelled.
+    assert set(kinds(run(engine, profiles(1))).values()) == {ERROR_CANCELLED}
+
@@ -0,0 +1,40 @@
+import subprocess
+
+import pytest
+
+import backends
+from backends import (DEFAULT_NETSH_TIMEOUT, ERROR_TIMEOUT, BackendError, NetshBackend, ReplayBackend,
+                      netsh_command, profile_argv)
+
+
+def test_profile_names_reach_netsh_as_one_argument(monkeypatch):
+    calls = []
+
+    def check_output(argv, **options):
+        calls.append((argv, options))
+        return b'Profile information\n'
+
+    monkeypatch.setattr(backends.subprocess, 'check_output', check_output)
+    profile = 'Cafe" & calc & "'
+    NetshBackend().run_netsh(profile_argv(profile))
+    argv, options = calls[0]
+    assert argv == ['netsh', 'wlan', 'show', 'profile', f'name={profile}', 'key=clear']
+    assert not options.get('shell')
+    assert options['timeout'] == DEFAULT_NETSH_TIMEOUT
+
+
+def test_a_hung_netsh_times_out(monkeypatch):
+    def check_output(argv, timeout, **options):
+        raise subprocess.TimeoutExpired(argv, timeout)
+
+    monkeypatch.setattr(backends.subprocess, 'check_output', check_output)
+    with pytest.raises(BackendError) as raised:
+        NetshBackend(timeout=2).run_netsh(['wlan', 'show', 'profile'])
+    assert raised.value.kind == ERROR_TIMEOUT
+
+
+def test_commands_keep_the_recorded_form():
+    assert netsh_command(profile_argv('Home: 5G')) == 'wlan show profile name="Home: 5G" key=clear'
+    assert netsh_command(['wlan', 'show', 'profile']) == 'wlan show profile'
+    backend = ReplayBackend({'wlan show profile': '', netsh_command(profile_argv('Home')): 'output'})
+    assert backend.run_netsh(profile_argv('Home')) == 'output'
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import backends
+import cli
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'main.py')
+
+
+@pytest.mark.parametrize('name', ['extract', 'inventory'])
+def test_a_filter_named_like_a_command_is_a_filter(recording_file, capsys, name):
+    status = cli.main(['-q', '--filter', name, '--backend', 'replay', '--replay-file', recording_file])
+    assert status == cli.EXIT_OK
+    assert [json.loads(line)['network'] for line in capsys.readouterr().out.splitlines()] == [name]
+
+
+def test_explicit_command_after_global_options(recording_file, capsys):
+    assert cli.main(['--quiet', 'extract', '--backend', 'replay', '--replay-file', recording_file]) == cli.EXIT_OK
+    assert len(capsys.readouterr().out.splitlines()) == 5
+
+
+def test_json_on_stdout_ends_with_a_newline(recording_file, capsys):
+    assert cli.main(['-q', '--format', 'json', '--backend', 'replay', '--replay-file', recording_file]) == cli.EXIT_OK
+    out = capsys.readouterr().out
+    assert out.endswith('}\n')
+    assert len(json.loads(out)) == 5
+
+
+def test_the_backend_is_closed(recording_file, monkeypatch):
+    closed = []
+    real_make_backend = backends.make_backend
+
+    def make_backend(*args, **kwargs):
+        backend = real_make_backend(*args, **kwargs)
+        backend.close = lambda: closed.append(True)
+        return backend
+
+    monkeypatch.setattr(cli, 'make_backend', make_backend)
+    monkeypatch.setattr(cli, 'write_output', lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        cli.main(['-q', '--backend', 'replay', '--replay-file', recording_file])
+    assert closed == [True]
+
+
+def test_headless_mode_never_imports_qt(recording_file):
+    script = (
+        'import runpy, sys\n'
+        'sys.argv = sys.argv[1:]\n'
+        'try:\n'
+        '    runpy.run_path(sys.argv[0], run_name="__main__")\n'
+        'except SystemExit as e:\n'
+        '    status = e.code\n'
+        'assert "PyQt5" not in sys.modules, "Qt was imported"\n'
+        'sys.exit(status)\n'
+    )
+    command = [sys.executable, '-c', script, MAIN, '--cli', '-q', '--backend', 'replay', '--replay-file', recording_file]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(MAIN))
+    assert result.returncode == cli.EXIT_OK, result.stderr
+    assert len(result.stdout.splitlines()) == 5
+
+
+def test_missing_system_root_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as raised:
+        cli.main(['--backend', 'linux', '--system-root', str(tmp_path / 'missing')])
+    assert raised.value.code == cli.EXIT_USAGE
+    assert 'is not a directory' in capsys.readouterr().err
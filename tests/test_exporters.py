@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+import threading
+
+import pytest
+
+from exporters import PROGRESS_INTERVAL, ExportCancelled, export_records, export_targets
+
+RECORDS = [{'name': 'Home', 'key': 'one'}, {'name': 'Café "5G"', 'key': 'k\\ey'}, {'name': 'Open', 'key': ''}]
+
+
+def many_records(count):
+    return ({'name': f'Network {i}', 'key': f'key {i}'} for i in range(count))
+
+
+def failing_records():
+    yield RECORDS[0]
+    raise RuntimeError('lookup failed')
+
+
+def test_json_matches_json_dump(tmp_path):
+    path = tmp_path / 'keys.json'
+    for records in (RECORDS, []):
+        export_records(str(path), 'JSON File', records)
+        passwords = {record['name']: record['key'] for record in records}
+        assert path.read_bytes() == json.dumps(passwords, indent=4).encode('utf-8')
+
+
+def test_gzip_output(tmp_path):
+    path = tmp_path / 'keys.ndjson.gz'
+    assert export_records(str(path), 'NDJSON File', RECORDS) == 3
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file]
+    assert [(line['network'], line['password']) for line in lines] == [(r['name'], r['key']) for r in RECORDS]
+
+
+def test_several_targets_in_one_pass(tmp_path):
+    targets = [(str(tmp_path / 'keys.csv'), 'CSV File'), (str(tmp_path / 'keys.txt'), 'Text File')]
+    assert export_targets(targets, iter(RECORDS)) == 3
+    assert (tmp_path / 'keys.csv').read_text(encoding='utf-8').splitlines()[1] == 'Home,one'
+    assert (tmp_path / 'keys.txt').read_text(encoding='utf-8').startswith('Network: Home\nPassword: one\n')
+
+
+def test_a_failed_export_keeps_the_old_file(tmp_path):
+    path = tmp_path / 'keys.json'
+    path.write_text('old', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        export_targets([(str(path), 'JSON File'), (str(tmp_path / 'new.csv'), 'CSV File')], failing_records())
+    assert path.read_text(encoding='utf-8') == 'old'
+    assert os.listdir(tmp_path) == ['keys.json']
+
+
+def test_cancel_keeps_the_old_file(tmp_path):
+    path = tmp_path / 'keys.csv'
+    path.write_text('old', encoding='utf-8')
+    cancelled = threading.Event()
+    progress = []
+
+    def report(count):
+        progress.append(count)
+        cancelled.set()
+
+    with pytest.raises(ExportCancelled):
+        export_targets([(str(path), 'CSV File')], many_records(PROGRESS_INTERVAL * 3), report, cancelled)
+    # Cancelled at the first check after the event was set.
+    assert progress == [PROGRESS_INTERVAL]
+    assert path.read_text(encoding='utf-8') == 'old'
+    assert os.listdir(tmp_path) == ['keys.csv']
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permissions')
+def test_exports_keep_the_replaced_files_mode(tmp_path):
+    path = tmp_path / 'keys.txt'
+    export_records(str(path), 'Text File', RECORDS)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert path.stat().st_mode & 0o777 == 0o666 & ~umask
+    path.chmod(0o640)
+    export_records(str(path), 'Text File', RECORDS)
+    assert path.stat().st_mode & 0o777 == 0o640
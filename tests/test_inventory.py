@@ -0,0 +1,34 @@
+import pytest
+
+from inventory import Inventory
+from netsh_parser import empty_profile_record
+
+
+def record(ssid, key, authentication='WPA2-Personal'):
+    result = empty_profile_record(ssid)
+    result.update(key=key, authentication=authentication)
+    return result
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+        inventory.import_records('PC-1', [record('Home', 'one'), record('home', 'two'), record('Cafe', '', 'Open')])
+        yield inventory
+
+
+def test_queries_ignore_case(inventory):
+    assert [row['key'] for row in inventory.query(ssid='HOME')] == ['one', 'two']
+    assert [row['ssid'] for row in inventory.query(ssid='h*')] == ['Home', 'home']
+    assert [row['ssid'] for row in inventory.query(host='pc-?', authentication='open')] == ['Cafe']
+
+
+@pytest.mark.parametrize('condition, parameter', [
+    ("ssid LIKE ? ESCAPE '\\'", 'Ho%'), ('ssid = ?', 'home'), ("host LIKE ? ESCAPE '\\'", 'pc%'),
+    ('authentication = ?', 'open'),
+])
+def test_searches_use_an_index(inventory, condition, parameter):
+    plan = inventory.connection.execute(f'EXPLAIN QUERY PLAN SELECT * FROM networks WHERE {condition}',
+                                        [parameter]).fetchall()
+    assert any('USING INDEX' in row[-1] for row in plan), plan
+
@@ -0,0 +1,92 @@
+import pytest
+
+from key_cache import KeyCache, KeyCacheError, SecretKeyProvider
+from netsh_parser import empty_profile_record
+
+
+def record(name, key='secret'):
+    result = empty_profile_record(name)
+    result['key'] = key
+    return result
+
+
+@pytest.fixture
+def provider():
+    return SecretKeyProvider(b'test secret')
+
+
+def test_round_trip(provider):
+    data = b'{"key": "correct horse"}' * 10
+    blob = provider.protect(data)
+    assert b'correct horse' not in blob
+    assert provider.unprotect(blob) == data
+    # A fresh nonce per call.
+    assert provider.protect(data) != blob
+
+
+@pytest.mark.parametrize('damage', [
+    lambda blob: blob[:-1] + bytes([blob[-1] ^ 1]),
+    lambda blob: blob[:20] + bytes([blob[20] ^ 1]) + blob[21:],
+    lambda blob: blob[:len(blob) // 2],
+    lambda blob: blob[:10],
+    lambda blob: b'XXXXXXX' + blob[7:],
+])
+def test_damaged_blobs_are_rejected(provider, damage):
+    with pytest.raises(KeyCacheError):
+        provider.unprotect(damage(provider.protect(b'payload' * 8)))
+
+
+def test_other_secret_is_rejected(provider):
+    with pytest.raises(KeyCacheError):
+        SecretKeyProvider(b'other secret').unprotect(provider.protect(b'payload'))
+
+
+def test_cache_survives_a_reload(tmp_path, provider):
+    path = str(tmp_path / 'cache.bin')
+    cache = KeyCache(path, provider)
+    cache.store(record('Home', 'one'), ('path', 1, 2))
+    cache.evict(['Home'])
+    cache.save()
+    assert b'one' not in (tmp_path / 'cache.bin').read_bytes()
+    reloaded = KeyCache(path, provider)
+    assert reloaded.load()
+    assert reloaded.records()['Home']['key'] == 'one'
+    assert reloaded.fingerprints() == {'Home': ('path', 1, 2)}
+    assert not KeyCache(path, SecretKeyProvider(b'other secret')).load()
+
+
+def test_evict_by_max_age(provider, monkeypatch):
+    cache = KeyCache('unused', provider, max_age=60)
+    clock = [1000.0]
+    monkeypatch.setattr('key_cache.time.time', lambda: clock[0])
+    cache.store(record('Old'))
+    clock[0] += 50
+    cache.store(record('New'))
+    clock[0] += 20
+    assert cache.valid_profiles(['Old', 'New']) == {'New'}
+    cache.evict(['Old', 'New'])
+    assert set(cache.entries) == {'New'}
+
+
+def test_evict_by_max_entries_keeps_the_newest(provider, monkeypatch):
+    cache = KeyCache('unused', provider, max_entries=2)
+    clock = [1000.0]
+    monkeypatch.setattr('key_cache.time.time', lambda: clock[0])
+    for name in ('A', 'B', 'C'):
+        cache.store(record(name))
+        clock[0] += 1
+    cache.evict(['A', 'B', 'C', 'Gone'])
+    assert set(cache.entries) == {'B', 'C'}
+    cache.evict(['C'])
+    assert set(cache.entries) == {'C'}
+
+
+def test_changed_fingerprints_are_not_trusted(provider):
+    cache = KeyCache('unused', provider)
+    cache.store(record('Home'), ('Home.xml', 100, 10))
+    cache.store(record('Cafe'), ('Cafe.xml', 100, 10))
+    cache.store(record('Office'))
+    fingerprints = {'Home': ('Home.xml', 100, 10), 'Cafe': ('Cafe.xml', 200, 12), 'Office': ('Office.xml', 1, 1)}
+    assert cache.valid_profiles(['Home', 'Cafe', 'Office'], fingerprints) == {'Home'}
+    # Without fingerprints only age counts.
+    assert cache.valid_profiles(['Home', 'Cafe', 'Office']) == {'Home', 'Cafe', 'Office'}
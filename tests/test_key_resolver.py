@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('PyQt5.QtWidgets')
+
+from backends import ReplayBackend, synthetic_recording
+from main import KeyResolver, NetworkPassTool
+
+
+class CountingBackend(ReplayBackend):
+    """ Replays a recording, counting lookups; the gated profile waits until release is set. """
+    def __init__(self, recording, gated=None):
+        super().__init__(recording)
+        self.gated = gated
+        self.release = threading.Event()
+        self.fetched = []
+
+    def fetch_profile(self, profile):
+        self.fetched.append(profile)
+        if profile == self.gated:
+            self.release.wait(5)
+        return super().fetch_profile(profile)
+
+
+def wait_until(app, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_a_profile_being_fetched_is_not_fetched_again(app):
+    backend = CountingBackend(synthetic_recording(3), gated='Network 00000')
+    resolver = KeyResolver(backend, 'thread')
+    delivered = []
+    called = []
+    resolver.passwords_retrieved.connect(lambda results: delivered.extend(profile for profile, _, _ in results))
+    assert resolver.resolve(['Network 00000', 'Network 00001'], lambda: called.append('first')) == [
+        'Network 00000', 'Network 00001']
+    # Still pending: the second caller waits on the same lookup.
+    assert resolver.resolve(['Network 00000'], lambda: called.append('second')) == []
+    wait_until(app, lambda: 'Network 00001' in delivered)
+    assert called == []
+    backend.release.set()
+    wait_until(app, lambda: resolver.retriever is None)
+    assert sorted(backend.fetched) == ['Network 00000', 'Network 00001']
+    assert sorted(delivered) == ['Network 00000', 'Network 00001']
+    assert sorted(called) == ['first', 'second']
+    assert not resolver.in_flight and not resolver.requests
+
+
+def test_resolved_keys_are_remembered(app):
+    backend = CountingBackend(synthetic_recording(3))
+    window = NetworkPassTool(backend, 'thread', lazy=True)
+    try:
+        window.load_profiles()
+        assert backend.fetched == []
+        called = []
+        window.resolve_keys(['Network 00001'], lambda: called.append('first'))
+        wait_until(app, lambda: called)
+        assert window.passwords == {'Network 00001': 'secret:00000001'}
+        window.resolve_keys(['Network 00001', 'Network 00002'], lambda: called.append('second'))
+        wait_until(app, lambda: len(called) == 2)
+        assert backend.fetched == ['Network 00001', 'Network 00002']
+        # Everything asked for is known, so the callback runs straight away.
+        window.resolve_keys(['Network 00002'], lambda: called.append('third'))
+        assert called == ['first', 'second', 'third']
+        assert backend.fetched == ['Network 00001', 'Network 00002']
+    finally:
+        window.close()
@@ -0,0 +1,138 @@
+import pytest
+
+import linux_profiles
+from backends import ERROR_ACCESS_DENIED, ERROR_NOT_FOUND, BackendError
+from linux_profiles import LinuxBackend
+
+HOME_KEYFILE = """\
+[connection]
+id=Home: 5G
+uuid=0d6e0a8e-8c5e-4a59-9b1e-2f0d0c1b2a3f
+type=wifi
+interface-name=wlan0
+
+[wifi]
+mode=infrastructure
+ssid=Home\\s5G
+
+[wifi-security]
+key-mgmt=sae
+psk=pass:word with=equals
+"""
+
+CAFE_KEYFILE = """\
+[connection]
+id=Cafe
+type=802-11-wireless
+autoconnect=false
+
+[802-11-wireless]
+ssid=67;97;102;101;
+"""
+
+WIRED_KEYFILE = """\
+[connection]
+id=Wired connection 1
+type=ethernet
+"""
+
+WPA_SUPPLICANT = """\
+ctrl_interface=/run/wpa_supplicant
+update_config=1
+
+network={
+    ssid="Office"
+    psk="office secret"
+    key_mgmt=WPA-PSK
+    pairwise=CCMP
+}
+
+# Also saved by NetworkManager; its copy is the one listed.
+network={
+    ssid="Home: 5G"
+    psk="older secret"
+}
+
+network={
+    ssid=4c6962726172792057696669
+    key_mgmt=NONE
+    disabled=1
+}
+"""
+
+
+@pytest.fixture
+def root(tmp_path):
+    connections = tmp_path / 'etc' / 'NetworkManager' / 'system-connections'
+    connections.mkdir(parents=True)
+    (connections / 'Home.nmconnection').write_text(HOME_KEYFILE, encoding='utf-8')
+    (connections / 'Cafe.nmconnection').write_text(CAFE_KEYFILE, encoding='utf-8')
+    (connections / 'Wired.nmconnection').write_text(WIRED_KEYFILE, encoding='utf-8')
+    (connections / 'notes.txt').write_text('not a keyfile', encoding='utf-8')
+    supplicant = tmp_path / 'etc' / 'wpa_supplicant'
+    supplicant.mkdir()
+    (supplicant / 'wpa_supplicant-wlan1.conf').write_text(WPA_SUPPLICANT, encoding='utf-8')
+    return tmp_path
+
+
+def test_profiles_from_both_stores(root):
+    backend = LinuxBackend(str(root))
+    assert backend.list_profiles() == ['Cafe', 'Home: 5G', 'Office', 'Library Wifi']
+
+
+def test_keyfile_records(root):
+    backend = LinuxBackend(str(root))
+    home = backend.fetch_profile('Home: 5G')
+    assert (home['ssid'], home['key']) == ('Home 5G', 'pass:word with=equals')
+    assert (home['authentication'], home['interface']) == ('WPA3-Personal', 'wlan0')
+    assert home['security_key'] == 'Present'
+    cafe = backend.fetch_profile('Cafe')
+    # Old NetworkManager versions store the SSID as bytes.
+    assert (cafe['ssid'], cafe['key'], cafe['authentication']) == ('Cafe', '', 'Open')
+    assert cafe['connection_mode'] == 'Connect manually'
+
+
+def test_wpa_supplicant_records(root):
+    results = LinuxBackend(str(root)).fetch_profiles(['Office', 'Library Wifi'])
+    records = {profile: record for profile, record, _ in results}
+    office = records['Office']
+    assert (office['key'], office['authentication'], office['cipher']) == ('office secret', 'WPA2-Personal', 'CCMP')
+    assert office['interface'] == 'wlan1'
+    library = records['Library Wifi']
+    assert (library['key'], library['authentication'], library['cipher']) == ('', 'Open', 'None')
+    assert library['connection_mode'] == 'Connect manually'
+
+
+def test_unknown_profile(root):
+    with pytest.raises(BackendError) as raised:
+        LinuxBackend(str(root)).fetch_profile('Elsewhere')
+    assert raised.value.kind == ERROR_NOT_FOUND
+
+
+def test_unreadable_file_is_listed_with_its_error(root, monkeypatch):
+    read_text = linux_profiles._read_text
+
+    def deny_home(path):
+        if path.endswith('Home.nmconnection'):
+            raise BackendError(f'Permission denied reading {path} (try running as root)', ERROR_ACCESS_DENIED)
+        return read_text(path)
+
+    monkeypatch.setattr(linux_profiles, '_read_text', deny_home)
+    backend = LinuxBackend(str(root))
+    # Named after the file; the wpa_supplicant copy of the network shows up under its SSID.
+    assert backend.list_profiles() == ['Cafe', 'Home', 'Office', 'Home: 5G', 'Library Wifi']
+    results = {profile: error for profile, _, error in backend.fetch_profiles(['Home', 'Office'])}
+    assert results['Home'].kind == ERROR_ACCESS_DENIED
+    assert results['Office'] is None
+
+
+def test_fingerprints_follow_changes(root):
+    backend = LinuxBackend(str(root))
+    before = backend.profile_fingerprints()
+    assert set(before) == {'Cafe', 'Home: 5G', 'Office', 'Library Wifi'}
+    (root / 'etc' / 'NetworkManager' / 'system-connections' / 'Cafe.nmconnection').unlink()
+    assert 'Cafe' not in backend.profile_fingerprints()
+
+
+def test_empty_root(tmp_path):
+    assert LinuxBackend(str(tmp_path)).list_profiles() == []
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from backends import ReplayBackend, netsh_command, profile_argv
+from netsh_parser import parse_profile, parse_profile_list
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('show_profiles_en.txt', ['Cafe: Guest', 'Airport Free WiFi', 'Home']),
+    ('show_profiles_de.txt', ['Büro: 5G', 'Zuhause']),
+])
+def test_profile_list(name, expected):
+    assert parse_profile_list(fixture(name)) == expected
+
+
+def test_english_profile_with_colons_in_ssid_and_key():
+    record = parse_profile(fixture('show_profile_en.txt'))
+    assert record['name'] == record['ssid'] == 'Cafe: Guest'
+    assert record['key'] == 'pa:ss:word 1'
+    # The first authentication and cipher pair is the one in use.
+    assert (record['authentication'], record['cipher']) == ('WPA2-Personal', 'CCMP')
+    assert record['security_key'] == 'Present'
+    assert record['connection_mode'] == 'Connect automatically'
+    assert record['interface'] == 'Wi-Fi'
+    assert record['cost_source'] == 'Default'
+
+
+def test_german_profile():
+    record = parse_profile(fixture('show_profile_de.txt'))
+    assert record['name'] == record['ssid'] == 'Büro: 5G'
+    assert record['key'] == 'geheim:123'
+    assert (record['authentication'], record['cipher']) == ('WPA2-Personal', 'CCMP')
+    assert record['security_key'] == 'Vorhanden'
+    assert record['connection_mode'] == 'Automatisch verbinden'
+    assert record['network_type'] == 'Infrastruktur'
+    assert record['interface'] == 'WLAN'
+    assert record['cost'] == 'Uneingeschränkt'
+
+
+def test_open_network_has_no_key():
+    record = parse_profile(fixture('show_profile_open.txt'))
+    assert record['key'] == ''
+    assert (record['authentication'], record['cipher'], record['security_key']) == ('Open', 'None', 'Absent')
+    assert record['connection_mode'] == 'Connect manually'
+
+
+def test_backend_keeps_the_listed_name():
+    backend = ReplayBackend({
+        'wlan show profile': fixture('show_profiles_en.txt'),
+        netsh_command(profile_argv('Cafe: Guest')): fixture('show_profile_en.txt'),
+        netsh_command(profile_argv('Airport Free WiFi')): fixture('show_profile_open.txt'),
+    })
+    assert backend.list_profiles() == ['Cafe: Guest', 'Airport Free WiFi', 'Home']
+    assert backend.fetch_profile('Cafe: Guest')['key'] == 'pa:ss:word 1'
+    assert backend.fetch_profile('Airport Free WiFi')['authentication'] == 'Open'
@@ -0,0 +1,64 @@
+import json
+import sys
+
+import pytest
+
+import backends
+from backends import (ERROR_NOT_FOUND, ERROR_TIMEOUT, ERROR_UNKNOWN, BackendError, NetshSession, NetshSessionBackend,
+                      netsh_command, profile_argv)
+
+
+def fake_netsh(recording_file, *options):
+    """ argv of an interactive netsh stand-in answering from recording_file. """
+    return (sys.executable, backends.__file__, 'serve-replay', recording_file) + options
+
+
+def test_each_command_gets_only_its_own_output(recording_file):
+    with open(recording_file, encoding='utf-8') as file:
+        recording = json.load(file)
+    session = NetshSession(fake_netsh(recording_file), timeout=10)
+    try:
+        for name in ('Network 00000', 'Network 00001', 'Network 00000'):
+            command = netsh_command(profile_argv(name))
+            assert session.run(command) == recording[command]
+        assert session.run('wlan show profile') == recording['wlan show profile']
+    finally:
+        session.close()
+
+
+def test_backend_reads_profiles_through_the_session(recording_file):
+    backend = NetshSessionBackend(command=fake_netsh(recording_file))
+    try:
+        assert backend.list_profiles() == ['Network 00000', 'Network 00001', 'Network 00002', 'extract', 'inventory']
+        assert backend.fetch_profile('Network 00002')['name'] == 'Network 00002'
+        with pytest.raises(BackendError) as raised:
+            backend.fetch_profile('Missing')
+        assert raised.value.kind == ERROR_NOT_FOUND
+        with pytest.raises(BackendError) as raised:
+            backend.fetch_profile('Evil\nwlan delete profile name=*')
+        assert raised.value.kind == ERROR_UNKNOWN
+    finally:
+        backend.close()
+
+
+def test_a_session_that_died_is_restarted(recording_file):
+    # Each command is followed by its sentinel, so the child dies on the second command.
+    session = NetshSession(fake_netsh(recording_file, '--die-after', '2'), timeout=10)
+    try:
+        session.run('wlan show profile')
+        first = session.process.pid
+        assert 'Network 00001' in session.run(netsh_command(profile_argv('Network 00001')))
+        assert session.process.pid != first
+    finally:
+        session.close()
+
+
+def test_a_hung_session_times_out_and_is_replaced(recording_file):
+    session = NetshSession(fake_netsh(recording_file, '--latency', '5'), timeout=0.5)
+    try:
+        with pytest.raises(BackendError) as raised:
+            session.run('wlan show profile')
+        assert raised.value.kind == ERROR_TIMEOUT
+        assert session.process is None
+    finally:
+        session.close()
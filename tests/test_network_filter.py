@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('PyQt5.QtWidgets')
+
+from main import NetworkFilterProxyModel, NetworkListModel
+from profile_diff import ProfileDiff
+
+
+def visible(proxy):
+    return [proxy.index(row, NetworkListModel.NAME_COLUMN).data() for row in range(proxy.rowCount())]
+
+
+def make_models(profiles):
+    model = NetworkListModel()
+    model.set_profiles(profiles, {profile: 'key' for profile in profiles})
+    proxy = NetworkFilterProxyModel()
+    proxy.setSourceModel(model)
+    return model, proxy
+
+
+def test_matches_follow_profiles_when_rows_are_removed(app):
+    model, proxy = make_models(['Alpha', 'Office', 'Beta', 'Office 2'])
+    proxy.set_matches(['Office', 'Office 2'])
+    model.apply_diff(ProfileDiff(added=[], removed=['Alpha'], renamed=[], changed=[]), ['Office', 'Beta', 'Office 2'])
+    assert visible(proxy) == ['Office', 'Office 2']
+
+
+def test_matches_follow_profiles_when_rows_are_inserted(app):
+    model, proxy = make_models(['Office', 'Beta'])
+    proxy.set_matches(['Office'])
+    model.apply_diff(ProfileDiff(added=['Gamma'], removed=[], renamed=[], changed=[]), ['Gamma', 'Office', 'Beta'])
+    assert visible(proxy) == ['Office']
+
+
+def test_ranked_matches_sort_by_rank(app):
+    model, proxy = make_models(['Office', 'Cafe', 'Home'])
+    proxy.set_matches(['Home', 'Office'], ranked=True)
+    assert visible(proxy) == ['Home', 'Office']
+    proxy.set_matches(None)
+    assert visible(proxy) == ['Office', 'Cafe', 'Home']
+
+
+def test_search_is_rerun_when_the_listing_changes(app):
+    from backends import ReplayBackend, synthetic_recording
+    from main import NetworkPassTool
+
+    window = NetworkPassTool(ReplayBackend(synthetic_recording(0)), lazy=True)
+    window.profiles = ['Alpha', 'Office', 'Beta']
+    window.populate_network_list()
+    window.search_bar.setText('office')
+    window.filter_networks()
+    assert visible(window.network_proxy) == ['Office']
+
+    window.apply_profile_changes(['Office 2', 'Beta', 'Office'], {})
+    assert window.filter_timer.isActive()
+    window.filter_networks()
+    assert sorted(visible(window.network_proxy)) == ['Office', 'Office 2']
+    window.close()
+
+
+def test_added_rows_follow_the_listing_order(app):
+    model, proxy = make_models(['Alpha', 'Beta', 'Delta'])
+    listing = ['New 1', 'Alpha', 'Gamma', 'Delta', 'Epsilon', 'Zeta']
+    model.apply_diff(ProfileDiff(added=['New 1', 'Gamma', 'Epsilon', 'Zeta'], removed=['Beta'], renamed=[], changed=[]),
+                     listing)
+    assert model.profiles == listing
+    assert model.rows == {profile: row for row, profile in enumerate(listing)}
+    assert visible(proxy) == listing
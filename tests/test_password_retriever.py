@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('PyQt5.QtWidgets')
+
+from backends import ReplayBackend, synthetic_recording
+from main import PasswordRetriever
+
+STALL = 1.0
+
+
+class StallingBackend(ReplayBackend):
+    """ Replays a recording, with one profile whose lookup hangs for STALL seconds. """
+    def __init__(self, recording, stalled):
+        super().__init__(recording)
+        self.stalled = stalled
+
+    def fetch_profile(self, profile):
+        if profile == self.stalled:
+            time.sleep(STALL)
+        return super().fetch_profile(profile)
+
+    async def fetch_profile_async(self, profile):
+        if profile == self.stalled:
+            await asyncio.sleep(STALL)
+        return await super().fetch_profile_async(profile)
+
+
+@pytest.mark.parametrize('mode', ['async', 'thread'])
+def test_rows_are_not_held_back_by_a_stalled_lookup(app, mode):
+    backend = StallingBackend(synthetic_recording(6), 'Network 00000')
+    profiles = backend.list_profiles()
+    retriever = PasswordRetriever(backend, profiles, mode, max_workers=6)
+    delivered = {}
+    started = time.monotonic()
+    retriever.passwords_retrieved.connect(
+        lambda batch: delivered.update((profile, time.monotonic() - started) for profile, _, _ in batch))
+    # Run in this thread, so the signals are delivered directly.
+    retriever.run()
+    assert set(delivered) == set(profiles)
+    assert delivered['Network 00000'] >= STALL
+    for profile in profiles[1:]:
+        assert delivered[profile] < 0.5, (profile, delivered)
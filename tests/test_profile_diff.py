@@ -0,0 +1,28 @@
+from profile_diff import diff_profiles
+
+
+def fingerprints(**paths):
+    return {profile: (path, 100, 10) for profile, path in paths.items()}
+
+
+def test_rename_is_detected_by_store_path():
+    old = fingerprints(Home='a.xml', Cafe='b.xml')
+    new = fingerprints(Home='a.xml', **{'Cafe 2': 'b.xml', 'Office': 'c.xml'})
+    diff = diff_profiles(['Home', 'Cafe'], old, ['Home', 'Cafe 2', 'Office'], new)
+    assert diff.renamed == [('Cafe', 'Cafe 2')]
+    assert (diff.added, diff.removed, diff.changed) == (['Office'], [], [])
+
+
+def test_changed_fingerprint():
+    old = fingerprints(Home='a.xml', Cafe='b.xml')
+    new = dict(old, Cafe=('b.xml', 200, 12))
+    diff = diff_profiles(['Home', 'Cafe', 'Gone'], old, ['Home', 'Cafe'], new)
+    assert (diff.added, diff.removed, diff.renamed, diff.changed) == ([], ['Gone'], [], ['Cafe'])
+
+
+def test_without_fingerprints_every_survivor_changed():
+    old = fingerprints(Home='a.xml', Cafe='b.xml')
+    for old_fingerprints, new_fingerprints in ((old, None), (None, old), ({}, {})):
+        diff = diff_profiles(['Home', 'Cafe'], old_fingerprints, ['Cafe', 'Home 2', 'Home'], new_fingerprints)
+        # No store paths, so a rename can't be told from a remove plus an add.
+        assert (diff.added, diff.removed, diff.renamed, diff.changed) == (['Home 2'], [], [], ['Cafe', 'Home'])
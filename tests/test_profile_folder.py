@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+from backends import BackendError, NetshExportBackend, parse_profile_xml, read_profile_folder
+
+EXPORTED = os.path.join(os.path.dirname(__file__), 'fixtures', 'exported')
+
+
+def test_profile_xml():
+    record = parse_profile_xml(os.path.join(EXPORTED, 'Wi-Fi-Home.xml'))
+    assert record['name'] == 'Home'
+    # The hex form wins over the SSID name when both are present.
+    assert record['ssid'] == 'Home WiFi'
+    assert record['key'] == 'correct horse: battery'
+    assert (record['authentication'], record['cipher']) == ('WPA2PSK', 'AES')
+    assert (record['connection_mode'], record['network_type']) == ('auto', 'Infrastructure')
+
+
+def test_ssid_name_is_used_without_hex():
+    assert parse_profile_xml(os.path.join(EXPORTED, 'WLAN 2-Home.xml'))['ssid'] == 'Home WiFi'
+
+
+def test_profile_folder():
+    records = read_profile_folder(EXPORTED)
+    # Broken XML and other files are skipped.
+    assert sorted(records) == ['Airport', 'Home']
+    airport = records['Airport']
+    assert (airport['ssid'], airport['key'], airport['interface']) == ('Airport Free', '', 'Wi-Fi')
+    assert airport['network_type'] == 'Ad hoc'
+    # Exported once per interface; the first file in name order is kept.
+    assert (records['Home']['interface'], records['Home']['key']) == ('WLAN 2', 'second interface')
+
+
+def test_export_backend_reads_and_removes_the_export(monkeypatch):
+    folders = []
+
+    def run_netsh(argv):
+        folder = argv[-1].split('=', 1)[1]
+        folders.append(folder)
+        shutil.copy(os.path.join(EXPORTED, 'Wi-Fi-Airport.xml'), folder)
+        return ''
+
+    backend = NetshExportBackend()
+    monkeypatch.setattr(backend, 'run_netsh', run_netsh)
+    assert backend.fetch_profile('Airport')['ssid'] == 'Airport Free'
+    assert not os.path.exists(folders[0])
+    with pytest.raises(BackendError):
+        backend.fetch_profile('Home')
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+pytest.importorskip('PyQt5.QtWidgets')
+
+from main import ProfileStoreWatcher, RefreshScheduler
+
+
+def run_events(app, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_a_burst_of_requests_is_one_refresh(app):
+    refreshes = []
+    scheduler = RefreshScheduler(lambda: refreshes.append(scheduler.state))
+    for _ in range(5):
+        scheduler.request()
+        run_events(app, RefreshScheduler.DEBOUNCE_INTERVAL / 1000 / 10)
+    assert refreshes == []
+    run_events(app, RefreshScheduler.DEBOUNCE_INTERVAL / 1000 * 2)
+    assert refreshes == [RefreshScheduler.RUNNING]
+    scheduler.finished()
+    assert scheduler.state == RefreshScheduler.IDLE
+
+
+def test_requests_during_a_refresh_fold_into_one_follow_up(app):
+    refreshes = []
+    scheduler = RefreshScheduler(lambda: refreshes.append(scheduler.state))
+    scheduler.started()
+    for _ in range(3):
+        scheduler.request()
+        run_events(app, RefreshScheduler.DEBOUNCE_INTERVAL / 1000 * 1.5)
+    assert scheduler.state == RefreshScheduler.QUEUED
+    assert refreshes == []
+    scheduler.finished()
+    run_events(app, 0.05)
+    assert refreshes == [RefreshScheduler.RUNNING]
+    scheduler.finished()
+    run_events(app, 0.05)
+    assert refreshes == [RefreshScheduler.RUNNING]
+    assert scheduler.state == RefreshScheduler.IDLE
+
+
+def test_store_changes_within_the_debounce_window_are_reported_once(app, tmp_path):
+    interface = tmp_path / '{interface}'
+    interface.mkdir()
+    watcher = ProfileStoreWatcher(str(tmp_path))
+    changes = []
+    watcher.changed.connect(lambda: changes.append(True))
+    assert watcher.start()
+    try:
+        for index in range(5):
+            (interface / f'Profile {index}.xml').write_text('<WLANProfile/>', encoding='utf-8')
+            run_events(app, 0.02)
+        run_events(app, ProfileStoreWatcher.DEBOUNCE_INTERVAL / 1000 * 2)
+        assert changes == [True]
+    finally:
+        watcher.stop()
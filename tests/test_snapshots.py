@@ -0,0 +1,25 @@
+from key_cache import SecretKeyProvider
+from netsh_parser import empty_profile_record
+from snapshots import SnapshotStore
+
+
+def record(name, key):
+    result = empty_profile_record(name)
+    result['key'] = key
+    return result
+
+
+def test_delta_chain_is_bounded(tmp_path):
+    store = SnapshotStore(str(tmp_path), SecretKeyProvider(b'secret'), max_chain=3)
+    profiles = [record(f'Network {i}', 'key') for i in range(20)]
+    ids = []
+    for scan in range(9):
+        # One rotated key per scan stays far below the churn threshold.
+        profiles[scan] = record(f'Network {scan}', f'key {scan}')
+        ids.append(store.save(profiles))
+    full = [snapshot_id for snapshot_id in ids if 'entries' in store.manifest(snapshot_id)]
+    assert full == [ids[0], ids[4], ids[8]]
+    # A fresh store replays each snapshot from its chain on disk.
+    reopened = SnapshotStore(str(tmp_path), SecretKeyProvider(b'secret'))
+    assert reopened.records(ids[6])['Network 6']['key'] == 'key 6'
+    assert reopened.diff(ids[5], ids[6]).rotated == ['Network 6']